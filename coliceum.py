@@ -1,11 +1,35 @@
 # python coliceum.py
+import sys
 from coliceum import Coliceum
 
 
 if __name__ == '__main__':
     """コマンドから実行時"""
     try:
-        Coliceum.start()
+        # 引数に selfmatch と対局数を付けると、思考エンジンのプロセスを起動せずに自己対局する
+        #
+        #   例： python coliceum.py selfmatch 1000
+        #   例： python coliceum.py selfmatch 1000 --workers 8
+        #
+        if 1 < len(sys.argv) and sys.argv[1] == 'selfmatch':
+            Coliceum.self_match_in_process(' '.join(sys.argv[1:]))
+
+        # 引数に match と対局数を付けると、２つの思考エンジンを同時に何局も対局させる
+        #
+        #   例： python coliceum.py match 100 --concurrency 4 --options1 Search=AlphaBeta,MoveTime=100 --options2 Search=MCTS,MoveTime=100
+        #
+        elif 1 < len(sys.argv) and sys.argv[1] == 'match':
+            Coliceum.engine_match(sys.argv[2:])
+
+        # 引数に sprt を付けると、２つの思考エンジンを、逐次確率比検定で決着が付くまで対局させる
+        #
+        #   例： python coliceum.py sprt --elo0 0 --elo1 10 --concurrency 4 --options1 Search=AlphaBeta,MoveTime=100
+        #
+        elif 1 < len(sys.argv) and sys.argv[1] == 'sprt':
+            Coliceum.sprt_match(sys.argv[2:])
+
+        else:
+            Coliceum.start()
 
     except Exception as err:
         print(f"[unexpected error] {err=}, {type(err)=}")
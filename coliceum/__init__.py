@@ -1,8 +1,11 @@
 import pexpect.popen_spawn as psp
 import re
 import time
-from py_binarsi import BLACK_KOMI, WHITE_KOMI, C_EMPTY, C_BLACK, C_WHITE, CLEAR_TARGETS_LEN, Colors, Move, MoveHelper, Board, SearchedClearTargets, SearchLegalMoves, SearchMateMoveIn1Play, SearchedGameover, PositionCommand, SfenHelper
+from py_binarsi import BLACK_KOMI, WHITE_KOMI, C_EMPTY, C_BLACK, C_WHITE, CLEAR_TARGETS_LEN, Colors, Move, MoveHelper, Board, SearchedClearTargets, SearchLegalMoves, SearchMateMoveIn1Play, SearchedGameover, GameoverOracle, PositionCommand, SfenHelper
 from coliceum.views import Views as ColiceumViews
+from coliceum.self_play import SelfPlayFarm, SelfPlayResult, SelfPlayRunner
+from coliceum.engine_pool import EngineConfig, EnginePool
+from coliceum.sprt import DEFAULT_ALPHA, DEFAULT_BETA, DEFAULT_ELO0, DEFAULT_ELO1, DEFAULT_SPRT_MAX_GAMES, Sprt
 
 
 class Coliceum():
@@ -80,9 +83,67 @@ class Coliceum():
         self._proc.expect(f"{format}{end}", timeout=timeout)
 
 
+    def position_startpos(self):
+        """思考エンジンと、コロシアムの盤を、平手初期局面にする"""
+
+        # Coliceum said:
+        self.sendline('position startpos')
+
+        # コロシアムの盤も同じにする。 position startpos と同じ
+        self._board.reset()
+        self._board.update_squares_at_init()
+
+
+    def do_move(self, move_u):
+        """思考エンジンと、コロシアムの盤に一手指す
+
+        コロシアムの盤は、送った（または思考エンジンから受け取った）指し手を１つ指すだけで、思考エンジンと同じ局面に保つ
+
+        Parameters
+        ----------
+        move_u : str
+            指し手の符号。例： "4n"
+        """
+
+        # Coliceum said:
+        self.sendline(f"do {move_u}")
+
+        # Engine said
+        # do コマンドすると、 `do ok` が出て終わる
+        self.expect_line("do ok", timeout=None)
+
+        self._board.push_usi(move_u)
+
+
     def update_board(self):
-        """盤面を最新にする。
+        """コロシアムの盤が、思考エンジンの盤とずれていないか、局面のハッシュで確かめる。
+        ずれていたら、思考エンジンの初期局面と棋譜から盤を作り直す
+
+        Returns
+        -------
+        searched_clear_targets : SearchedClearTargets
+            現局面のクリアーターゲット
+        """
+
+        # Coliceum said:
+        self.sendline("hash")
+
+        # Engine said
+        self.expect_line(r"hash (\w+)", timeout=None)
+        engine_key = int(self.group(1), 16)
+
+        if engine_key != self._board.zobrist_key_with_clear_targets:
+            print(f"[Coliceum > update_board] the board diverged from the engine. resync  {engine_key=:016x}  {self._board.zobrist_key_with_clear_targets=:016x}")
+            return self.resync_board().searched_clear_targets
+
+        return SearchedClearTargets(clear_targets_list=list(self._board.clear_targets_list))
+
+
+    def resync_board(self):
+        """思考エンジンから初期局面と棋譜を受け取って、コロシアムの盤を作り直す。
         初期局面と棋譜付きの positionコマンドも返す
+
+        棋譜を初めから指し直すので、手数が増えるほど遅い。普段は update_board() で確かめるだけにする
         
         Returns
         -------
@@ -131,9 +192,7 @@ class Coliceum():
             return
 
 
-        self.sendline(f"do {bestmove_str}")
-        # do コマンドすると、 `do ok` が出て終わる
-        self.expect_line("do ok", timeout=None)
+        self.do_move(bestmove_str)
 
         # # Engine said
         # # NOTE `.*` では最右マッチしてしまうので、 `.*?` にして最左マッチにする
@@ -224,10 +283,10 @@ class Coliceum():
                 # コロシアムからエンジンへ SFEN コマンドを投げて、その結果から　クリアーターゲットを取得する必要がある
 
                 # 盤を更新する
-                position_command = self.update_board()
+                searched_clear_targets = self.update_board()
 
                 print() # 改行
-                print(ColiceumViews.stringify_board_header(self._board, position_command.searched_clear_targets))  # １行目表示
+                print(ColiceumViews.stringify_board_header(self._board, searched_clear_targets))  # １行目表示
                 print(ColiceumViews.stringify_board_normal(self._board))   # 盤面
                 print() # 改行
 
@@ -235,17 +294,17 @@ class Coliceum():
             elif input_str == 'sfen':
 
                 # 盤を更新する
-                position_command = self.update_board()
+                searched_clear_targets = self.update_board()
                 print(f"""\
 
-{SfenHelper.stringify_sfen(self._board, position_command.searched_clear_targets)}""")
+{SfenHelper.stringify_sfen(self._board, searched_clear_targets)}""")
 
             # クリアーターゲット表示
             elif input_str == 'clear_targets':
-                position_command = self.update_board()
+                searched_clear_targets = self.update_board()
                 print(f"""\
 
-{ColiceumViews.stringify_clear_targets(position_command.searched_clear_targets)}""")
+{ColiceumViews.stringify_clear_targets(searched_clear_targets)}""")
 
             # 合法手メニュー表示
             elif input_str == 'legal_moves':
@@ -262,10 +321,10 @@ class Coliceum():
 
             # １手詰めがあれば、その手をどれか１つ表示
             elif input_str == 'mate1':
-                position_command = self.update_board()
+                searched_clear_targets = self.update_board()
                 print(f"""\
 
-{ColiceumViews.stringify_mate1(self._board, position_command.searched_clear_targets)}
+{ColiceumViews.stringify_mate1(self._board)}
 """)
 
             # 編集用の操作一覧
@@ -327,9 +386,7 @@ class Coliceum():
 
 
                     # Coliceum said
-                    self.sendline(f"do {move_u}")
-                    # do コマンドすると、 `do ok` が出て終わる
-                    self.expect_line("do ok", timeout=None)
+                    self.do_move(move_u)
 
                     # コマンド入力ループから抜ける（次のターンへ）
                     break
@@ -370,17 +427,15 @@ class Coliceum():
         # 終局判定を新規作成
         searched_clear_targets = SearchedClearTargets.make_new_obj()
         
-        position_command = None
-
         # 手数ループ。100手も使わない
         for i in range(1, 100):
 
-            # 盤面を最新にする
-            position_command = self.update_board()
+            # 盤面が思考エンジンとずれていないか確かめる
+            searched_clear_targets = self.update_board()
 
             # 盤表示
             print() # 改行
-            print(ColiceumViews.stringify_board_header(self._board, position_command.searched_clear_targets))  # １行目表示
+            print(ColiceumViews.stringify_board_header(self._board, searched_clear_targets))  # １行目表示
             print(ColiceumViews.stringify_board_normal(self._board))   # 盤面
             print() # 改行
 
@@ -397,13 +452,12 @@ class Coliceum():
 
             else:
                 # １手指す
-                self.sendline(f"do {move_u}")
-                self.expect_line(r"do ok", timeout=None)
+                self.do_move(move_u)
 
 
         print(f"{match_count + 1} 局目ここまで")
 
-        return position_command.searched_clear_targets
+        return searched_clear_targets
 
 
     def self_match(self, input_str):
@@ -424,73 +478,208 @@ class Coliceum():
         else:
             max_match_count = int(tokens[1])
         
-        black_bingo_win_count = 0
-        black_point_win_count_when_simultaneous_clearing = 0
-        black_point_win_count_when_stalemate = 0
-        white_bingo_win_count = 0
-        white_point_win_count_when_simultaneous_clearing = 0
-        white_point_win_count_when_stalemate = 0
+        result = SelfPlayResult()
 
         # 連続対局
         for i in range(0, max_match_count):
 
             self.sendline("usinewgame")
-            self.sendline('position startpos')
+            self.position_startpos()
 
             # 自己対局
-            # クリアーターゲット更新
-            searched_clear_targets = self.self_match_once(match_count=i)
+            self.self_match_once(match_count=i)
 
-            # 終局判定のために、しかたなく終局後に合法手生成
-            legal_moves = SearchLegalMoves.generate_legal_moves(self._board)
+            # 終局判定。合法手一覧は作らない
+            result.add(GameoverOracle.search(self._board))
 
-            # 終局判定
-            searched_gameover = SearchedGameover.search(self._board, legal_moves, searched_clear_targets.clear_targets_list)
+            if i < max_match_count - 10 and i % 10 == 9:
+                # 対局結果の集計の表示、またはファイルへの上書き
+                print(result.stringify_summary_and_save())
 
-            if searched_gameover.is_black_win:
-                if searched_gameover.black_count_with_komi == -1:
-                    black_bingo_win_count += 1
-                elif searched_gameover.is_simultaneous_clearing:
-                    black_point_win_count_when_simultaneous_clearing += 1
-                else:
-                    black_point_win_count_when_stalemate += 1
 
-            elif searched_gameover.is_white_win:
-                if searched_gameover.white_count_with_komi == -1:
-                    white_bingo_win_count += 1
-                elif searched_gameover.is_simultaneous_clearing:
-                    white_point_win_count_when_simultaneous_clearing += 1
-                else:
-                    white_point_win_count_when_stalemate += 1
-            
-            else:
-                raise ValueError(f"{searched_gameover.is_black_win=}  {searched_gameover.is_white_win=}")
+        # 対局結果の集計の表示、またはファイルへの上書き
+        print(result.stringify_summary_and_save())
 
-            if i < max_match_count - 10 and i % 10 == 9:
-                # 対局結果の集計の表示、またはファイルへの上書き
-                print(ColiceumViews.stringify_result_summary_and_save(
-                    i,
-                    black_bingo_win_count,
-                    black_point_win_count_when_simultaneous_clearing,
-                    black_point_win_count_when_stalemate,
-                    white_bingo_win_count,
-                    white_point_win_count_when_simultaneous_clearing,
-                    white_point_win_count_when_stalemate))
+        print("自己対局　ここまで")
+
+
+    @staticmethod
+    def self_match_in_process(input_str):
+        """思考エンジンのプロセスを起動せずに、自己対局する
+            code: selfmatch 1000
+            code: selfmatch 1000 --workers 8
+            code: selfmatch 1000 --workers 8 --seed 1
+
+        Parameters
+        ----------
+        input_str : str
+            コマンド文字列
+        """
+        print("自己対局　ここから：")
+
+        # 連続対局回数
+        tokens = input_str.split(' ')
+        if len(tokens) < 2 or tokens[1].startswith('--'):
+            max_match_count = 1
+        else:
+            max_match_count = int(tokens[1])
+
+        # 子プロセスの数と、乱数の種
+        workers = 1
+        seed = None
+
+        for i in range(0, len(tokens) - 1):
+            if tokens[i] == '--workers':
+                workers = int(tokens[i + 1])
 
+            elif tokens[i] == '--seed':
+                seed = int(tokens[i + 1])
+
+        if 1 < workers:
+            farm = SelfPlayFarm(workers=workers, seed=seed)
+            print(f"{workers} 個の子プロセスで対局します。乱数の種： {farm.seed}")
+            result = farm.run(games=max_match_count)
+
+        else:
+            runner = SelfPlayRunner(seed=seed)
+            result = runner.run(games=max_match_count)
 
         # 対局結果の集計の表示、またはファイルへの上書き
-        print(ColiceumViews.stringify_result_summary_and_save(
-            max_match_count - 1,
-            black_bingo_win_count,
-            black_point_win_count_when_simultaneous_clearing,
-            black_point_win_count_when_stalemate,
-            white_bingo_win_count,
-            white_point_win_count_when_simultaneous_clearing,
-            white_point_win_count_when_stalemate))
+        print(result.stringify_summary_and_save())
 
         print("自己対局　ここまで")
 
 
+    @staticmethod
+    def parse_named_args(args):
+        """コマンドライン引数の、 --名前 値 の組を辞書にする"""
+
+        arg_dict = {}
+        for i in range(0, len(args) - 1):
+            if args[i].startswith('--'):
+                arg_dict[args[i][2:]] = args[i + 1]
+
+        return arg_dict
+
+
+    @staticmethod
+    def parse_engine_match_args(args):
+        """エンジン同士の対局の、コマンドライン引数を解析する
+
+        Parameters
+        ----------
+        args : list
+            例： ["--engine1", "python main.py", "--options1", "Search=AlphaBeta", "--options2", "Search=MCTS", "--concurrency", "4"]
+
+        Returns
+        -------
+        engine_pool : EnginePool
+            エンジンの子プロセスを束ねたもの
+        """
+
+        arg_dict = Coliceum.parse_named_args(args)
+
+        engine_configs = [
+            EngineConfig.parse(
+                name=arg_dict.get(f'name{i}', f'engine{i}'),
+                command_u=arg_dict.get(f'engine{i}'),
+                options_u=arg_dict.get(f'options{i}'))
+            for i in [1, 2]]
+
+        return EnginePool(
+            engine_configs=engine_configs,
+            concurrency=int(arg_dict.get('concurrency', 1)),
+            go_u=arg_dict.get('go', 'go'),
+            move_timeout_s=float(arg_dict['timeout']) if 'timeout' in arg_dict else None)
+
+
+    @staticmethod
+    def engine_match(args):
+        """２つの思考エンジンを、子プロセスを束ねて同時に何局も対局させる
+            code: match 100 --concurrency 4 --options1 Search=AlphaBeta,MoveTime=100 --options2 Search=MCTS,MoveTime=100
+
+        Parameters
+        ----------
+        args : list
+            コマンドライン引数。 match の後ろ
+        """
+        print("エンジン対局　ここから：")
+
+        # 対局数
+        if len(args) < 1 or args[0].startswith('--'):
+            max_match_count = 1
+        else:
+            max_match_count = int(args[0])
+
+        engine_pool = Coliceum.parse_engine_match_args(args)
+
+        def on_game_end(result, game_result):
+            """１０局毎に、途中の集計を表示する"""
+            if result.games < max_match_count and result.games % 10 == 0:
+                print(result.stringify_summary(), flush=True)
+
+            return False
+
+        result = engine_pool.run(games=max_match_count, on_game_end=on_game_end)
+
+        print(result.stringify_summary())
+        print("エンジン対局　ここまで")
+
+
+    @staticmethod
+    def sprt_match(args):
+        """２つの思考エンジンを対局させ、逐次確率比検定（SPRT）で H0 か H1 が採られたら止める
+            code: sprt --elo0 0 --elo1 10 --concurrency 4 --options1 Search=AlphaBeta,MoveTime=100
+
+        Parameters
+        ----------
+        args : list
+            コマンドライン引数。 sprt の後ろ。先頭に数を書くと、検定が決まらなくても止める対局数
+        """
+        print("SPRT　ここから：")
+
+        # 検定が決まらなくても止める対局数
+        if len(args) < 1 or args[0].startswith('--'):
+            max_match_count = DEFAULT_SPRT_MAX_GAMES
+        else:
+            max_match_count = int(args[0])
+
+        arg_dict = Coliceum.parse_named_args(args)
+        sprt = Sprt(
+            elo0=float(arg_dict.get('elo0', DEFAULT_ELO0)),
+            elo1=float(arg_dict.get('elo1', DEFAULT_ELO1)),
+            alpha=float(arg_dict.get('alpha', DEFAULT_ALPHA)),
+            beta=float(arg_dict.get('beta', DEFAULT_BETA)))
+
+        engine_pool = Coliceum.parse_engine_match_args(args)
+
+        # 採った仮説
+        state = {'accepted': None}
+
+        def on_game_end(result, game_result):
+            """１局毎に検定し、 H0 か H1 を採ったら止める。同時に指している対局は最後まで指して数える"""
+
+            if state['accepted'] is None:
+                state['accepted'] = sprt.test(result.wins, result.losses, result.draws)
+
+            if result.games % 10 == 0 or state['accepted'] is not None:
+                print(sprt.stringify_status(result.wins, result.losses, result.draws), flush=True)
+
+            return state['accepted'] is not None
+
+        result = engine_pool.run(games=max_match_count, on_game_end=on_game_end)
+
+        print(result.stringify_summary())
+        print(sprt.stringify_status(result.wins, result.losses, result.draws))
+
+        if state['accepted'] is None:
+            print(f"{result.games} 局指しても決まらなかった")
+        else:
+            print(f"{state['accepted']} を採った")
+
+        print("SPRT　ここまで")
+
+
     @staticmethod
     def start():
         """TODO 開始
@@ -590,7 +779,7 @@ Do you play sente or gote(1-2)?> """)
 
 
 
-            coliceum.sendline("position startpos")
+            coliceum.position_startpos()
 
 
             # DO 手番交互ループ
@@ -598,12 +787,12 @@ Do you play sente or gote(1-2)?> """)
 
                 #print(f"[Coliceum > start] 手番交互ループ始まり")
 
-                # 盤面を最新にする
-                position_command = coliceum.update_board()
+                # 盤面が思考エンジンとずれていないか確かめる
+                searched_clear_targets = coliceum.update_board()
 
                 # 盤表示
                 print() # 改行
-                print(ColiceumViews.stringify_board_header(coliceum.board, position_command.searched_clear_targets))  # １行目表示
+                print(ColiceumViews.stringify_board_header(coliceum.board, searched_clear_targets))  # １行目表示
                 print(ColiceumViews.stringify_board_normal(coliceum.board))   # 盤面
                 print() # 改行
 
@@ -611,30 +800,24 @@ Do you play sente or gote(1-2)?> """)
                 time.sleep(0.7)
 
                 # 今１つでもクリアーしたものがあれば、クリアー目標一覧表示
-                if ColiceumViews.is_one_settled(coliceum.board, position_command.searched_clear_targets):
+                if ColiceumViews.is_one_settled(coliceum.board, searched_clear_targets):
                     print(f"""\
 
-{ColiceumViews.stringify_clear_targets(position_command.searched_clear_targets)}""")
+{ColiceumViews.stringify_clear_targets(searched_clear_targets)}""")
                     
                     # クリアーターゲット表示後、間隔を空ける
                     time.sleep(0.7)
 
 
-                # 現局面の合法手一覧取得
-                #
-                #   ステールメートしているかどうかの判定に使う
-                #
-                legal_moves = SearchLegalMoves.generate_legal_moves(coliceum.board)
-
-                # 終局判定
-                searched_gameover = SearchedGameover.search(coliceum.board, legal_moves, position_command.searched_clear_targets.clear_targets_list)
+                # 終局判定。合法手一覧は作らず、ステールメートかどうかは合法手が１つでもあるかだけで調べる
+                searched_gameover = GameoverOracle.search(coliceum.board)
                 #print(f"[Coliceum > go_human (debug 231)] {searched_gameover.dump()}")
 
                 # 決着が付いていれば、結果表示
                 if coliceum.board.is_gameover(searched_gameover):
                     print(f"""\
 
-{ColiceumViews.stringify_settled(coliceum.board, position_command.searched_clear_targets, searched_gameover, your_turn, is_human_vs_human)}""")
+{ColiceumViews.stringify_settled(coliceum.board, searched_clear_targets, searched_gameover, your_turn, is_human_vs_human)}""")
 
                     # 結果表示後、間隔を空ける
                     time.sleep(0.7)
@@ -0,0 +1,509 @@
+import asyncio
+import shlex
+import sys
+from py_binarsi import BOARD_BACKEND_LIST, C_EMPTY, C_BLACK, C_WHITE, Board, SearchLegalMoves, GameoverOracle
+
+
+# 思考エンジンを起動するコマンドの既定値。 binarsi_analysis リポジトリー直下の main.py
+DEFAULT_ENGINE_COMMAND = [sys.executable, 'main.py']
+
+# エンジン同士の対局で、１局に指す手数の上限。これを超えたら引き分けにする
+DEFAULT_MATCH_MAX_MOVES = 256
+
+# 時間切れで stop を送ってから、 bestmove を待つ時間（秒）。 quit を送ってから終了を待つ時間も同じ。過ぎたら子プロセスを強制終了する
+_STOP_WAIT_SECONDS = 5.0
+
+# 対局の結果
+GAME_RESULT_WIN = 'win'
+GAME_RESULT_LOSS = 'loss'
+GAME_RESULT_DRAW = 'draw'
+
+
+class EngineConfig():
+    """思考エンジンの設定。起動するコマンドと、 setoption で設定するエンジン・オプション"""
+
+
+    def __init__(self, name, command=None, options=None, cwd=None):
+        """初期化
+
+        Parameters
+        ----------
+        name : str
+            集計に表示する名前
+        command : list
+            思考エンジンを起動するコマンド。例： ["python", "main.py", "bitboard"] 。ナンなら DEFAULT_ENGINE_COMMAND
+        options : dict
+            エンジン・オプション。例： {"Search": "AlphaBeta", "MoveTime": "100"}
+        cwd : str
+            思考エンジンを起動するディレクトリー。ナンなら、このプロセスと同じ
+        """
+        self._name = name
+        self._command = list(command) if command is not None else list(DEFAULT_ENGINE_COMMAND)
+        self._options = dict(options) if options is not None else {}
+        self._cwd = cwd
+
+
+    @property
+    def name(self):
+        """集計に表示する名前"""
+        return self._name
+
+
+    @property
+    def command(self):
+        """思考エンジンを起動するコマンド"""
+        return self._command
+
+
+    @property
+    def options(self):
+        """エンジン・オプション"""
+        return self._options
+
+
+    @property
+    def cwd(self):
+        """思考エンジンを起動するディレクトリー"""
+        return self._cwd
+
+
+    @staticmethod
+    def parse(name, command_u=None, options_u=None):
+        """コマンドラインの文字列から作る
+
+        Parameters
+        ----------
+        name : str
+            集計に表示する名前
+        command_u : str
+            思考エンジンを起動するコマンド。例： "python main.py bitboard" 。ナンなら既定のもの
+        options_u : str
+            エンジン・オプション。例： "Search=AlphaBeta,MoveTime=100"
+        """
+
+        command = shlex.split(command_u) if command_u is not None else None
+
+        options = {}
+        if options_u is not None and options_u != '':
+            for option_u in options_u.split(','):
+                if '=' not in option_u:
+                    raise ValueError(f"option must be name=value  {option_u=}")
+
+                (option_name, option_value) = option_u.split('=', 1)
+                options[option_name] = option_value
+
+        return EngineConfig(name=name, command=command, options=options)
+
+
+class AsyncEngine():
+    """標準入出力のパイプを asyncio で読み書きする、思考エンジンの子プロセス
+
+    pexpect の expect(timeout=None) と違い、応答を待つ間も他の対局を進められる。
+    標準エラー出力はパイプにせず、このプロセスのものをそのまま使わせるので、エンジンが落ちたときのスタックトレースが見える
+    """
+
+
+    def __init__(self, config, move_timeout_s=None):
+        """初期化
+
+        Parameters
+        ----------
+        config : EngineConfig
+            思考エンジンの設定
+        move_timeout_s : float
+            bestmove を待つ時間（秒）。ナンなら待ち続ける
+        """
+        self._config = config
+        self._move_timeout_s = move_timeout_s
+
+        # 子プロセス。 start() で作る
+        self._proc = None
+
+
+    @property
+    def config(self):
+        """思考エンジンの設定"""
+        return self._config
+
+
+    async def start(self):
+        """子プロセスを起動し、 usi 、 setoption 、 isready まで済ませる"""
+
+        self._proc = await asyncio.create_subprocess_exec(
+            *self._config.command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=None,
+            cwd=self._config.cwd)
+
+        await self.send_line('usi')
+        await self.read_until('usiok')
+
+        for (option_name, option_value) in self._config.options.items():
+            await self.send_line(f'setoption name {option_name} value {option_value}')
+
+        await self.send_line('isready')
+        await self.read_until('readyok')
+
+
+    async def send_line(self, line):
+        """子プロセスの標準入力へ１行送る"""
+        self._proc.stdin.write(f'{line}\n'.encode('utf-8'))
+        await self._proc.stdin.drain()
+
+
+    async def read_line(self):
+        """子プロセスの標準出力から１行読む。子プロセスが終了していたら ValueError"""
+
+        line = await self._proc.stdout.readline()
+
+        if len(line) < 1:
+            raise ValueError(f"engine exited  {self._config.name=}  {self._proc.returncode=}")
+
+        return line.decode('utf-8', errors='ignore').rstrip('\r\n')
+
+
+    async def read_until(self, head):
+        """head で始まる行が来るまで読み、その行を返す。それまでの行（info など）は読み捨てる"""
+
+        while True:
+            line = await self.read_line()
+
+            if line == head or line.startswith(f'{head} '):
+                return line
+
+
+    async def go(self, position_u, go_u):
+        """局面を送って考えさせる
+
+        Parameters
+        ----------
+        position_u : str
+            position コマンド。例： "position startpos moves 4n 3n"
+        go_u : str
+            go コマンド。例： "go movetime 100"
+
+        Returns
+        -------
+        move_u : str
+            bestmove の指し手。例： "4n", "resign" 。
+            move_timeout_s を過ぎたか、子プロセスが終了していたらナン。そのときは子プロセスを起動し直してある
+        """
+
+        try:
+            await self.send_line(position_u)
+            await self.send_line(go_u)
+            line = await asyncio.wait_for(self.read_until('bestmove'), timeout=self._move_timeout_s)
+
+        except asyncio.TimeoutError:
+            # 考え続けていれば止めて、遅れて来た bestmove は読み捨てる。それも来なければ、固まっているので起動し直す
+            try:
+                await self.send_line('stop')
+                await asyncio.wait_for(self.read_until('bestmove'), timeout=_STOP_WAIT_SECONDS)
+
+            except (asyncio.TimeoutError, ValueError, ConnectionError):
+                print(f"[engine pool] engine does not respond to stop, restart it  {self._config.name=}", flush=True)
+                await self.restart()
+
+            return None
+
+        except (ValueError, ConnectionError) as err:
+            # 子プロセスが終了していた
+            print(f"[engine pool] engine exited, restart it  {self._config.name=}  {err=}", flush=True)
+            await self.restart()
+            return None
+
+        return line.split(' ')[1]
+
+
+    async def restart(self):
+        """子プロセスを強制終了して、起動し直す"""
+        await self.kill()
+        await self.start()
+
+
+    async def kill(self):
+        """子プロセスを強制終了する"""
+
+        if self._proc is None:
+            return
+
+        if self._proc.returncode is None:
+            self._proc.kill()
+            await self._proc.wait()
+
+        self._proc = None
+
+
+    async def quit(self):
+        """子プロセスを終了させる。 quit に応えなければ強制終了する"""
+
+        if self._proc is None:
+            return
+
+        if self._proc.returncode is None:
+            try:
+                await self.send_line('quit')
+                await asyncio.wait_for(self._proc.wait(), timeout=_STOP_WAIT_SECONDS)
+
+            except (asyncio.TimeoutError, ConnectionError):
+                await self.kill()
+
+        self._proc = None
+
+
+class EngineMatchResult():
+    """２つの思考エンジンの対局結果の集計。勝ち負けは０番のエンジンから見たもの"""
+
+
+    def __init__(self, names):
+        """初期化
+
+        Parameters
+        ----------
+        names : list
+            ０番、１番のエンジンの名前
+        """
+        self._names = names
+
+        # ０番のエンジンの勝ち数、負け数、引き分け数
+        self.wins = 0
+        self.losses = 0
+        self.draws = 0
+
+        # 先手（黒）、後手（白）の勝ち数
+        self.black_wins = 0
+        self.white_wins = 0
+
+
+    @property
+    def names(self):
+        """０番、１番のエンジンの名前"""
+        return self._names
+
+
+    @property
+    def games(self):
+        """集計した対局数"""
+        return self.wins + self.losses + self.draws
+
+
+    def add(self, winner, black_engine_index):
+        """終局した１局を数える
+
+        Parameters
+        ----------
+        winner : int
+            勝った方の色。引き分けなら C_EMPTY
+        black_engine_index : int
+            先手（黒）を持ったエンジンの番号
+
+        Returns
+        -------
+        game_result : str
+            ０番のエンジンから見た結果。 'win' 、 'loss' 、 'draw'
+        """
+
+        if winner == C_EMPTY:
+            self.draws += 1
+            return GAME_RESULT_DRAW
+
+        if winner == C_BLACK:
+            self.black_wins += 1
+        else:
+            self.white_wins += 1
+
+        if (winner == C_BLACK) == (black_engine_index == 0):
+            self.wins += 1
+            return GAME_RESULT_WIN
+
+        self.losses += 1
+        return GAME_RESULT_LOSS
+
+
+    def stringify_summary(self):
+        """対局結果の集計の文字列生成"""
+
+        games = max(self.games, 1)
+
+        return f"""\
+{self.games} 対局集計
+
+    {self._names[0]} 対 {self._names[1]}
+    ーーーーーーーー
+    勝ち　： {self.wins:6}　　　率： {self.wins/games:3.3f}
+    負け　： {self.losses:6}　　　率： {self.losses/games:3.3f}
+    引分け： {self.draws:6}　　　率： {self.draws/games:3.3f}
+    ーーーーーーーー
+
+    先後比較
+    ーーーーーーーー
+    黒　　　　勝ち数： {self.black_wins:6}　　　率： {self.black_wins/games:3.3f}
+    白　　　　勝ち数： {self.white_wins:6}　　　率： {self.white_wins/games:3.3f}
+    ーーーーーーーー
+"""
+
+
+class EnginePool():
+    """思考エンジンの子プロセスを束ねて、２つのエンジンの対局を同時に何局も指す
+
+    同時に指す対局の数だけ対局の枠を作り、枠毎に、０番と１番のエンジンの子プロセスを１つずつ起動して使い回す。
+    先手と後手は１局毎に入れ替える。盤はコロシアム側でも持ち、合法手か、終局したかを調べる
+    """
+
+
+    def __init__(self, engine_configs, concurrency=1, go_u='go', max_moves=DEFAULT_MATCH_MAX_MOVES, move_timeout_s=None, board_backend=BOARD_BACKEND_LIST):
+        """初期化
+
+        Parameters
+        ----------
+        engine_configs : list
+            ０番、１番の EngineConfig
+        concurrency : int
+            同時に指す対局の数
+        go_u : str
+            エンジンに送る go コマンド。例： "go movetime 100", "go btime 0 wtime 0 byoyomi 1000"
+        max_moves : int
+            １局に指す手数の上限。超えたら引き分け
+        move_timeout_s : float
+            bestmove を待つ時間（秒）。過ぎたら、そのエンジンの負け。ナンなら待ち続ける
+        board_backend : str
+            コロシアム側の盤の内部表現
+        """
+
+        if len(engine_configs) != 2:
+            raise ValueError(f"two engines are required  {len(engine_configs)=}")
+
+        self._engine_configs = engine_configs
+        self._concurrency = concurrency
+        self._go_u = go_u
+        self._max_moves = max_moves
+        self._move_timeout_s = move_timeout_s
+        self._board_backend = board_backend
+
+
+    def run(self, games, on_game_end=None):
+        """対局する
+
+        Parameters
+        ----------
+        games : int
+            対局数
+        on_game_end : function
+            １局終わる毎に、 EngineMatchResult と、その局の結果（'win' など）を渡して呼ぶ。真を返したら、指している対局を最後まで指して止める
+
+        Returns
+        -------
+        result : EngineMatchResult
+            対局結果の集計
+        """
+        return asyncio.run(self.play_games(games, on_game_end))
+
+
+    async def play_games(self, games, on_game_end=None):
+        """対局する。 run() の中身"""
+
+        result = EngineMatchResult(names=[config.name for config in self._engine_configs])
+
+        # 次に指す対局の番号と、止めるか。対局の枠同士で共有する
+        state = {'next_game_index': 0, 'is_stopped': False}
+
+        async def run_slot():
+            """対局の枠。エンジンを起動して、対局が無くなるまで指す"""
+
+            engines = [AsyncEngine(config, move_timeout_s=self._move_timeout_s) for config in self._engine_configs]
+
+            try:
+                for engine in engines:
+                    await engine.start()
+
+                while state['next_game_index'] < games and not state['is_stopped']:
+                    game_index = state['next_game_index']
+                    state['next_game_index'] += 1
+
+                    # 偶数局目は０番のエンジンが先手
+                    black_engine_index = game_index % 2
+                    winner = await self.play_game(engines[black_engine_index], engines[1 - black_engine_index])
+                    game_result = result.add(winner, black_engine_index)
+
+                    if on_game_end is not None and on_game_end(result, game_result):
+                        state['is_stopped'] = True
+
+            finally:
+                for engine in engines:
+                    await engine.quit()
+
+        await asyncio.gather(*[run_slot() for _ in range(0, max(min(self._concurrency, games), 1))])
+
+        return result
+
+
+    async def play_game(self, black_engine, white_engine):
+        """平手の初期局面から１局指す
+
+        Parameters
+        ----------
+        black_engine : AsyncEngine
+            先手（黒）のエンジン
+        white_engine : AsyncEngine
+            後手（白）のエンジン
+
+        Returns
+        -------
+        winner : int
+            勝った方の色。引き分けなら C_EMPTY
+        """
+
+        board = Board.make_new_obj(self._board_backend)
+        board.reset()
+        board.update_squares_at_init()
+
+        move_u_list = []
+
+        for engine in [black_engine, white_engine]:
+            await engine.send_line('usinewgame')
+
+        winner = C_EMPTY
+
+        for _ in range(0, self._max_moves):
+
+            # 終局判定
+            searched_gameover = GameoverOracle.search(board)
+            if board.is_gameover(searched_gameover):
+                winner = C_BLACK if searched_gameover.is_black_win else C_WHITE
+                break
+
+            next_turn = board.get_next_turn()
+            engine = black_engine if next_turn == C_BLACK else white_engine
+            opponent_color = C_WHITE if next_turn == C_BLACK else C_BLACK
+
+            if len(move_u_list) < 1:
+                position_u = 'position startpos'
+            else:
+                position_u = f"position startpos moves {' '.join(move_u_list)}"
+
+            move_u = await engine.go(position_u, self._go_u)
+
+            # 終局していないのに投了した、時間切れ、反則手なら負け
+            if move_u is None or move_u == 'resign' or move_u not in [move.to_code() for move in SearchLegalMoves.generate_legal_moves(board).items]:
+                winner = opponent_color
+                break
+
+            board.push_usi(move_u)
+            move_u_list.append(move_u)
+
+        else:
+            # 上限の手数目で終局していなければ引き分け
+            searched_gameover = GameoverOracle.search(board)
+            if board.is_gameover(searched_gameover):
+                winner = C_BLACK if searched_gameover.is_black_win else C_WHITE
+
+        for (engine, color) in [(black_engine, C_BLACK), (white_engine, C_WHITE)]:
+            if winner == C_EMPTY:
+                await engine.send_line('gameover draw')
+            elif winner == color:
+                await engine.send_line('gameover win')
+            else:
+                await engine.send_line('gameover lose')
+
+        return winner
@@ -0,0 +1,345 @@
+import multiprocessing
+import random
+from py_binarsi import BOARD_BACKEND_LIST, Board, SearchedClearTargets, SearchLegalMoves, SearchMateMoveIn1Play, GameoverOracle
+from usi_engine import UsiEngine
+from coliceum.views import Views as ColiceumViews
+
+
+# 自己対局で、１局に指す手数の上限。 Coliceum.self_match_once() と同じ
+DEFAULT_SELF_PLAY_MAX_MOVES = 99
+
+# 勝ち方毎の勝ち数の、 SelfPlayResult の属性名
+_OUTCOME_NAMES = [
+    'black_bingo_win_count',
+    'black_point_win_count_when_simultaneous_clearing',
+    'black_point_win_count_when_stalemate',
+    'white_bingo_win_count',
+    'white_point_win_count_when_simultaneous_clearing',
+    'white_point_win_count_when_stalemate',
+]
+
+# 何局毎に、途中の集計を出力するか
+_SUMMARY_INTERVAL_GAMES = 10
+
+
+class SelfPlayResult():
+    """自己対局の結果の集計
+
+    ColiceumViews.stringify_result_summary_and_save() に渡す、勝ち方毎の勝ち数を数える
+    """
+
+
+    def __init__(self):
+        """初期化"""
+
+        # 黒の、三本勝負での勝ち数
+        self.black_bingo_win_count = 0
+
+        # 黒の、点数計算（同着）での勝ち数
+        self.black_point_win_count_when_simultaneous_clearing = 0
+
+        # 黒の、点数計算（満局）での勝ち数
+        self.black_point_win_count_when_stalemate = 0
+
+        # 白の、三本勝負での勝ち数
+        self.white_bingo_win_count = 0
+
+        # 白の、点数計算（同着）での勝ち数
+        self.white_point_win_count_when_simultaneous_clearing = 0
+
+        # 白の、点数計算（満局）での勝ち数
+        self.white_point_win_count_when_stalemate = 0
+
+
+    @property
+    def games(self):
+        """集計した対局数"""
+        return sum([getattr(self, outcome_name) for outcome_name in _OUTCOME_NAMES])
+
+
+    @staticmethod
+    def to_outcome_name(searched_gameover):
+        """終局判定を、勝ち方毎の勝ち数の属性名にする。子プロセスから送るときは、これを送る
+
+        Parameters
+        ----------
+        searched_gameover : SearchedGameover
+            終局判定
+
+        Returns
+        -------
+        outcome_name : str
+            例： 'black_bingo_win_count'
+        """
+
+        if searched_gameover.is_black_win:
+            if searched_gameover.black_count_with_komi == -1:
+                return 'black_bingo_win_count'
+            elif searched_gameover.is_simultaneous_clearing:
+                return 'black_point_win_count_when_simultaneous_clearing'
+            else:
+                return 'black_point_win_count_when_stalemate'
+
+        elif searched_gameover.is_white_win:
+            if searched_gameover.white_count_with_komi == -1:
+                return 'white_bingo_win_count'
+            elif searched_gameover.is_simultaneous_clearing:
+                return 'white_point_win_count_when_simultaneous_clearing'
+            else:
+                return 'white_point_win_count_when_stalemate'
+
+        else:
+            raise ValueError(f"{searched_gameover.is_black_win=}  {searched_gameover.is_white_win=}")
+
+
+    def add(self, searched_gameover):
+        """終局した１局を数える
+
+        Parameters
+        ----------
+        searched_gameover : SearchedGameover
+            終局判定
+        """
+        self.add_outcome(SelfPlayResult.to_outcome_name(searched_gameover))
+
+
+    def add_outcome(self, outcome_name):
+        """勝ち方毎の勝ち数の属性名で、終局した１局を数える"""
+
+        if outcome_name not in _OUTCOME_NAMES:
+            raise ValueError(f"unknown outcome  {outcome_name=}")
+
+        setattr(self, outcome_name, getattr(self, outcome_name) + 1)
+
+
+    def stringify_summary_and_save(self):
+        """対局結果の集計の文字列生成、また、ファイルへの上書き"""
+        return ColiceumViews.stringify_result_summary_and_save(
+            self.games - 1,
+            self.black_bingo_win_count,
+            self.black_point_win_count_when_simultaneous_clearing,
+            self.black_point_win_count_when_stalemate,
+            self.white_bingo_win_count,
+            self.white_point_win_count_when_simultaneous_clearing,
+            self.white_point_win_count_when_stalemate)
+
+
+class SelfPlayRunner():
+    """思考エンジンのプロセスを起動せずに、同じプロセスの中で自己対局する
+
+    Coliceum.self_match() は思考エンジンと標準入出力でやりとりし、１手毎に sfen で局面を受け取って盤を作り直すが、
+    こちらは盤を１つだけ持ち、 UsiEngine.sub_go() で決めた指し手を直接指す
+    """
+
+
+    def __init__(self, board_backend=BOARD_BACKEND_LIST, max_moves=DEFAULT_SELF_PLAY_MAX_MOVES, seed=None):
+        """初期化
+
+        Parameters
+        ----------
+        board_backend : str
+            盤の内部表現。 'list' か 'bitboard'
+        max_moves : int
+            １局に指す手数の上限
+        seed : int
+            UsiEngine.sub_go() が使う乱数の種。ナンなら設定しない
+        """
+        self._board = Board.make_new_obj(board_backend)
+        self._max_moves = max_moves
+
+        if seed is not None:
+            random.seed(seed)
+
+
+    @property
+    def board(self):
+        """盤"""
+        return self._board
+
+
+    def play_game(self):
+        """平手の初期局面から１局指す
+
+        Returns
+        -------
+        searched_gameover : SearchedGameover
+            終局判定
+        """
+
+        # position startpos と同じ
+        board = self._board
+        board.reset()
+        board.update_squares_at_init()
+
+        for _ in range(0, self._max_moves):
+            legal_moves = SearchLegalMoves.generate_legal_moves(board)
+
+            # 一手詰めの手。無ければナン
+            mate_move_in_1ply = SearchMateMoveIn1Play.find_mate_move_in_1ply(
+                board=board,
+                move_list=legal_moves.distinct_items)
+
+            # クリアーターゲット。盤が持っているものを使う
+            searched_clear_targets = SearchedClearTargets(
+                clear_targets_list=board.clear_targets_list)
+
+            # 終局判定
+            searched_gameover = GameoverOracle.search(board, has_legal_move=0 < len(legal_moves.distinct_items))
+
+            (best_move, reason) = UsiEngine.sub_go(board, legal_moves, mate_move_in_1ply, searched_clear_targets, searched_gameover)
+
+            if reason == 'resign':
+                return searched_gameover
+
+            board.push_move(best_move)
+
+        return GameoverOracle.search(board)
+
+
+    def run(self, games, info_printer=print):
+        """連続して自己対局する
+
+        Parameters
+        ----------
+        games : int
+            対局数
+        info_printer : function
+            途中の集計を出力する関数。 Coliceum.self_match() と同じく１０局毎に出力する
+
+        Returns
+        -------
+        result : SelfPlayResult
+            対局結果の集計
+        """
+
+        result = SelfPlayResult()
+
+        for i in range(0, games):
+            result.add(self.play_game())
+
+            if i < games - _SUMMARY_INTERVAL_GAMES and i % _SUMMARY_INTERVAL_GAMES == _SUMMARY_INTERVAL_GAMES - 1:
+                info_printer(result.stringify_summary_and_save())
+
+        return result
+
+
+def _play_games_in_worker(games, board_backend, max_moves, seed, result_queue):
+    """子プロセスで自己対局し、１局毎に勝ち方を result_queue へ送る。最後にナンを送る
+
+    Parameters
+    ----------
+    games : int
+        この子プロセスで指す対局数
+    board_backend : str
+        盤の内部表現
+    max_moves : int
+        １局に指す手数の上限
+    seed : int
+        この子プロセスの乱数の種
+    result_queue : multiprocessing.Queue
+        勝ち方毎の勝ち数の属性名を送るキュー
+    """
+
+    try:
+        runner = SelfPlayRunner(board_backend=board_backend, max_moves=max_moves, seed=seed)
+
+        for _ in range(0, games):
+            result_queue.put(SelfPlayResult.to_outcome_name(runner.play_game()))
+
+    finally:
+        # 例外で止まっても、親プロセスが待ち続けないように、終わったことは知らせる
+        result_queue.put(None)
+
+
+class SelfPlayFarm():
+    """複数の子プロセスで、同時に自己対局する
+
+    対局を子プロセスに等分し、子プロセス毎に違う乱数の種を与える。
+    １局終わる毎に勝ち方がキューで送られてくるので、親プロセスは届いた順に数え、途中の集計を出力する
+    """
+
+
+    def __init__(self, workers, board_backend=BOARD_BACKEND_LIST, max_moves=DEFAULT_SELF_PLAY_MAX_MOVES, seed=None):
+        """初期化
+
+        Parameters
+        ----------
+        workers : int
+            子プロセスの数
+        board_backend : str
+            盤の内部表現。 'list' か 'bitboard'
+        max_moves : int
+            １局に指す手数の上限
+        seed : int
+            乱数の種。 i 番の子プロセスは seed + i を使う。ナンなら、ここで乱数で決める
+        """
+        self._workers = workers
+        self._board_backend = board_backend
+        self._max_moves = max_moves
+
+        # fork した子プロセスは親の乱数の状態を引き継ぐので、種を変えないと全て同じ棋譜になる
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+
+        self._seed = seed
+
+
+    @property
+    def seed(self):
+        """乱数の種。 i 番の子プロセスは seed + i を使う"""
+        return self._seed
+
+
+    def run(self, games, info_printer=print):
+        """連続して自己対局する
+
+        Parameters
+        ----------
+        games : int
+            対局数
+        info_printer : function
+            途中の集計を出力する関数。 SelfPlayRunner.run() と同じく１０局毎に出力する
+
+        Returns
+        -------
+        result : SelfPlayResult
+            対局結果の集計
+        """
+
+        result_queue = multiprocessing.Queue()
+        workers = max(min(self._workers, games), 1)
+
+        # 対局を子プロセスに等分する。割り切れなければ、番号の小さい子プロセスが１局多く指す
+        processes = [
+            multiprocessing.Process(
+                target=_play_games_in_worker,
+                args=(games // workers + (1 if i < games % workers else 0), self._board_backend, self._max_moves, self._seed + i, result_queue),
+                daemon=True)
+            for i in range(0, workers)]
+
+        for process in processes:
+            process.start()
+
+        result = SelfPlayResult()
+        finished_workers = 0
+
+        while finished_workers < workers:
+            outcome_name = result_queue.get()
+
+            if outcome_name is None:
+                finished_workers += 1
+                continue
+
+            result.add_outcome(outcome_name)
+
+            i = result.games - 1
+            if i < games - _SUMMARY_INTERVAL_GAMES and i % _SUMMARY_INTERVAL_GAMES == _SUMMARY_INTERVAL_GAMES - 1:
+                info_printer(result.stringify_summary_and_save())
+
+        for process in processes:
+            process.join()
+
+        if result.games != games:
+            raise ValueError(f"some workers failed  {result.games=}  {games=}")
+
+        return result
@@ -0,0 +1,175 @@
+import math
+
+
+# 帰無仮説 H0 のイロレーティング差の既定値
+DEFAULT_ELO0 = 0
+
+# 対立仮説 H1 のイロレーティング差の既定値
+DEFAULT_ELO1 = 10
+
+# 第一種の誤り（H0 が正しいのに H1 を採る）の確率の既定値
+DEFAULT_ALPHA = 0.05
+
+# 第二種の誤り（H1 が正しいのに H0 を採る）の確率の既定値
+DEFAULT_BETA = 0.05
+
+# 検定が決まらなくても、これだけ対局したら止める対局数の既定値
+DEFAULT_SPRT_MAX_GAMES = 10000
+
+# 信頼区間 95% の、標準正規分布の分位点
+_Z_95 = 1.96
+
+# 検定の結果
+SPRT_ACCEPT_H0 = 'H0'
+SPRT_ACCEPT_H1 = 'H1'
+
+
+class Sprt():
+    """逐次確率比検定（SPRT）
+
+    ０番のエンジンの、１番のエンジンに対するイロレーティング差が elo0 （H0）か elo1 （H1）かを、
+    勝ち、負け、引き分けの数から検定する。
+    ビナーシは白にコミがあって引き分けがほとんど無いので、引き分けは半分勝ち、半分負けとして、
+    １局毎に勝つ確率が H0 、 H1 の期待得点率になる二項分布で対数尤度比（LLR）を求める。
+    得点率を正規分布で近似するより、対局が少ないうちや全勝のときにも正しい値になる
+    """
+
+
+    def __init__(self, elo0=DEFAULT_ELO0, elo1=DEFAULT_ELO1, alpha=DEFAULT_ALPHA, beta=DEFAULT_BETA):
+        """初期化
+
+        Parameters
+        ----------
+        elo0 : float
+            帰無仮説 H0 のイロレーティング差
+        elo1 : float
+            対立仮説 H1 のイロレーティング差
+        alpha : float
+            第一種の誤りの確率
+        beta : float
+            第二種の誤りの確率
+        """
+
+        if elo1 <= elo0:
+            raise ValueError(f"elo1 must be greater than elo0  {elo0=}  {elo1=}")
+
+        self._elo0 = elo0
+        self._elo1 = elo1
+        self._alpha = alpha
+        self._beta = beta
+
+        # 対数尤度比が、これを下回れば H0 、上回れば H1 を採る
+        self._lower_bound = math.log(beta / (1 - alpha))
+        self._upper_bound = math.log((1 - beta) / alpha)
+
+        # H0 、 H1 の期待得点率
+        self._score0 = Sprt.elo_to_score(elo0)
+        self._score1 = Sprt.elo_to_score(elo1)
+
+
+    @property
+    def lower_bound(self):
+        """対数尤度比が、これを下回れば H0 を採る"""
+        return self._lower_bound
+
+
+    @property
+    def upper_bound(self):
+        """対数尤度比が、これを上回れば H1 を採る"""
+        return self._upper_bound
+
+
+    @staticmethod
+    def elo_to_score(elo):
+        """イロレーティング差を、期待得点率にする"""
+        return 1 / (1 + 10 ** (-elo / 400))
+
+
+    @staticmethod
+    def score_to_elo(score):
+        """期待得点率を、イロレーティング差にする。 0 や 1 は少し内側に寄せる"""
+        score = min(max(score, 0.001), 0.999)
+        return -400 * math.log10(1 / score - 1)
+
+
+    @staticmethod
+    def calculate_score_and_variance(wins, losses, draws):
+        """得点率の平均と、１局あたりの分散
+
+        Returns
+        -------
+        score : float
+            得点率。勝ちを 1 、引き分けを 0.5 、負けを 0 とした平均
+        variance : float
+            １局の得点の分散
+        """
+
+        games = wins + losses + draws
+        score = (wins + draws / 2) / games
+        variance = (wins + draws / 4) / games - score ** 2
+
+        return score, variance
+
+
+    def calculate_llr(self, wins, losses, draws):
+        """対数尤度比（LLR）。正なら H1 、負なら H0 の方がもっともらしい"""
+
+        points = wins + draws / 2
+        lost_points = losses + draws / 2
+
+        return (points * math.log(self._score1 / self._score0) +
+                lost_points * math.log((1 - self._score1) / (1 - self._score0)))
+
+
+    def test(self, wins, losses, draws):
+        """検定する
+
+        Returns
+        -------
+        accepted : str
+            H0 を採ったら 'H0' 、 H1 を採ったら 'H1' 、まだ決まらなければナン
+        """
+
+        llr = self.calculate_llr(wins, losses, draws)
+
+        if llr <= self._lower_bound:
+            return SPRT_ACCEPT_H0
+
+        if self._upper_bound <= llr:
+            return SPRT_ACCEPT_H1
+
+        return None
+
+
+    @staticmethod
+    def estimate_elo(wins, losses, draws):
+        """イロレーティング差の推定値と、信頼区間 95% の誤差
+
+        Returns
+        -------
+        elo : float
+            推定値
+        elo_error : float
+            信頼区間 95% の幅の半分
+        """
+
+        games = wins + losses + draws
+        if games < 1:
+            return 0.0, 0.0
+
+        (score, variance) = Sprt.calculate_score_and_variance(wins, losses, draws)
+        score_error = _Z_95 * math.sqrt(max(variance, 0) / games)
+
+        elo = Sprt.score_to_elo(score)
+        elo_error = (Sprt.score_to_elo(score + score_error) - Sprt.score_to_elo(score - score_error)) / 2
+
+        return elo, elo_error
+
+
+    def stringify_status(self, wins, losses, draws):
+        """途中経過の文字列生成。例： "W-L-D 30-20-0  LLR 1.23 [-2.94, 2.94]  Elo 70.4 +/- 98.1" """
+
+        llr = self.calculate_llr(wins, losses, draws)
+        (elo, elo_error) = Sprt.estimate_elo(wins, losses, draws)
+
+        return f"W-L-D {wins}-{losses}-{draws}  LLR {llr:.2f} [{self._lower_bound:.2f}, {self._upper_bound:.2f}]  Elo {elo:.1f} +/- {elo_error:.1f}"
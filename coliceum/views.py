@@ -330,7 +330,7 @@ MOVES FOR EDIT
 
 
     @staticmethod
-    def stringify_mate1(board, searched_clear_targets):
+    def stringify_mate1(board):
         """１手詰めがあれば、その手をどれか１つ表示"""
 
         legal_moves = SearchLegalMoves.generate_legal_moves(board)
@@ -338,8 +338,7 @@ MOVES FOR EDIT
         # 一手詰めの手を返す。無ければナンを返す
         mate_move_in_1ply = SearchMateMoveIn1Play.find_mate_move_in_1ply(
             board=board,
-            move_list=legal_moves.distinct_items,
-            searched_clear_targets=searched_clear_targets)
+            move_list=legal_moves.distinct_items)
 
         text_lines = []
 
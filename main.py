@@ -1,11 +1,22 @@
 # python main.py
+import sys
+from py_binarsi import BOARD_BACKEND_LIST
 from usi_engine import UsiEngine
 
 
 if __name__ == '__main__':
     """コマンドから実行時"""
     try:
-        usi_engine = UsiEngine()
+        # 盤の内部表現は、コマンドライン引数で選べる
+        #
+        #   例： python main.py bitboard
+        #
+        if 1 < len(sys.argv):
+            board_backend = sys.argv[1]
+        else:
+            board_backend = BOARD_BACKEND_LIST
+
+        usi_engine = UsiEngine(board_backend=board_backend)
         usi_engine.usi_loop()
 
     except Exception as err:
@@ -1,5 +1,7 @@
 import re
 import copy
+import random
+import time
 
 
 # コミ
@@ -68,6 +70,20 @@ _num_to_rank_str = {
 # クリアーターゲットの数
 CLEAR_TARGETS_LEN = 6
 
+# 指し手番号
+#
+#   下位ビットから順に、路番号（４ビット）、演算子番号（５ビット）、路ロック解除フラグ（１ビット）、盤面編集フラグ（１ビット）。
+#   石の並び（$記号の後ろ）は含まない
+#
+MOVE_ID_LEN = 1 << 11
+
+# 盤の内部表現
+#
+#   Board.make_new_obj() の引数に使う
+#
+BOARD_BACKEND_LIST = 'list'
+BOARD_BACKEND_BITBOARD = 'bitboard'
+
 
 class Colors():
     """石の色"""
@@ -244,6 +260,14 @@ class Way():
         self._axis_id = axis_id
         self._number = number
 
+        # 路番号
+        if axis_id == FILE_AXIS:
+            self._index = number
+        elif axis_id == RANK_AXIS:
+            self._index = FILE_LEN + number
+        else:
+            self._index = -1
+
 
     @classmethod
     @property
@@ -271,6 +295,16 @@ class Way():
         return self._axis_id
 
 
+    @property
+    def index(self):
+        """路番号
+
+        筋は 0 ～ 6、段は 7 ～ 12。 Way.characters の並び順と同じ。
+        存在しない路は -1
+        """
+        return self._index
+
+
     @property
     def number(self):
 
@@ -429,6 +463,121 @@ _all_ways = []
 for way_u in Way.characters:
     _all_ways.append(Way.code_to_obj(way_u))
 
+# 路番号から、その路上のマス番号のリスト（路の小さい方から順）
+_way_squares_list = []
+for _way in _all_ways:
+    _axes_absorber = _way.absorb_axes()
+    _way_squares_list.append([
+        Square.file_rank_to_sq(_way.number, _i, swap=_axes_absorber.swap_axes)
+        for _i in range(0, _axes_absorber.opponent_axis_length)])
+
+# マス番号から、そのマスを通る路の路番号と、その路のパターン上のビットのリスト
+_sq_to_way_bits = [[] for _ in range(0, BOARD_AREA)]
+for _way in _all_ways:
+    for _i, _sq in enumerate(_way_squares_list[_way.index]):
+        _sq_to_way_bits[_sq].append((_way.index, 1 << _i))
+
+# [路番号][路のパターン] で、パターンのビットが立っているマスの、マス番号 sq のビットを立てたもの
+_way_pattern_to_square_bits = []
+for _way in _all_ways:
+    _way_squares = _way_squares_list[_way.index]
+    _table = [0] * (1 << len(_way_squares))
+    for _pattern in range(1, len(_table)):
+        _low_bit = _pattern & -_pattern
+        _table[_pattern] = _table[_pattern ^ _low_bit] | (1 << _way_squares[_low_bit.bit_length() - 1])
+    _way_pattern_to_square_bits.append(_table)
+
+# 路の符号から路番号
+_way_code_to_index = {}
+for _way in _all_ways:
+    _way_code_to_index[_way.to_code()] = _way.index
+
+# 上下反転、左右反転、１８０°回転した先のマス番号
+_upside_down_sq = [0] * BOARD_AREA
+_flip_left_and_right_sq = [0] * BOARD_AREA
+_rotate_180_sq = [0] * BOARD_AREA
+for _file in range(0, FILE_LEN):
+    for _rank in range(0, RANK_LEN):
+        _sq = Square.file_rank_to_sq(_file, _rank)
+        _upside_down_sq[_sq] = Square.file_rank_to_sq(_file, RANK_LEN - _rank - 1)
+        _flip_left_and_right_sq[_sq] = Square.file_rank_to_sq(FILE_LEN - _file - 1, _rank)
+        _rotate_180_sq[_sq] = Square.file_rank_to_sq(FILE_LEN - _file - 1, RANK_LEN - _rank - 1)
+
+# 上下反転、左右反転、１８０°回転した先の路番号
+#
+#   上下反転では段だけが、左右反転では筋だけが入れ替わる。１８０°回転では両方が入れ替わる
+#
+_upside_down_way_index = []
+_flip_left_and_right_way_index = []
+_rotate_180_way_index = []
+for _way in _all_ways:
+    if _way.is_file:
+        _upside_down_way_index.append(_way.index)
+        _flip_left_and_right_way_index.append(FILE_LEN - _way.number - 1)
+        _rotate_180_way_index.append(FILE_LEN - _way.number - 1)
+    else:
+        _upside_down_way_index.append(FILE_LEN + RANK_LEN - _way.number - 1)
+        _flip_left_and_right_way_index.append(_way.index)
+        _rotate_180_way_index.append(FILE_LEN + RANK_LEN - _way.number - 1)
+
+# ゾブリスト・ハッシュ用の乱数
+#
+#   局面を６４ビットの整数で表すためのもの。
+#   プロセスが変わっても同じ値になるよう、シードは固定する
+#
+_zobrist_random = random.Random(20240901)
+
+# [石の色][マス番号]。空欄は 0
+_zobrist_squares = [[0] * BOARD_AREA for _ in range(0, 3)]
+for _color in [C_BLACK, C_WHITE]:
+    for _sq in range(0, BOARD_AREA):
+        _zobrist_squares[_color][_sq] = _zobrist_random.getrandbits(64)
+
+# [石の色][マス番号]。上下反転、左右反転、１８０°回転した盤面のキーを作るためのもの
+_zobrist_squares_upside_down = [[0] * BOARD_AREA for _ in range(0, 3)]
+_zobrist_squares_flip_left_and_right = [[0] * BOARD_AREA for _ in range(0, 3)]
+_zobrist_squares_rotate_180 = [[0] * BOARD_AREA for _ in range(0, 3)]
+for _color in [C_BLACK, C_WHITE]:
+    for _sq in range(0, BOARD_AREA):
+        _zobrist_squares_upside_down[_color][_sq] = _zobrist_squares[_color][_upside_down_sq[_sq]]
+        _zobrist_squares_flip_left_and_right[_color][_sq] = _zobrist_squares[_color][_flip_left_and_right_sq[_sq]]
+        _zobrist_squares_rotate_180[_color][_sq] = _zobrist_squares[_color][_rotate_180_sq[_sq]]
+
+# [通常、上下反転、左右反転、１８０°回転][石の色][路番号][路のパターン]
+#
+#   路のパターンのビットが立っているマスに石がある分の、ゾブリスト・ハッシュの XOR。
+#   路上の石がどう変わったかから、盤を変えずに指した後のキーを求めるためのもの
+#
+_zobrist_way_patterns = []
+for _zobrist_squares_of_kind in [_zobrist_squares, _zobrist_squares_upside_down, _zobrist_squares_flip_left_and_right, _zobrist_squares_rotate_180]:
+    _tables_by_color = [None] * 3
+    for _color in [C_BLACK, C_WHITE]:
+        _tables_by_color[_color] = []
+        for _way in _all_ways:
+            _way_squares = _way_squares_list[_way.index]
+            _table = [0] * (1 << len(_way_squares))
+            for _pattern in range(1, len(_table)):
+                _low_bit = _pattern & -_pattern
+                _table[_pattern] = _table[_pattern ^ _low_bit] ^ _zobrist_squares_of_kind[_color][_way_squares[_low_bit.bit_length() - 1]]
+            _tables_by_color[_color].append(_table)
+    _zobrist_way_patterns.append(_tables_by_color)
+
+# [路番号]
+_zobrist_way_locks = [_zobrist_random.getrandbits(64) for _ in _all_ways]
+
+# 白番
+_zobrist_white_turn = _zobrist_random.getrandbits(64)
+
+# [達成済みクリアーターゲット番号のビット]
+#
+#   クリアーターゲット毎の乱数の、ビットが立っている分の XOR
+#
+_zobrist_clear_targets = [_zobrist_random.getrandbits(64) for _ in range(0, CLEAR_TARGETS_LEN)]
+_zobrist_clear_targets_bits = [0] * (1 << CLEAR_TARGETS_LEN)
+for _bits in range(1, 1 << CLEAR_TARGETS_LEN):
+    _low_bit = _bits & -_bits
+    _zobrist_clear_targets_bits[_bits] = _zobrist_clear_targets_bits[_bits ^ _low_bit] ^ _zobrist_clear_targets[_low_bit.bit_length() - 1]
+
 
 class WaySegment():
     """路上の線分"""
@@ -455,6 +604,33 @@ class WaySegment():
         return self._length
 
 
+# 路のパターンから、石の連なりの開始位置と長さ
+#
+#   路上の位置 i の石の有無を 1 << i のビットで表したものを［路のパターン］と呼ぶ。
+#   最初に見つかった連だけを見る
+#
+_pattern_to_way_segment = []
+for _pattern in range(0, 1 << FILE_LEN):
+    _begin = 0
+    _length = 0
+    _state = 0
+    for _i in range(0, FILE_LEN):
+        if _state == 0:
+            if _pattern & (1 << _i):
+                _begin = _i
+                _state = 1
+
+        elif _state == 1:
+            if not _pattern & (1 << _i):
+                _length = _i - _begin
+                _state = 2
+
+    if _state == 1:
+        _length = FILE_LEN - _begin
+
+    _pattern_to_way_segment.append(WaySegment(_begin, _length))
+
+
 class Operator():
     """演算子
 
@@ -494,6 +670,13 @@ class Operator():
         pass
     """
 
+    # 演算子の語幹。並び順が演算子番号になる
+    _stems = ['c', 'e', 's1', 's2', 's3', 's4', 's5', 's6', 'n', 'nL', 'nH', 'ze', 'no', 'xo', 'na', 'a', 'xn', 'o', 'on']
+
+
+    _code_to_obj = None
+
+
     def __init__(self, stem_u, parameter_length):
         """初期化
         
@@ -506,6 +689,13 @@ class Operator():
         """
         self._stem_u = stem_u
         self._parameter_length = parameter_length
+        self._index = Operator._stems.index(stem_u)
+
+
+    @classmethod
+    @property
+    def stems(clazz):
+        return clazz._stems
 
 
     @property
@@ -513,20 +703,35 @@ class Operator():
         return self._stem_u
 
 
+    @property
+    def index(self):
+        """演算子番号。 Operator.stems の並び順"""
+        return self._index
+
+
     @property
     def parameter_length(self):
         return self._parameter_length
 
 
-    @staticmethod
-    def code_to_obj(code):
+    @classmethod
+    def code_to_obj(clazz, code):
         """コードからオブジェクトへ変換
-        
+
+        一度作ったオブジェクトは使い回す
+
         Parameters
         ----------
         code : str
             コード（演算子語幹部、路ロック指定は含まない）
         """
+
+        if clazz._code_to_obj is None:
+            clazz._code_to_obj = {}
+
+        if code in clazz._code_to_obj:
+            return clazz._code_to_obj[code]
+
         # フォーマットチェック
         #
         #   文字数が短い方が先にマッチしてしまうかもしれないので、短い文字列は右に置くように並び順に注意
@@ -552,10 +757,13 @@ class Operator():
         else:
             raise ValueError(f"undefined operator: {code=}")
 
-        return Operator(
+        operator = Operator(
             stem_u=stem_u,
             parameter_length=parameter_length)
 
+        clazz._code_to_obj[code] = operator
+        return operator
+
 
     @property
     def code(self):
@@ -744,6 +952,56 @@ class Move():
         self._when_edit = when_edit
         self._same_move_u = same_move_u
 
+        # 指し手番号
+        if way is None or way.is_empty:
+            self._id = -1
+        else:
+            self._id = Move.make_id(way.index, operator.index, is_way_unlock, when_edit)
+
+
+    @staticmethod
+    def make_id(way_index, operator_index, is_way_unlock=False, when_edit=False):
+        """指し手番号を作成
+
+        Parameters
+        ----------
+        way_index : int
+            路番号
+        operator_index : int
+            演算子番号
+        is_way_unlock : bool
+            路ロック解除フラグ
+        when_edit : bool
+            盤面編集フラグ
+        """
+        return way_index | operator_index << 4 | int(is_way_unlock) << 9 | int(when_edit) << 10
+
+
+    @staticmethod
+    def id_to_obj(move_id):
+        """指し手番号から、表に載っている指し手オブジェクトを取得"""
+        move = _all_moves[move_id]
+
+        if move is None:
+            raise ValueError(f"undefined move id  {move_id=}")
+
+        return move
+
+
+    @staticmethod
+    def way_operator_to_obj(way, operator_u, is_way_unlock=False, when_edit=False):
+        """路と演算子コードから、表に載っている指し手オブジェクトを取得
+
+        例： Move.way_operator_to_obj(way, 'xo')
+        """
+        return _all_moves[Move.make_id(way.index, Operator.code_to_obj(operator_u).index, is_way_unlock, when_edit)]
+
+
+    @property
+    def id(self):
+        """指し手番号。石の並びは含まない。パスは -1"""
+        return self._id
+
 
     @property
     def way(self):
@@ -795,6 +1053,11 @@ class Move():
 
     @classmethod
     def validate_code(clazz, code, can_panic=False):
+
+        # 表に載っている指し手なら、正規表現は使わない
+        if code in _code_to_move:
+            return True
+
         result = clazz._re_move.match(code)
 
         if can_panic:
@@ -807,6 +1070,10 @@ class Move():
     @classmethod
     def code_to_obj(clazz, code):
 
+        # 表に載っている指し手なら、それを返す
+        if code in _code_to_move:
+            return _code_to_move[code]
+
         # パス
         if code == 'pass':
             return Move(
@@ -882,6 +1149,10 @@ class Move():
         """編集モードのフラグを立てたコピー・オブジェクトを返却します"""
         instance = copy.copy(self)
         instance._when_edit = True
+
+        if instance._id != -1:
+            instance._id = Move.make_id(self._way.index, self._operator.index, instance._is_way_unlock, instance._when_edit)
+
         return instance
 
 
@@ -889,6 +1160,10 @@ class Move():
         """開錠フラグを立てたコピー・オブジェクトを返却します"""
         instance = copy.copy(self)
         instance._is_way_unlock = True
+
+        if instance._id != -1:
+            instance._id = Move.make_id(self._way.index, self._operator.index, instance._is_way_unlock, instance._when_edit)
+
         return instance
 
 
@@ -905,6 +1180,29 @@ class Move():
         return instance
 
 
+# 全ての指し手（石の並びを除く）を、指し手番号の位置に生成しておく
+#
+#   指し手番号が飛び飛びになるところはナン
+#
+_all_moves = [None] * MOVE_ID_LEN
+
+# 指し手コードから指し手オブジェクトへの表
+_code_to_move = {}
+
+for _way in _all_ways:
+    for _stem_u in Operator.stems:
+        for _when_edit in [False, True]:
+            for _is_way_unlock in [False, True]:
+                _move = Move(
+                    way=_way,
+                    operator=Operator.code_to_obj(_stem_u),
+                    is_way_unlock=_is_way_unlock,
+                    when_edit=_when_edit)
+
+                _all_moves[_move.id] = _move
+                _code_to_move[_move.to_code()] = _move
+
+
 class MoveHelper():
     """指し手の計算"""
 
@@ -1261,7 +1559,7 @@ class Sfen():
 class BoardEditingItem():
     """盤面編集記録"""
 
-    def __init__(self, move, stones_before_change=''):
+    def __init__(self, move, stones_before_change='', squares_before_change=None, way_lock_before_change=False):
         """初期化
         
         Parameters
@@ -1270,9 +1568,19 @@ class BoardEditingItem():
             指し手
         stones_before_change : str
             裏返して消えた石
+        squares_before_change : object
+            一手戻すための、変更前の盤面の記録。中身は盤の内部表現による
+            Board.save_squares_for_undo() の戻り値
+        way_lock_before_change : bool
+            一手戻すための、変更前の対象路の路ロック
         """
         self._move = move
         self._stones_before_change = stones_before_change
+        self._squares_before_change = squares_before_change
+        self._way_lock_before_change = way_lock_before_change
+
+        # 一手戻すための、この指し手で新たに達成したクリアーターゲット番号のビットを立てたもの
+        self._achieved_clear_targets = 0
 
 
     @property
@@ -1287,6 +1595,29 @@ class BoardEditingItem():
         return self._stones_before_change
 
 
+    @property
+    def squares_before_change(self):
+        """一手戻すための、変更前の盤面の記録"""
+        return self._squares_before_change
+
+
+    @property
+    def way_lock_before_change(self):
+        """一手戻すための、変更前の対象路の路ロック"""
+        return self._way_lock_before_change
+
+
+    @property
+    def achieved_clear_targets(self):
+        """一手戻すための、この指し手で新たに達成したクリアーターゲット番号のビットを立てたもの"""
+        return self._achieved_clear_targets
+
+
+    @achieved_clear_targets.setter
+    def achieved_clear_targets(self, value):
+        self._achieved_clear_targets = value
+
+
 class BoardEditingHistory():
     """盤面編集履歴"""
 
@@ -1318,16 +1649,18 @@ class BoardEditingHistory():
         """要素を追加"""
         self._items.append(item)
 
-        # キャッシュを破棄
-        self._cached_game_items = None
+        # キャッシュも更新（作り直すと遅いので）
+        if self._cached_game_items is not None and not item.move.when_edit:
+            self._cached_game_items.append(item)
 
 
     def pop(self):
         """要素を削除"""
         item = self._items.pop()
 
-        # キャッシュを破棄
-        self._cached_game_items = None
+        # キャッシュも更新（作り直すと遅いので）
+        if self._cached_game_items is not None and not item.move.when_edit:
+            self._cached_game_items.pop()
 
         return item
 
@@ -1336,7 +1669,20 @@ class LegalMoves():
     """合法手"""
 
 
-    def __init__(self, board):
+    def __init__(self, board, distinct_by_canonical_key=False, debug_push_and_pop=False):
+        """初期化
+
+        Parameters
+        ----------
+        board : Board
+            盤
+        distinct_by_canonical_key : bool
+            真なら、指した結果が互いに対称形になる指し手同士も、結果が同じになる指し手として扱う
+        debug_push_and_pop : bool
+            （デバッグ用）真なら、指し手を追加する度に実際に一手指して戻し、
+            盤を変えずに求めたハッシュと一致するか、一手戻せたかを確かめる
+        """
+
         self._items = []
 
         # 現局面の盤面編集用の手（合法手除く）
@@ -1351,35 +1697,34 @@ class LegalMoves():
         # 結果が同じになる指し手を除外した指し手のリスト
         self._distinct_items = []
 
-        # 一手指す前に、現局面が載っている sfen を取得しておく
+        # 一手指す前に、現局面のゾブリスト・ハッシュを取得しておく
         #
-        #   例： 7/7/2o4/2x4/7/7 b - - 1
+        #   ［路ロック一覧］は含めない。［クリアー済ターゲット一覧］、［何手目か？］は元から含まない
         #
-        #   ここで、末尾の［何手目か？］は必ず変わってしまうので、それは省いておく
-        #
-        sub_sfen_1_before_push = board.as_sfen(from_present=True)
-        sub_sfen_2_before_push = sub_sfen_1_before_push.to_upside_down()
-        sub_sfen_3_before_push = sub_sfen_1_before_push.to_flip_left_and_right()
-
-        # 現局面で指す前の盤面の部分SFEN文字列
-        self._sub_sfen_u_before_push_normal = sub_sfen_1_before_push.to_code(without_way_lock=True, without_clear_targets_list=True, without_moves_number=True)
+        (key_before_push_normal,
+         key_before_push_upside_down,
+         key_before_push_flip_left_and_right,
+         _) = board.get_zobrist_keys(without_way_lock=True)
 
-        # 現局面で指す前の盤面の部分SFEN文字列（上下反転）
-        self._sub_sfen_u_before_push_upside_down = sub_sfen_2_before_push.to_code(without_way_lock=True, without_clear_targets_list=True, without_moves_number=True)
+        # 指し手同士の比較に、対称形を同一視したキーを使うか
+        self._distinct_by_canonical_key = distinct_by_canonical_key
 
-        # 現局面で指す前の盤面の部分SFEN文字列（左右反転）
-        self._sub_sfen_u_before_push_flip_left_and_right = sub_sfen_3_before_push.to_code(without_way_lock=True, without_clear_targets_list=True, without_moves_number=True)
+        # （デバッグ用）実際に一手指して戻して確かめるか
+        self._debug_push_and_pop = debug_push_and_pop
 
-        #print(f"[LegalMoves > __init__] {self._sub_sfen_u_before_push_normal=}")
-        #print(f"[LegalMoves > __init__] {self._sub_sfen_u_before_push_upside_down=}")
-        #print(f"[LegalMoves > __init__] {self._sub_sfen_u_before_push_flip_left_and_right=}")
+        # 一手戻せたかの確認用に、現局面の（［路ロック一覧］も含めた）ゾブリスト・ハッシュ
+        self._key_before_push = board.zobrist_key
 
-        self._sfen_memory_dict = {}
+        # 一手指した後の盤面のゾブリスト・ハッシュと、その指し手の符号の辞書
+        self._key_memory_dict = {}
 
         # 現局面と同じになる指し手も省きたいので、内部的に pass として追加している
-        self._sfen_memory_dict[self._sub_sfen_u_before_push_normal] = 'pass'
-        self._sfen_memory_dict[self._sub_sfen_u_before_push_upside_down] = 'pass'
-        self._sfen_memory_dict[self._sub_sfen_u_before_push_flip_left_and_right] = 'pass'
+        self._key_memory_dict[key_before_push_normal] = 'pass'
+        self._key_memory_dict[key_before_push_upside_down] = 'pass'
+        self._key_memory_dict[key_before_push_flip_left_and_right] = 'pass'
+
+        if distinct_by_canonical_key:
+            self._key_memory_dict[board.canonical_key(without_way_lock=True)] = 'pass'
 
 
     @property
@@ -1410,71 +1755,80 @@ class LegalMoves():
             指し手
         for_edit : bool
             盤面編集用
+
+        Returns
+        -------
+        is_distinct : bool
+            結果が同じになる指し手を除外した指し手のリストに追加したか？
         """
 
+        is_distinct = False
+
         if for_edit:
             self._items_for_edit.append(move)
 
         else:
-            # TODO とりあえず、逆操作が実装されている演算だけ調べる
+            # 盤を変えずに指した後の局面を求められる演算だけ調べる
             # １～６ビットシフト、ノット、ノットＬ、ノットＨ、アンド、オア、エクソア、ナンド、ノア、エクスノア、ゼロ、ワン
             if move.operator.code in ['s1', 's2', 's3', 's4', 's5', 's6', 'n', 'nH', 'nL', 'a', 'o', 'xo', 'na', 'no', 'xn', 'ze', 'on']:
 
-                # DO 一手指す
-                #print(f"[LegalMoves > append] 一手指す  {move.to_code()=}")
-                board.push_usi(move.to_code())  # 指し手生成中では、クリアーターゲットは更新しません
+                # DO 盤を変えずに、指した後の盤面のゾブリスト・ハッシュ（［路ロック一覧］は含めない）を求める
+                keys_after_move = board.get_zobrist_keys_after_move(move, without_way_lock=True)
+
+                # DEBUG 実際に一手指して戻して確かめる
+                if self._debug_push_and_pop:
+                    self.check_by_push_and_pop(board, move, keys_after_move)
 
-                # DO 一般的に長さが短い方の形式の SFEN を記憶
-                #
-                #   例： 7/7/2x4/2o4/7/7 b 3 2
-                #
-                #   ここで、末尾の［何手目か？］は必ず変わってしまうので、それは省いておく
-                #
-                sub_sfen_after_push_u = board.as_sfen(from_present=True).to_code(without_way_lock=True, without_clear_targets_list=True, without_moves_number=True)
-                #print(f"[LegalMoves > append] 一般的に長さが短い方の形式の SFEN を記憶  {sub_sfen_after_push_u=}")
+                if self._distinct_by_canonical_key:
+                    key_after_move = min(keys_after_move)
+                else:
+                    key_after_move = keys_after_move[0]
 
-                # DO 既に記憶している SFEN と重複すれば、演算した結果が同じだ。重複を記憶しておく
-                if sub_sfen_after_push_u in self._sfen_memory_dict.keys():
-                    same_move_u = self._sfen_memory_dict[sub_sfen_after_push_u]
-                    #print(f"[LegalMoves > append] 既に記憶している SFEN と重複した。演算した結果が同じだ。重複を記憶して差し替える  {same_move_u=}  {sub_sfen_after_push_u=}")
+                # DO 既に記憶しているハッシュと重複すれば、演算した結果が同じだ。重複を記憶しておく
+                if key_after_move in self._key_memory_dict:
+                    same_move_u = self._key_memory_dict[key_after_move]
 
                     # 差し替え
                     move = move.new_with_same(same_move_u)
 
-
                 # DO 重複していなければ、一時記憶する
-                #
-                #   例： 7/7/2x4/2o4/7/7 b 3 2
-                #
-                #   ここで、末尾の［何手目か？］は必ず変わってしまうので、スプリットして省いておく
-                #
                 else:
                     self._distinct_items.append(move)
+                    self._key_memory_dict[key_after_move] = move.to_code()
+                    is_distinct = True
+
+
+            # move は差し替えしたり、しなかったりされている
+            self._items.append(move)
+
+        return is_distinct
+
 
-                    move_u = move.to_code()
-                    #print(f"[LegalMoves > append] 重複していないので、一時記憶する  {move_u=}  {sub_sfen_after_push_u=}")
-                    self._sfen_memory_dict[sub_sfen_after_push_u] = move_u
+    def check_by_push_and_pop(self, board, move, keys_after_move):
+        """（デバッグ用）実際に一手指して戻し、盤を変えずに求めたハッシュと一致するか、一手戻せたかを確かめる
 
-                # DO 一手戻す
-                #print(f"[LegalMoves > append] 一手戻す")
-                board.pop() # 指し手生成中では、クリアーターゲットは更新しません
-                #print(f"[LegalMoves > append] 一手戻した")
+        Parameters
+        ----------
+        board : Board
+            盤
+        move : Move
+            指し手
+        keys_after_move : tuple
+            盤を変えずに求めた、指した後の盤面のゾブリスト・ハッシュ（［路ロック一覧］は含めない）
+        """
 
-                # DEBUG 一手戻した後に、現局面が載っている sfen を取得する
-                rollbacked_sfen_u = board.as_sfen(from_present=True).to_code(without_way_lock=True, without_clear_targets_list=True, without_moves_number=True)
-                #
-                #   例： 7/7/2o4/2x4/7/7 b - 1
-                #
-                #   ここで、末尾の［何手目か？］は必ず変わってしまうので、それは省いておく
-                #
+        # 一手指す
+        board.push_move(move)
 
-                # DEBUG 巻き戻せていなければ例外を投げる
-                if self._sub_sfen_u_before_push_normal != rollbacked_sfen_u:
-                    raise ValueError(f"undo error  {self._sub_sfen_u_before_push_normal=}  {rollbacked_sfen_u=}")
+        if board.get_zobrist_keys(without_way_lock=True) != keys_after_move:
+            raise ValueError(f"key error  {move.to_code()=}  sfen:{board.as_sfen(from_present=True).to_code()}")
 
+        # 一手戻す
+        board.pop()
 
-            # move は差し替えしたり、しなかったりされている
-            self._items.append(move)
+        # 巻き戻せていなければ例外を投げる
+        if self._key_before_push != board.zobrist_key:
+            raise ValueError(f"undo error  {move.to_code()=}  sfen:{board.as_sfen(from_present=True).to_code()}")
 
 
 class Board():
@@ -1508,6 +1862,27 @@ class Board():
         self.subinit()
 
 
+    @staticmethod
+    def make_new_obj(backend=BOARD_BACKEND_LIST):
+        """盤を新規作成
+
+        Parameters
+        ----------
+        backend : str
+            盤の内部表現
+            'list':     マス毎の石の色のリスト。 Board
+            'bitboard': 黒石、白石それぞれ４２ビットの整数。 BitBoard
+        """
+
+        if backend == BOARD_BACKEND_LIST:
+            return Board()
+
+        if backend == BOARD_BACKEND_BITBOARD:
+            return BitBoard()
+
+        raise ValueError(f"undefined board backend  {backend=}")
+
+
     def subinit(self):
         """（サブ部分として）盤をクリアーする"""
 
@@ -1562,6 +1937,64 @@ class Board():
         # 盤面編集履歴（対局棋譜を含む）
         self._board_editing_history = BoardEditingHistory()
 
+        # 指している途中の指し手の、対象路の変更前の石
+        self._squares_before_change = None
+
+        # 現局面のクリアーターゲット一覧。［クリアーターゲット番号］で、達成したのが何手目か。未達成なら -1
+        #
+        #   push_move() で差分更新し、 pop() で元に戻す
+        #
+        self._clear_targets_list = [-1] * CLEAR_TARGETS_LEN
+
+        # 現局面で達成済みのクリアーターゲット番号のビットを立てたもの
+        #
+        #   _clear_targets_list と一緒に更新する
+        #
+        self._clear_targets_bits = 0
+
+        # 路毎の、石のあるマスのパターン
+        #
+        #   set_color() で差分更新する
+        #
+        self._occupied_patterns = [0] * len(_all_ways)
+
+        # 石のある路の、路番号のビットを立てたもの
+        #
+        #   set_color() で差分更新する
+        #
+        self._occupied_ways = 0
+
+        # 現局面の黒石、白石のあるマスの、マス番号 sq のビットを立てたもの
+        #
+        #   set_color() で差分更新する
+        #
+        self._black_bits = 0
+        self._white_bits = 0
+
+        # 現局面の盤面のゾブリスト・ハッシュ（通常、上下反転、左右反転、１８０°回転）
+        #
+        #   set_color() で差分更新する
+        #
+        self._squares_key = 0
+        self._squares_key_upside_down = 0
+        self._squares_key_flip_left_and_right = 0
+        self._squares_key_rotate_180 = 0
+
+        # 現局面の路ロックのゾブリスト・ハッシュ（通常、上下反転、左右反転、１８０°回転）
+        #
+        #   set_way_lock_by_code() で差分更新する
+        #
+        self._way_locks_key = 0
+        self._way_locks_key_upside_down = 0
+        self._way_locks_key_flip_left_and_right = 0
+        self._way_locks_key_rotate_180 = 0
+
+
+    @property
+    def board_backend(self):
+        """盤の内部表現。 make_new_obj() に渡すと同じ種類の盤を作れる"""
+        return BOARD_BACKEND_LIST
+
 
     @property
     def black_count_with_komi(self):
@@ -1592,24 +2025,95 @@ class Board():
         return self._squares[sq]
 
 
+    def get_color_bits(self, color):
+        """その色の石のあるマスの、マス番号 sq のビットを立てたもの
+
+        Parameters
+        ----------
+        color : int
+            C_BLACK か C_WHITE
+        """
+        if color == C_BLACK:
+            return self._black_bits
+
+        if color == C_WHITE:
+            return self._white_bits
+
+        raise ValueError(f"unsupported color  {color=}")
+
+
+    def get_squares(self):
+        """現局面の各マスの石の色のリスト
+
+        Board では内部のリストをそのまま返すので、変更しないでください
+        """
+        return self._squares
+
+
+    def save_squares_for_undo(self, way):
+        """一手戻すときのために、対象路の変更前の石を記録する
+
+        どの演算子も、対象路の上の石しか変更しないので、対象路の上だけ記録すれば足りる
+
+        Returns
+        -------
+        squares_before_change : list
+            （マス番号, 石の色）のリスト
+        """
+        return [(sq, self._squares[sq]) for sq in _way_squares_list[way.index]]
+
+
+    def restore_squares_for_undo(self, squares_before_change):
+        """save_squares_for_undo() で記録した石に戻す
+
+        変わったマスだけ set_color() するので、石の数も元に戻る
+        """
+        for sq, color in squares_before_change:
+            if self._squares[sq] != color:
+                self.set_color(sq, color)
+
+
     def set_color(self, sq, value):
         """マス上の石の色を設定"""
 
+        bit = 1 << sq
+
         # 盤上から消える石
         old_color = self._squares[sq]
 
         if old_color == C_BLACK:
             self._black_count_with_komi -= 1
+            self._black_bits ^= bit
         elif old_color == C_WHITE:
             self._white_count_with_komi -= 1
+            self._white_bits ^= bit
 
         # 盤上に増える石
         self._squares[sq] = value
 
         if value == C_BLACK:
             self._black_count_with_komi += 1
+            self._black_bits ^= bit
         elif value == C_WHITE:
             self._white_count_with_komi += 1
+            self._white_bits ^= bit
+
+        # 石のあるマスが増えたか、減ったなら、そのマスを通る筋と段を更新
+        if (old_color == C_EMPTY) != (value == C_EMPTY):
+            for (way_index, bit) in _sq_to_way_bits[sq]:
+                pattern = self._occupied_patterns[way_index] ^ bit
+                self._occupied_patterns[way_index] = pattern
+
+                if pattern != 0:
+                    self._occupied_ways |= 1 << way_index
+                else:
+                    self._occupied_ways &= ~(1 << way_index)
+
+        # ゾブリスト・ハッシュの差分更新
+        self._squares_key ^= _zobrist_squares[old_color][sq] ^ _zobrist_squares[value][sq]
+        self._squares_key_upside_down ^= _zobrist_squares_upside_down[old_color][sq] ^ _zobrist_squares_upside_down[value][sq]
+        self._squares_key_flip_left_and_right ^= _zobrist_squares_flip_left_and_right[old_color][sq] ^ _zobrist_squares_flip_left_and_right[value][sq]
+        self._squares_key_rotate_180 ^= _zobrist_squares_rotate_180[old_color][sq] ^ _zobrist_squares_rotate_180[value][sq]
 
 
     @property
@@ -1636,12 +2140,55 @@ class Board():
         return self._moves_number_at_init + len(self._board_editing_history.game_items)
 
 
+    @property
+    def clear_targets_list(self):
+        """現局面のクリアーターゲット一覧。達成したのが何手目か。未達成なら -1
+
+        内部のリストをそのまま返すので、変更しないでください
+        """
+        return self._clear_targets_list
+
+
+    @property
+    def clear_targets_bits(self):
+        """現局面で達成済みのクリアーターゲット番号のビットを立てたもの（６ビット）"""
+        return self._clear_targets_bits
+
+
+    def update_clear_targets(self, move=None):
+        """まだ達成していないクリアーターゲットを調べ、達成していれば手数を記録する
+
+        Parameters
+        ----------
+        move : Move
+            直前に指した手。指定すると、その手の対象路と交わる石の並びだけ調べる。
+            ナンなら盤全体を調べる
+
+        Returns
+        -------
+        achieved_clear_targets : int
+            新たに達成したクリアーターゲット番号のビットを立てたもの
+        """
+
+        achieved_clear_targets = 0
+
+        for index in range(0, CLEAR_TARGETS_LEN):
+            if self._clear_targets_list[index] == -1:
+                SearchedClearTargets.update_clear_target(self, self._clear_targets_list, index, move)
+
+                if self._clear_targets_list[index] != -1:
+                    achieved_clear_targets |= 1 << index
+
+        self._clear_targets_bits |= achieved_clear_targets
+        return achieved_clear_targets
+
+
     def update_squares_at_init(self):
         """初期局面を記憶（SFENで初期局面を出力したいときのためのもの）"""
         if self._squares_at_init is None:
-            self._squares_at_init = list(self._squares)
-            self._black_count_with_komi_at_init = self._black_count_with_komi
-            self._white_count_with_komi_at_init = self._white_count_with_komi
+            self._squares_at_init = list(self.get_squares())
+            self._black_count_with_komi_at_init = self.black_count_with_komi
+            self._white_count_with_komi_at_init = self.white_count_with_komi
 
 
     def clear(self):
@@ -1660,6 +2207,15 @@ class Board():
 
     def set_way_lock_by_code(self, way_u, value, is_it_init=False):
         """路ロックする"""
+
+        # ゾブリスト・ハッシュの差分更新
+        if self._way_locks[way_u] != value:
+            way_index = _way_code_to_index[way_u]
+            self._way_locks_key ^= _zobrist_way_locks[way_index]
+            self._way_locks_key_upside_down ^= _zobrist_way_locks[_upside_down_way_index[way_index]]
+            self._way_locks_key_flip_left_and_right ^= _zobrist_way_locks[_flip_left_and_right_way_index[way_index]]
+            self._way_locks_key_rotate_180 ^= _zobrist_way_locks[_rotate_180_way_index[way_index]]
+
         self._way_locks[way_u] = value
         if is_it_init:
             self._way_locks_at_init[way_u] = value
@@ -1700,7 +2256,7 @@ class Board():
         Returns
         -------
         searched_clear_targets : SearchedClearTargets
-            クリアーターゲット
+            クリアーターゲット。盤が持っている一覧の写し
         """
 
         # 盤面の初期化
@@ -1765,8 +2321,6 @@ class Board():
 
         # 添付盤面でのクリアー済ターゲット一覧
         # ---------------------------------
-        clear_targets_list = [-1] * CLEAR_TARGETS_LEN
-
         if parts[3] != '-':
             # 勝利条件をクリアーしたのが何手目か、６つの要素がスラッシュ区切りで入っている。クリアーしていなければ空文字列
             tokens = parts[3].split('/')
@@ -1775,48 +2329,101 @@ class Board():
                 token = tokens[i]
 
                 if 0 < len(token):
-                    clear_targets_list[i] = int(token)
-
-        searched_clear_targets = SearchedClearTargets(
-            clear_targets_list=clear_targets_list)
+                    self._clear_targets_list[i] = int(token)
+                    self._clear_targets_bits |= 1 << i
 
         # 手数の解析
         # ---------
         self._moves_number_at_init = int(parts[4])
 
+        # 添付盤面に既に並んでいるのに、一覧に記録されていないクリアーターゲットは、添付盤面の手数で達成したものとする
+        #
+        #   以後は push_move() で、指した手の対象路の周りだけ調べればよくなる
+        #
+        self.update_clear_targets()
 
-        return searched_clear_targets
 
+        return SearchedClearTargets(
+            clear_targets_list=list(self._clear_targets_list))
 
-    def exists_stone_on_way(self, way):
-        """指定の路に石が置いてあるか？
-        
-        get_stone_segment_on_way() よりは高速と思います
 
-        Parameters
-        ----------
-        way : Way
-            路オブジェクト
-        """
+    def as_compact(self):
+        """現局面を、整数だけのタプルにしたもの
 
-        if way.is_empty:
-            return False
+        別プロセスへ局面を渡すためのもの。棋譜は含まない。 set_compact() で戻せる
 
-        # 筋（段）方向両用
-        axes_absorber = way.absorb_axes()
+        Returns
+        -------
+        compact : tuple
+            （黒石のビット, 白石のビット, 路ロックの路番号のビット, 手番, 何手目か, クリアーターゲット一覧のタプル）
+        """
 
-        for i in range(0, axes_absorber.opponent_axis_length):
-            sq = Square.file_rank_to_sq(way.number, i, swap=axes_absorber.swap_axes)
-            stone = self.get_color(sq)
+        way_locks_bits = 0
+        for (way_u, way_lock) in self._way_locks.items():
+            if way_lock:
+                way_locks_bits |= 1 << _way_code_to_index[way_u]
 
-            if stone != C_EMPTY:
-                return True
-            
-        return False
+        return (self.get_color_bits(C_BLACK),
+                self.get_color_bits(C_WHITE),
+                way_locks_bits,
+                self.get_next_turn(),
+                self.moves_number,
+                tuple(self._clear_targets_list))
 
 
-    def get_stone_segment_on_way(self, way):
-        """路を指定すると、そこにある石の連なりの開始位置と長さを返す
+    def set_compact(self, compact):
+        """as_compact() で作ったタプルの局面に変更
+
+        その局面を初期局面とする
+        """
+
+        (black_bits, white_bits, way_locks_bits, next_turn, moves_number, clear_targets_list) = compact
+
+        # 盤面の初期化
+        self.subinit()
+
+        for sq in range(0, BOARD_AREA):
+            if black_bits & (1 << sq):
+                self.set_color(sq, C_BLACK)
+            elif white_bits & (1 << sq):
+                self.set_color(sq, C_WHITE)
+
+        for way in _all_ways:
+            if way_locks_bits & (1 << way.index):
+                self.set_way_lock_by_code(way.to_code(), True, is_it_init=True)
+
+        self._next_turn_at_init = next_turn
+        self._moves_number_at_init = moves_number
+
+        for index in range(0, CLEAR_TARGETS_LEN):
+            if clear_targets_list[index] != -1:
+                self._clear_targets_list[index] = clear_targets_list[index]
+                self._clear_targets_bits |= 1 << index
+
+
+    @property
+    def occupied_ways(self):
+        """石のある路の、路番号のビットを立てたもの（１３ビット）"""
+        return self._occupied_ways
+
+
+    def exists_stone_on_way(self, way):
+        """指定の路に石が置いてあるか？
+
+        Parameters
+        ----------
+        way : Way
+            路オブジェクト
+        """
+
+        if way.is_empty:
+            return False
+
+        return self._occupied_ways & (1 << way.index) != 0
+
+
+    def get_stone_segment_on_way(self, way):
+        """路を指定すると、そこにある石の連なりの開始位置と長さを返す
 
         例えば：
 
@@ -1838,43 +2445,7 @@ class Board():
         if way.is_empty:
             return WaySegment(0, 0)
 
-
-        # 筋（段）方向両用
-        axes_absorber = way.absorb_axes()
-
-        # 入力路から、出力路へ、評価値を出力
-        #
-        #   必要な変数を調べる：
-        #       最初のマージン（空欄）は無視する
-        #       最初の石の位置を覚える。変数名を begin とする
-        #       連続する石の長さを覚える。変数名を length とする
-        #       最後のマージン（空欄）は無視する
-        source_stones = [C_EMPTY] * axes_absorber.opponent_axis_length
-        state = 0
-        begin = 0
-        length = 0
-        for i in range(0, axes_absorber.opponent_axis_length):
-            src_sq = Square.file_rank_to_sq(way.number, i, swap=axes_absorber.swap_axes)
-            stone = self.get_color(src_sq)
-            source_stones[i] = stone
-
-            if state == 0:
-                # 石を見っけ
-                if stone != C_EMPTY:
-                    begin = i
-                    state = 1
-
-            elif state == 1:
-                # 石が切れた
-                if stone == C_EMPTY:
-                    length = i - begin
-                    state = 2
-
-        if state == 1:
-            length = axes_absorber.opponent_axis_length - begin
-            state = 2
-
-        return WaySegment(begin, length)
+        return _pattern_to_way_segment[self._occupied_patterns[way.index]]
 
 
     def get_colors_on_way(self, target_way, way_segment):
@@ -1940,6 +2511,72 @@ class Board():
         return stones_before_change
 
 
+    def get_patterns_on_way(self, way):
+        """路上の黒石、白石のパターンを取得
+
+        路上の位置 i の石を 1 << i のビットで表す
+
+        Returns
+        -------
+        black_pattern : int
+            黒石のパターン
+        white_pattern : int
+            白石のパターン
+        """
+
+        black_pattern = 0
+        white_pattern = 0
+
+        for (i, sq) in enumerate(_way_squares_list[way.index]):
+            color = self.get_color(sq)
+
+            if color == C_BLACK:
+                black_pattern |= 1 << i
+            elif color == C_WHITE:
+                white_pattern |= 1 << i
+
+        return (black_pattern, white_pattern)
+
+
+    def set_patterns_on_way(self, way, black_pattern, white_pattern):
+        """路上の黒石、白石のパターンを上書き"""
+
+        for (i, sq) in enumerate(_way_squares_list[way.index]):
+            if black_pattern & (1 << i):
+                color = C_BLACK
+            elif white_pattern & (1 << i):
+                color = C_WHITE
+            else:
+                color = C_EMPTY
+
+            if self.get_color(sq) != color:
+                self.set_color(sq, color)
+
+
+    @staticmethod
+    def stringify_patterns(black_pattern, white_pattern, target_pattern):
+        """路のパターンのうち、 target_pattern のビットが立っている位置の石（または空欄）の並び
+
+        他の演算で stones_before_change を作るときと同じ順（路の小さい方から）に並べる
+        """
+        stones = ''
+        i = 0
+
+        while target_pattern:
+            if target_pattern & 1:
+                if black_pattern & (1 << i):
+                    stones += Colors.as_string_board(C_BLACK)
+                elif white_pattern & (1 << i):
+                    stones += Colors.as_string_board(C_WHITE)
+                else:
+                    stones += Colors.as_string_board(C_EMPTY)
+
+            target_pattern >>= 1
+            i += 1
+
+        return stones
+
+
     def binary_operate_on_way(self, move):
         """入力路 a, b を二項演算して、 c 路へ出力
 
@@ -1955,7 +2592,172 @@ class Board():
         f | . . . . . . . |
           +---------------+
 
-        上図の a, b を二項演算した結果を c へ出力
+        上図の a, b を二項演算した結果を c へ出力。
+        マス毎に演算する代わりに、路のパターンを表引きして路全体を一度に求める
+
+        Parameters
+        ----------
+        move : Move
+            指し手
+        """
+
+        (dst_black_pattern, dst_white_pattern) = self.get_patterns_on_way(move.way)
+
+        # 対象の路に石が置いてあれば、上書きされる石を記憶
+        dst_pattern = dst_black_pattern | dst_white_pattern
+        if dst_pattern != 0:
+            stones_before_change = Board.stringify_patterns(
+                dst_black_pattern,
+                dst_white_pattern,
+                dst_pattern)
+        else:
+            stones_before_change = ''
+
+        (black_pattern, white_pattern) = self.get_patterns_on_way_after_move(move)
+        self.set_patterns_on_way(move.way, black_pattern, white_pattern)
+
+        return stones_before_change
+
+
+    @staticmethod
+    def rotate_patterns(black_pattern, white_pattern, bit_shift):
+        """路のパターンの石の連を、連の中だけで、路の大きい方へ指定ビット数だけ回転シフトする
+
+        Returns
+        -------
+        black_pattern : int
+            黒石のパターン
+        white_pattern : int
+            白石のパターン
+        """
+
+        way_segment = _pattern_to_way_segment[black_pattern | white_pattern]
+
+        begin = way_segment.begin
+        length = way_segment.length
+        bit_shift %= length
+        length_pattern = (1 << length) - 1
+        segment_pattern = length_pattern << begin
+
+        def rotate(pattern):
+            x = (pattern >> begin) & length_pattern
+            x = ((x << bit_shift) | (x >> (length - bit_shift))) & length_pattern
+            return (pattern & ~segment_pattern) | (x << begin)
+
+        return (rotate(black_pattern), rotate(white_pattern))
+
+
+    def get_patterns_on_way_after_move(self, move):
+        """一手指した後の、対象路上の黒石、白石のパターンを、盤を変えずに求める
+
+        どの演算子も対象路の石しか変えないので、指した後の盤面はこれで分かる。
+        シフト、ノット、二項演算子に対応
+
+        Parameters
+        ----------
+        move : Move
+            指し手
+
+        Returns
+        -------
+        black_pattern : int
+            黒石のパターン
+        white_pattern : int
+            白石のパターン
+        """
+
+        op = move.operator.code
+
+        # シフト
+        if op.startswith('s'):
+            (black_pattern, white_pattern) = self.get_patterns_on_way(move.way)
+            return Board.rotate_patterns(black_pattern, white_pattern, int(op[1:2]))
+
+        # ノット。隣の路の黒石と白石を入れ替えて、（石の置いてない）対象路へ出力
+        if op == 'n':
+            (src_black_pattern, src_white_pattern) = self.get_patterns_on_way(self.get_src_way_by_unary_operation(move.way))
+            return (src_white_pattern, src_black_pattern)
+
+        # ノット（Reverse）。隣の路の黒石と白石を入れ替えて、（石の置いてある）対象路へ上書き
+        if op in ['nL', 'nH']:
+            (src_black_pattern, src_white_pattern) = self.get_patterns_on_way(self.get_src_way_by_unary_operation(move.way))
+            (dst_black_pattern, dst_white_pattern) = self.get_patterns_on_way(move.way)
+            src_pattern = src_black_pattern | src_white_pattern
+            return ((dst_black_pattern & ~src_pattern) | src_white_pattern,
+                    (dst_white_pattern & ~src_pattern) | src_black_pattern)
+
+        # 二項演算子
+        binary_operate_table = _binary_operate_table[move.operator.index]
+        if binary_operate_table is not None:
+            (input_way_1, input_way_2, error_reason) = self.get_input_ways_by_binary_operation(move.way)
+
+            if input_way_1.is_empty or input_way_2.is_empty:
+                raise ValueError(f"out of bounds.  {error_reason=}  {move.to_code()=}  {input_way_1.to_code()=}  {input_way_2.to_code()=}  {self._way_locks=}")
+
+            (black_pattern_1, white_pattern_1) = self.get_patterns_on_way(input_way_1)
+            (black_pattern_2, white_pattern_2) = self.get_patterns_on_way(input_way_2)
+            (dst_black_pattern, dst_white_pattern) = self.get_patterns_on_way(move.way)
+
+            # 入力路の両方に石があるところだけ演算する
+            both_pattern = (black_pattern_1 | white_pattern_1) & (black_pattern_2 | white_pattern_2)
+            result_pattern = binary_operate_table[(black_pattern_1 << FILE_LEN) | black_pattern_2] & both_pattern
+
+            return ((dst_black_pattern & ~both_pattern) | result_pattern,
+                    (dst_white_pattern & ~both_pattern) | (both_pattern & ~result_pattern))
+
+        raise ValueError(f"undefined operator code.  {op=}  {move.to_code()=}")
+
+
+    def get_zobrist_keys_after_move(self, move, without_way_lock=False):
+        """一手指した後の局面のゾブリスト・ハッシュを、盤を変えずに求める
+
+        get_zobrist_keys() と同じく、通常、上下反転、左右反転、１８０°回転の４つ返す。
+        対応している演算子は get_patterns_on_way_after_move() と同じ
+
+        Parameters
+        ----------
+        move : Move
+            指し手
+        without_way_lock : bool
+            ［路ロック一覧］が異なるかは無視したいときは真
+        """
+
+        way_index = move.way.index
+
+        (black_pattern, white_pattern) = self.get_patterns_on_way(move.way)
+        (new_black_pattern, new_white_pattern) = self.get_patterns_on_way_after_move(move)
+        changed_black_pattern = black_pattern ^ new_black_pattern
+        changed_white_pattern = white_pattern ^ new_white_pattern
+
+        # 指すと手番が変わる
+        keys = [key ^ _zobrist_white_turn for key in self.get_zobrist_keys(without_way_lock=without_way_lock)]
+
+        for kind in range(0, 4):
+            keys[kind] ^= (_zobrist_way_patterns[kind][C_BLACK][way_index][changed_black_pattern]
+                    ^ _zobrist_way_patterns[kind][C_WHITE][way_index][changed_white_pattern])
+
+        if not without_way_lock:
+            # push_move() と同じく、石の置いてある路を改変したなら、開錠指定がなければ路ロックを掛ける。
+            # 新規作成なら路ロックは外れる
+            if move.operator.code != 'n' and (black_pattern | white_pattern) != 0:
+                way_lock = not move.is_way_unlock
+            else:
+                way_lock = False
+
+            if self._way_locks[move.way.to_code()] != way_lock:
+                keys[0] ^= _zobrist_way_locks[way_index]
+                keys[1] ^= _zobrist_way_locks[_upside_down_way_index[way_index]]
+                keys[2] ^= _zobrist_way_locks[_flip_left_and_right_way_index[way_index]]
+                keys[3] ^= _zobrist_way_locks[_rotate_180_way_index[way_index]]
+
+        return tuple(keys)
+
+
+    def get_clear_targets_bits_after_move(self, move):
+        """一手指した後に達成済みになっているクリアーターゲット番号のビットを、盤を変えずに求める
+
+        push_move() と同じく、指した手の対象路と交わる石の並びだけ調べる。
+        対応している演算子は get_patterns_on_way_after_move() と同じ
 
         Parameters
         ----------
@@ -1963,49 +2765,166 @@ class Board():
             指し手
         """
 
-        global _color_to_binary
+        way_index = move.way.index
+        pattern_to_square_bits = _way_pattern_to_square_bits[way_index]
+        way_square_bits = pattern_to_square_bits[-1]
+
+        # 指した後の黒石、白石
+        (new_black_pattern, new_white_pattern) = self.get_patterns_on_way_after_move(move)
+        stone_bits_list = [
+            (self.get_color_bits(C_BLACK) & ~way_square_bits) | pattern_to_square_bits[new_black_pattern],
+            (self.get_color_bits(C_WHITE) & ~way_square_bits) | pattern_to_square_bits[new_white_pattern]]
+
+        clear_targets_bits = self._clear_targets_bits
+
+        for index in range(0, CLEAR_TARGETS_LEN):
+            if clear_targets_bits & (1 << index):
+                continue
+
+            stone_bits = stone_bits_list[0 if _clear_target_colors[index] == C_BLACK else 1]
+
+            for line_mask in _way_to_clear_target_line_masks[index][way_index]:
+                if stone_bits & line_mask == line_mask:
+                    clear_targets_bits |= 1 << index
+                    break
+
+        return clear_targets_bits
+
+
+    def cut_the_edge_on_way(self, move):
+        """対象路上の石を全て取り除きます
+
+        Parameters
+        ----------
+        move : Move
+            指し手
+
+        Returns
+        -------
+        stones_before_change : str
+            取り除いた石の並び
+        """
 
         stones_before_change = ''
 
-        (input_way_1, input_way_2, error_reason) = self.get_input_ways_by_binary_operation(move.way)
+        # 筋（段）方向両用
+        axes_absorber = move.way.absorb_axes()
+        way_segment = self.get_stone_segment_on_way(move.way)
+
+        for src_dst_i in range(way_segment.begin, way_segment.end):
+            src_dst_sq = Square.file_rank_to_sq(move.way.number, src_dst_i, swap=axes_absorber.swap_axes)
+            stone = self.get_color(src_dst_sq)
+            if stone != C_EMPTY:
+                stones_before_change += Colors.as_string_board(stone)
+                self.set_color(src_dst_sq, C_EMPTY)
+
+        return stones_before_change
 
-        if input_way_1.is_empty or input_way_2.is_empty:
-            raise ValueError(f"out of bounds.  {error_reason=}  {move.to_code()=}  {input_way_1.to_code()=}  {input_way_2.to_code()=}  {self._way_locks=}")
 
+    def shift_on_way(self, move, bit_shift):
+        """対象路上の石の連を、指定ビット数だけ回転シフトします
 
-        # 対象の路に石が置いてあれば上書きフラグをOn、そうでなければOff
-        overwrite = self.exists_stone_on_way(move.way)
+        Parameters
+        ----------
+        move : Move
+            指し手
+        bit_shift : int
+            何ビットシフトか
+        """
 
         # 筋（段）方向両用
         axes_absorber = move.way.absorb_axes()
 
+        # 入力路から、出力路へ、評価値を出力
+        #
+        #   (1) 必要な変数を調べる：
+        #       最初のマージン（空欄）は無視する
+        #       最初の石の位置を覚える。変数名を begin とする
+        #       連続する石の長さを覚える。変数名を length とする
+        #       最後のマージン（空欄）は無視する
+        #   
+        #   (2) 石を移す：
+        #       石を移す先の配列のインデックスの求め方は以下の通り
+        #       dst_index = (src_index - begin + bit_shift) % length + begin
+
+        source_stones = [C_EMPTY] * axes_absorber.opponent_axis_length
         for i in range(0, axes_absorber.opponent_axis_length):
+            src_sq = Square.file_rank_to_sq(move.way.number, i, swap=axes_absorber.swap_axes)
+            stone = self.get_color(src_sq)
+            source_stones[i] = stone
 
-            dst_sq = Square.file_rank_to_sq(move.way.number, i, swap=axes_absorber.swap_axes)
-            old_stone = self.get_color(dst_sq)
+        # (1)
+        way_segment = self.get_stone_segment_on_way(move.way)
 
-            if overwrite and old_stone != C_EMPTY:
-                stones_before_change += Colors.as_string_board(old_stone)
+        # (2)
+        for i in range(way_segment.begin, way_segment.end):
+            dst_sq = Square.file_rank_to_sq(
+                file=move.way.number,
+                rank=(i - way_segment.begin + bit_shift) % way_segment.length + way_segment.begin,
+                swap=axes_absorber.swap_axes)
 
-            input_stone_at_first = self.get_color(Square.file_rank_to_sq(input_way_1.number, i, swap=axes_absorber.swap_axes))
-            input_stone_at_second = self.get_color(Square.file_rank_to_sq(input_way_2.number, i, swap=axes_absorber.swap_axes))
+            self.set_color(dst_sq, source_stones[i])
 
-            #print(f"{move.way.axis_id=}  {i=}  {input_way_1.number=}  {input_way_2.number=}  {input_stone_at_first=}  {input_stone_at_second=}  {dst_sq=}")
 
-            if input_stone_at_first == C_EMPTY or input_stone_at_second == C_EMPTY:
-                continue
+    def not_operate_on_way(self, move):
+        """隣の路の石を Not して、（石の置いてない）対象路へ出力します
+
+        Parameters
+        ----------
+        move : Move
+            指し手
+        """
 
+        # 筋（段）方向両用
+        axes_absorber = move.way.absorb_axes()
+
+        # 入力路から、出力路へ、評価値を出力
+        for i in range(0, axes_absorber.opponent_axis_length):
+            src_stone = self.get_color(Square.file_rank_to_sq(
+                self.get_src_way_by_unary_operation(move.way).number, i, swap=axes_absorber.swap_axes))
             self.set_color(
-                sq=dst_sq,
-                value=move.operator.binary_operate(
-                    left_operand=_color_to_binary[input_stone_at_first],
-                    right_operand=_color_to_binary[input_stone_at_second]))
+                sq=Square.file_rank_to_sq(move.way.number, i, swap=axes_absorber.swap_axes),
+                value=move.operator.unary_operate(src_stone))
+
+
+    def not_reverse_on_way(self, move):
+        """隣の路の石を Not して、（石の置いてある）対象路へ上書きします
+
+        Parameters
+        ----------
+        move : Move
+            指し手
+
+        Returns
+        -------
+        stones_before_change : str
+            上書きされた石の並び
+        """
+
+        stones_before_change = ''
+
+        # 筋（段）方向両用
+        axes_absorber = move.way.absorb_axes()
+
+        # 入力路から、出力路へ、評価値を出力
+        for i in range(0, axes_absorber.opponent_axis_length):
+            src_stone = self.get_color(Square.file_rank_to_sq(
+                self.get_src_way_by_unary_operation(move.way).number, i, swap=axes_absorber.swap_axes))
+
+            if src_stone != C_EMPTY:
+                dst_stone = self.get_color(Square.file_rank_to_sq(
+                    move.way.number, i, swap=axes_absorber.swap_axes))
+
+                stones_before_change += Colors.as_string_board(dst_stone)
+                self.set_color(
+                    sq=Square.file_rank_to_sq(move.way.number, i, swap=axes_absorber.swap_axes),
+                    value=move.operator.unary_operate(src_stone))
 
         return stones_before_change
 
 
     def on_exit_push_usi(self, move, way_lock, stones_before_change=''):
-        """push_usi() 関数から抜けるときに実行する定型処理
+        """push_move() 関数から抜けるときに実行する定型処理
 
         Parameters
         ----------
@@ -2016,11 +2935,23 @@ class Board():
         stones_before_change : str
             変更前の石の状態
         """
-        self.set_way_lock_by_code(move.way.to_code(), way_lock)
+        way_u = move.way.to_code()
+
+        # 一手戻すときのために、変更前の路ロックを記録しておく
+        way_lock_before_change = self._way_locks[way_u]
 
-        self._board_editing_history.append(BoardEditingItem(
+        self.set_way_lock_by_code(way_u, way_lock)
+
+        board_editing_item = BoardEditingItem(
             move=move,
-            stones_before_change=stones_before_change))
+            stones_before_change=stones_before_change,
+            squares_before_change=self._squares_before_change,
+            way_lock_before_change=way_lock_before_change)
+
+        self._board_editing_history.append(board_editing_item)
+
+        # 手数が進んでから、クリアーターゲットを調べる
+        board_editing_item.achieved_clear_targets = self.update_clear_targets(move)
 
 
     def get_src_way_by_unary_operation(self, way):
@@ -2046,7 +2977,6 @@ class Board():
         raise ValueError("not operator invalid operation")
 
 
-    # TODO イリーガルムーブを弾くために、バリデーションができたい
     def push_usi(self, move_u):
         """一手指す
 
@@ -2059,9 +2989,36 @@ class Board():
             	"&7c#"
         """
         Move.validate_code(move_u, can_panic=True)
-        move = Move.code_to_obj(move_u)
+        self.push_move(Move.code_to_obj(move_u))
+
+
+    def push_move_id(self, move_id):
+        """一手指す
+
+        Parameters
+        ----------
+        move_id : int
+            指し手番号
+        """
+        self.push_move(Move.id_to_obj(move_id))
+
+
+    # TODO イリーガルムーブを弾くために、バリデーションができたい
+    def push_move(self, move):
+        """一手指す
+
+        指し手コードの解析を省きたいときは、 push_usi() ではなく、こちらを使う
+
+        Parameters
+        ----------
+        move : Move
+            指し手
+        """
         stones_before_change = ''
 
+        # 一手戻すときのために、対象路の変更前の石を記録しておく
+        self._squares_before_change = self.save_squares_for_undo(move.way)
+
         # 演算子の変数名を縮める
         op = move.operator.code
         """
@@ -2086,17 +3043,8 @@ class Board():
             # 対象の路に石が置いてある
             if self.exists_stone_on_way(move.way):
 
-                # 筋（段）方向両用
-                axes_absorber = move.way.absorb_axes()
-                way_segment = self.get_stone_segment_on_way(move.way)
-
                 # 盤面更新 --> 空欄で上書き
-                for src_dst_i in range(way_segment.begin, way_segment.end):
-                    src_dst_sq = Square.file_rank_to_sq(move.way.number, src_dst_i, swap=axes_absorber.swap_axes)
-                    stone = self.get_color(src_dst_sq)
-                    if stone != C_EMPTY:
-                        stones_before_change += Colors.as_string_board(stone)
-                        self.set_color(src_dst_sq, C_EMPTY)
+                stones_before_change = self.cut_the_edge_on_way(move)
 
                 # 改変操作では
                 #   開錠指定があれば開錠、なければ 路ロックを掛ける
@@ -2160,38 +3108,8 @@ class Board():
             # 対象の路に石が置いてある
             if self.exists_stone_on_way(move.way):
 
-                # 筋（段）方向両用
-                axes_absorber = move.way.absorb_axes()
-
-                # 入力路から、出力路へ、評価値を出力
-                #
-                #   (1) 必要な変数を調べる：
-                #       最初のマージン（空欄）は無視する
-                #       最初の石の位置を覚える。変数名を begin とする
-                #       連続する石の長さを覚える。変数名を length とする
-                #       最後のマージン（空欄）は無視する
-                #   
-                #   (2) 石を移す：
-                #       石を移す先の配列のインデックスの求め方は以下の通り
-                #       dst_index = (src_index - begin + bit_shift) % length + begin
-
-                source_stones = [C_EMPTY] * axes_absorber.opponent_axis_length
-                for i in range(0, axes_absorber.opponent_axis_length):
-                    src_sq = Square.file_rank_to_sq(move.way.number, i, swap=axes_absorber.swap_axes)
-                    stone = self.get_color(src_sq)
-                    source_stones[i] = stone
-
-                # (1)
-                way_segment = self.get_stone_segment_on_way(move.way)
-
-                # (2)
-                for i in range(way_segment.begin, way_segment.end):
-                    dst_sq = Square.file_rank_to_sq(
-                        file=move.way.number,
-                        rank=(i - way_segment.begin + bit_shift) % way_segment.length + way_segment.begin,
-                        swap=axes_absorber.swap_axes)
-
-                    self.set_color(dst_sq, source_stones[i])
+                # 盤面更新
+                self.shift_on_way(move, bit_shift)
 
                 # 改変操作では
                 #   開錠指定があれば開錠、なければ 路ロックを掛ける
@@ -2209,16 +3127,8 @@ class Board():
         #   対象の路に石が置いてないものとします
         #
         if op == 'n':
-            # 筋（段）方向両用
-            axes_absorber = move.way.absorb_axes()
-
-            # 入力路から、出力路へ、評価値を出力
-            for i in range(0, axes_absorber.opponent_axis_length):
-                src_stone = self.get_color(Square.file_rank_to_sq(
-                    self.get_src_way_by_unary_operation(move.way).number, i, swap=axes_absorber.swap_axes))
-                self.set_color(
-                    sq=Square.file_rank_to_sq(move.way.number, i, swap=axes_absorber.swap_axes),
-                    value=move.operator.unary_operate(src_stone))
+            # 盤面更新
+            self.not_operate_on_way(move)
 
             # 新規作成操作では
             #   路ロックは掛からない（外れる）
@@ -2233,22 +3143,8 @@ class Board():
             # 対象の路に石が置いてある
             if self.exists_stone_on_way(move.way):
 
-                # 筋（段）方向両用
-                axes_absorber = move.way.absorb_axes()
-
-                # 入力路から、出力路へ、評価値を出力
-                for i in range(0, axes_absorber.opponent_axis_length):
-                    src_stone = self.get_color(Square.file_rank_to_sq(
-                        self.get_src_way_by_unary_operation(move.way).number, i, swap=axes_absorber.swap_axes))
-
-                    if src_stone != C_EMPTY:
-                        dst_stone = self.get_color(Square.file_rank_to_sq(
-                            move.way.number, i, swap=axes_absorber.swap_axes))
-
-                        stones_before_change += Colors.as_string_board(dst_stone)
-                        self.set_color(
-                            sq=Square.file_rank_to_sq(move.way.number, i, swap=axes_absorber.swap_axes),
-                            value=move.operator.unary_operate(src_stone))
+                # 盤面更新
+                stones_before_change = self.not_reverse_on_way(move)
 
                 # 改変操作では
                 #   開錠指定があれば開錠、なければ 路ロックを掛ける
@@ -2266,22 +3162,8 @@ class Board():
             # 対象の路に石が置いてある
             if self.exists_stone_on_way(move.way):
 
-                # 筋（段）方向両用
-                axes_absorber = move.way.absorb_axes()
-
-                # 入力路から、出力路へ、評価値を出力
-                for i in range(0, axes_absorber.opponent_axis_length):
-                    src_stone = self.get_color(Square.file_rank_to_sq(
-                        self.get_src_way_by_unary_operation(move.way).number, i, swap=axes_absorber.swap_axes))
-
-                    if src_stone != C_EMPTY:
-                        dst_stone = self.get_color(Square.file_rank_to_sq(
-                            move.way.number, i, swap=axes_absorber.swap_axes))
-
-                        stones_before_change += Colors.as_string_board(dst_stone)
-                        self.set_color(
-                            sq=Square.file_rank_to_sq(move.way.number, i, swap=axes_absorber.swap_axes),
-                            value=move.operator.unary_operate(src_stone))
+                # 盤面更新
+                stones_before_change = self.not_reverse_on_way(move)
 
                 # 改変操作では
                 #   開錠指定があれば開錠、なければ 路ロックを掛ける
@@ -2345,33 +3227,28 @@ class Board():
 
 
     def pop(self):
-        """一手戻す"""
-        # 最後の指し手を取得
-        latest_edit = self._board_editing_history.items[-1]
-
-        # 最後の指し手の逆操作を算出
-        inverse_move = MoveHelper.inverse_move(
-            board=self,
-            move=latest_edit.move,
-            stones_before_change=latest_edit.stones_before_change)
+        """一手戻す
 
-        if inverse_move is None:
-            raise ValueError(f"[pop] {latest_edit.move.to_code()=} に逆操作がなく、pop に失敗しました")
+        逆操作を指すのではなく、指したときに記録しておいた対象路の石と路ロックを元に戻す。
+        逆操作の無い c, e 演算子も戻せる
+        """
+        # 最後の指し手を履歴から除去
+        latest_edit = self._board_editing_history.pop()
 
-        # 逆操作には、盤面編集フラグ、開錠フラグを立てる
-        inverse_move_for_edit = inverse_move.to_edit_mode().to_unlock_mode()
-        inverse_move_for_edit_u = inverse_move_for_edit.to_code()
+        # 対象路の石を元に戻す
+        self.restore_squares_for_undo(latest_edit.squares_before_change)
 
-        #print(f"[pop] 盤面編集として、逆操作を実行  {latest_edit.move.to_code()=}  {inverse_move.to_code()=}  {inverse_move_for_edit.is_way_unlock=}  {inverse_move_for_edit_u=}")
-        self.push_usi(inverse_move_for_edit_u)
+        # 対象路の路ロックを元に戻す
+        self.set_way_lock_by_code(latest_edit.move.way.to_code(), latest_edit.way_lock_before_change)
 
-        # さっきの逆操作を履歴から除去
-        popped_item = self._board_editing_history.pop()
-        #print(f"[pop] 逆操作を履歴から除去  {popped_item.move.to_code()=}")
+        # その指し手で達成したクリアーターゲットを、未達成に戻す
+        achieved_clear_targets = latest_edit.achieved_clear_targets
+        if achieved_clear_targets != 0:
+            for index in range(0, CLEAR_TARGETS_LEN):
+                if achieved_clear_targets & (1 << index):
+                    self._clear_targets_list[index] = -1
 
-        # 最後の指し手も履歴から除去
-        popped_item = self._board_editing_history.pop()
-        #print(f"[pop] 最後の指し手も履歴から除去  {popped_item.move.to_code()=}")
+            self._clear_targets_bits &= ~achieved_clear_targets
 
 
     def is_nyugyoku(self):
@@ -2505,7 +3382,7 @@ class Board():
                 return (first_way, second_way, '')
         
         # ハイの方に２つ続けて石が置いているか？
-        if target_way.number < axes_absorber.opponent_axis_length - 2:
+        if target_way.number < axes_absorber.axis_length - 2:
             first_way = target_way.high_way()
             second_way = target_way.high_way(diff=2)
             if self.exists_stone_on_way(first_way) and self.exists_stone_on_way(second_way):
@@ -2582,6 +3459,80 @@ class Board():
         return C_WHITE
 
 
+    @property
+    def zobrist_key(self):
+        """現局面の６４ビットのゾブリスト・ハッシュ
+
+        盤面、路ロック、手番を含む。何手目か、クリアー済ターゲットは含まない
+        """
+        return self.get_zobrist_keys()[0]
+
+
+    @property
+    def zobrist_key_with_clear_targets(self):
+        """現局面の６４ビットのゾブリスト・ハッシュに、どのクリアーターゲットを達成済みかを混ぜたもの
+
+        同じ盤面でも、達成済みのクリアーターゲットが違えば勝ち負けが変わるので、探索結果を覚えるときはこちらを使う。
+        何手目かは含まない
+        """
+        return self.zobrist_key ^ _zobrist_clear_targets_bits[self._clear_targets_bits]
+
+
+    def get_zobrist_keys(self, without_way_lock=False):
+        """現局面のゾブリスト・ハッシュを、通常、上下反転、左右反転、１８０°回転の４つ返す
+
+        Parameters
+        ----------
+        without_way_lock : bool
+            ［路ロック一覧］が異なるかは無視したいときは真
+
+        Returns
+        -------
+        key : int
+            通常
+        key_upside_down : int
+            上下反転
+        key_flip_left_and_right : int
+            左右反転
+        key_rotate_180 : int
+            １８０°回転
+        """
+
+        key = self._squares_key
+        key_upside_down = self._squares_key_upside_down
+        key_flip_left_and_right = self._squares_key_flip_left_and_right
+        key_rotate_180 = self._squares_key_rotate_180
+
+        if not without_way_lock:
+            key ^= self._way_locks_key
+            key_upside_down ^= self._way_locks_key_upside_down
+            key_flip_left_and_right ^= self._way_locks_key_flip_left_and_right
+            key_rotate_180 ^= self._way_locks_key_rotate_180
+
+        # 反転、回転しても手番は変わらない
+        if self.get_next_turn() == C_WHITE:
+            key ^= _zobrist_white_turn
+            key_upside_down ^= _zobrist_white_turn
+            key_flip_left_and_right ^= _zobrist_white_turn
+            key_rotate_180 ^= _zobrist_white_turn
+
+        return (key, key_upside_down, key_flip_left_and_right, key_rotate_180)
+
+
+    def canonical_key(self, without_way_lock=False):
+        """現局面の、対称形を同一視したゾブリスト・ハッシュ
+
+        通常、上下反転、左右反転、１８０°回転のうち、最小のキーを返す。
+        盤面が対称形の局面は、同じキーになる
+
+        Parameters
+        ----------
+        without_way_lock : bool
+            ［路ロック一覧］が異なるかは無視したいときは真
+        """
+        return min(self.get_zobrist_keys(without_way_lock=without_way_lock))
+
+
     def as_sfen(self, searched_clear_targets=None, from_present=False):
         """（拡張仕様）盤のSFEN形式
 
@@ -2599,7 +3550,7 @@ class Board():
 
         # 現在の盤面からのSFEN表示
         if from_present:
-            squares = self._squares 
+            squares = self.get_squares()
 
         # 初期盤面からのSFEN表示
         else:
@@ -2706,6 +3657,813 @@ class Board():
             return ''
 
 
+# ビットボード用の表
+#
+#   マス番号 sq の石は 1 << sq のビットで表す。
+#   筋の路は連続する６ビット、段の路は６ビット飛びの７ビットになる
+#
+#   路上のビットを詰めて、路上の位置 i を 1 << i のビットで表したものを［路のパターン］と呼ぶことにする
+#
+
+# 第１筋の路のビット
+_FILE_WAY_BITS = (1 << RANK_LEN) - 1
+
+# a段の路のビット
+_RANK_WAY_BITS = 0
+for _file in range(0, FILE_LEN):
+    _RANK_WAY_BITS |= 1 << Square.file_rank_to_sq(_file, 0)
+
+# 路番号から、その路のビット
+_way_bits_list = []
+for _way in _all_ways:
+    if _way.is_file:
+        _way_bits_list.append(_FILE_WAY_BITS << Square.file_rank_to_sq(_way.number, 0))
+    else:
+        _way_bits_list.append(_RANK_WAY_BITS << Square.file_rank_to_sq(0, _way.number))
+
+# a段の路のビットと、段の路のパターンとの相互変換
+_rank_bits_to_pattern = {}
+_rank_pattern_to_bits = []
+for _pattern in range(0, 1 << FILE_LEN):
+    _bits = 0
+    for _file in range(0, FILE_LEN):
+        if _pattern & (1 << _file):
+            _bits |= 1 << Square.file_rank_to_sq(_file, 0)
+
+    _rank_bits_to_pattern[_bits] = _pattern
+    _rank_pattern_to_bits.append(_bits)
+
+# 二項演算子のビット演算
+#
+#   黒石を 1、白石を 0 とする。結果は、入力の両方に石があるビットだけを使う
+#
+_binary_operate_bits = {
+    'ze': lambda l, r: 0,
+    'no': lambda l, r: ~(l | r),
+    'xo': lambda l, r: l ^ r,
+    'na': lambda l, r: ~(l & r),
+    'a' : lambda l, r: l & r,
+    'xn': lambda l, r: ~(l ^ r),
+    'o' : lambda l, r: l | r,
+    'on': lambda l, r: -1,
+}
+
+# 二項演算子の結果の表
+#
+#   [演算子番号][(入力路１の黒石のパターン << FILE_LEN) | 入力路２の黒石のパターン] で、結果の黒石のパターンを引く。
+#   筋の路（６ビット）も段の路（７ビット）も、同じ表を使う。
+#   入力路の両方に石があるかは、表を引いた後でビットの AND を取る
+#
+_binary_operate_table = [None] * len(Operator.stems)
+for _stem_u, _operate_bits in _binary_operate_bits.items():
+    _binary_operate_table[Operator.stems.index(_stem_u)] = [
+        _operate_bits(_left_pattern, _right_pattern) & ((1 << FILE_LEN) - 1)
+        for _left_pattern in range(0, 1 << FILE_LEN)
+        for _right_pattern in range(0, 1 << FILE_LEN)]
+
+
+class BitBoard(Board):
+    """ビットボード版のビナーシ盤
+
+    黒石、白石の位置を、それぞれ４２ビットの整数で持つ。
+    マス番号は Board と同じで、マス番号 sq の石は 1 << sq のビットで表す
+
+    Board と同じメソッドを持つので、 Board の代わりに使える。
+    路の上の石をマス毎に１つずつ調べる代わりに、路のビットをまとめて演算する
+    """
+
+
+    def subinit(self):
+        """（サブ部分として）盤をクリアーする"""
+
+        super().subinit()
+
+        # ビットボードでは、マス毎の石の色のリストは使わない
+        self._squares = None
+
+        # 石のある路の、路番号のビットを立てたもの
+        #
+        #   盤のビットを変えたらナンにして、次に使うときに盤のビットから求め直す。
+        #   合法手生成では、盤を変えずに何度も調べるので、その間は求め直さずに済む
+        #
+        self._occupied_ways = 0
+
+
+    @property
+    def board_backend(self):
+        """盤の内部表現"""
+        return BOARD_BACKEND_BITBOARD
+
+
+    @property
+    def black_count_with_komi(self):
+        return BLACK_KOMI + self._black_bits.bit_count()
+
+
+    @property
+    def white_count_with_komi(self):
+        return WHITE_KOMI + self._white_bits.bit_count()
+
+
+    def get_color(self, sq):
+        """マス上の石の色を取得"""
+        bit = 1 << sq
+
+        if self._black_bits & bit:
+            return C_BLACK
+
+        if self._white_bits & bit:
+            return C_WHITE
+
+        return C_EMPTY
+
+
+    def set_color(self, sq, value):
+        """マス上の石の色を設定"""
+        bit = 1 << sq
+
+        black_bits = self._black_bits & ~bit
+        white_bits = self._white_bits & ~bit
+
+        if value == C_BLACK:
+            black_bits |= bit
+        elif value == C_WHITE:
+            white_bits |= bit
+
+        self.set_bits(black_bits, white_bits)
+
+
+    def set_bits(self, black_bits, white_bits):
+        """盤全体の黒石、白石のビットを上書き
+
+        変わったマスの分だけ、ゾブリスト・ハッシュを差分更新する
+        """
+
+        for (color, changed_bits) in [
+                (C_BLACK, self._black_bits ^ black_bits),
+                (C_WHITE, self._white_bits ^ white_bits)]:
+
+            while changed_bits:
+                bit = changed_bits & -changed_bits
+                sq = bit.bit_length() - 1
+                self._squares_key ^= _zobrist_squares[color][sq]
+                self._squares_key_upside_down ^= _zobrist_squares_upside_down[color][sq]
+                self._squares_key_flip_left_and_right ^= _zobrist_squares_flip_left_and_right[color][sq]
+                self._squares_key_rotate_180 ^= _zobrist_squares_rotate_180[color][sq]
+                changed_bits ^= bit
+
+        self._black_bits = black_bits
+        self._white_bits = white_bits
+        self._occupied_ways = None
+
+
+    def save_squares_for_undo(self, way):
+        """一手戻すときのために、変更前の石を記録する
+
+        BitBoard では盤全体を記録しても整数２つで済む。
+        ゾブリスト・ハッシュも一緒に記録しておく
+
+        Returns
+        -------
+        squares_before_change : tuple
+            （黒石のビット, 白石のビット, 石のある路, ゾブリスト・ハッシュ（通常, 上下反転, 左右反転, １８０°回転））
+        """
+        return (self._black_bits, self._white_bits, self._occupied_ways,
+                self._squares_key, self._squares_key_upside_down, self._squares_key_flip_left_and_right, self._squares_key_rotate_180)
+
+
+    def restore_squares_for_undo(self, squares_before_change):
+        """save_squares_for_undo() で記録した石に戻す"""
+        (self._black_bits, self._white_bits, self._occupied_ways,
+         self._squares_key, self._squares_key_upside_down, self._squares_key_flip_left_and_right, self._squares_key_rotate_180) = squares_before_change
+
+
+    def get_squares(self):
+        """現局面の各マスの石の色のリスト
+
+        BitBoard では毎回新しいリストを作って返す
+        """
+        squares = [C_EMPTY] * BOARD_AREA
+
+        for sq in range(0, BOARD_AREA):
+            squares[sq] = self.get_color(sq)
+
+        return squares
+
+
+    @staticmethod
+    def bits_to_pattern(bits, way):
+        """盤のビットから、路のパターンを取り出す"""
+        if way.is_file:
+            return (bits >> (way.number * RANK_LEN)) & _FILE_WAY_BITS
+
+        return _rank_bits_to_pattern[(bits >> way.number) & _RANK_WAY_BITS]
+
+
+    @staticmethod
+    def pattern_to_bits(pattern, way):
+        """路のパターンを、盤のビットへ戻す"""
+        if way.is_file:
+            return pattern << (way.number * RANK_LEN)
+
+        return _rank_pattern_to_bits[pattern] << way.number
+
+
+    def get_patterns_on_way(self, way):
+        """路上の黒石、白石のパターンを取得
+
+        合法手生成で何度も呼ばれるので、 bits_to_pattern() を呼ばずに、路番号の表から直接取り出す
+
+        Returns
+        -------
+        black_pattern : int
+            黒石のパターン
+        white_pattern : int
+            白石のパターン
+        """
+        (shift, is_file) = _way_pattern_shifts[way.index]
+
+        if is_file:
+            return ((self._black_bits >> shift) & _FILE_WAY_BITS,
+                    (self._white_bits >> shift) & _FILE_WAY_BITS)
+
+        return (_rank_bits_to_pattern[(self._black_bits >> shift) & _RANK_WAY_BITS],
+                _rank_bits_to_pattern[(self._white_bits >> shift) & _RANK_WAY_BITS])
+
+
+    def set_patterns_on_way(self, way, black_pattern, white_pattern):
+        """路上の黒石、白石のパターンを上書き"""
+        way_bits = _way_bits_list[way.index]
+
+        self.set_bits(
+                (self._black_bits & ~way_bits) | BitBoard.pattern_to_bits(black_pattern, way),
+                (self._white_bits & ~way_bits) | BitBoard.pattern_to_bits(white_pattern, way))
+
+
+    @property
+    def occupied_ways(self):
+        """石のある路の、路番号のビットを立てたもの（１３ビット）
+
+        BitBoard では差分更新せず、盤のビットが変わった後で最初に使うときに、盤のビットから求める
+        """
+        if self._occupied_ways is None:
+            occupied_bits = self._black_bits | self._white_bits
+            occupied_ways = 0
+
+            for (way_index, way_bits) in enumerate(_way_bits_list):
+                if occupied_bits & way_bits:
+                    occupied_ways |= 1 << way_index
+
+            self._occupied_ways = occupied_ways
+
+        return self._occupied_ways
+
+
+    def exists_stone_on_way(self, way):
+        """指定の路に石が置いてあるか？
+
+        Parameters
+        ----------
+        way : Way
+            路オブジェクト
+        """
+
+        if way.is_empty:
+            return False
+
+        return self.occupied_ways & (1 << way.index) != 0
+
+
+    def get_stone_segment_on_way(self, way):
+        """路を指定すると、そこにある石の連なりの開始位置と長さを返す"""
+
+        if way.is_empty:
+            return WaySegment(0, 0)
+
+        return _pattern_to_way_segment[BitBoard.bits_to_pattern(self._black_bits | self._white_bits, way)]
+
+
+    def cut_the_edge_on_way(self, move):
+        """対象路上の石を全て取り除きます"""
+
+        (black_pattern, white_pattern) = self.get_patterns_on_way(move.way)
+        way_segment = _pattern_to_way_segment[black_pattern | white_pattern]
+        segment_pattern = ((1 << way_segment.length) - 1) << way_segment.begin
+
+        stones_before_change = Board.stringify_patterns(
+            black_pattern,
+            white_pattern,
+            (black_pattern | white_pattern) & segment_pattern)
+
+        self.set_patterns_on_way(
+            move.way,
+            black_pattern & ~segment_pattern,
+            white_pattern & ~segment_pattern)
+
+        return stones_before_change
+
+
+    def shift_on_way(self, move, bit_shift):
+        """対象路上の石の連を、指定ビット数だけ回転シフトします"""
+
+        (black_pattern, white_pattern) = self.get_patterns_on_way(move.way)
+        (black_pattern, white_pattern) = Board.rotate_patterns(black_pattern, white_pattern, bit_shift)
+        self.set_patterns_on_way(move.way, black_pattern, white_pattern)
+
+
+    def not_operate_on_way(self, move):
+        """隣の路の石を Not して、（石の置いてない）対象路へ出力します"""
+
+        (black_pattern, white_pattern) = self.get_patterns_on_way_after_move(move)
+        self.set_patterns_on_way(move.way, black_pattern, white_pattern)
+
+
+    def not_reverse_on_way(self, move):
+        """隣の路の石を Not して、（石の置いてある）対象路へ上書きします"""
+
+        (src_black_pattern, src_white_pattern) = self.get_patterns_on_way(self.get_src_way_by_unary_operation(move.way))
+        (dst_black_pattern, dst_white_pattern) = self.get_patterns_on_way(move.way)
+        src_pattern = src_black_pattern | src_white_pattern
+
+        stones_before_change = Board.stringify_patterns(
+            dst_black_pattern,
+            dst_white_pattern,
+            src_pattern)
+
+        self.set_patterns_on_way(
+            move.way,
+            (dst_black_pattern & ~src_pattern) | src_white_pattern,
+            (dst_white_pattern & ~src_pattern) | src_black_pattern)
+
+        return stones_before_change
+
+
+# クリアーターゲット毎の、石の色と、石の並び
+#
+#   （並ぶ石の数, [（筋の進み, 段の進み）, ...]）
+#
+_clear_target_colors = [C_BLACK, C_BLACK, C_BLACK, C_WHITE, C_WHITE, C_WHITE]
+_clear_target_line_shapes = [
+    (3, [(1, 0)]),              # b3 横
+    (4, [(1, 1), (-1, 1)]),     # b4 斜め（左右反転でも構わない）
+    (5, [(0, 1)]),              # b5 縦
+    (3, [(0, 1)]),              # w3 縦
+    (4, [(1, 1), (-1, 1)]),     # w4 斜め（左右反転でも構わない）
+    (5, [(1, 0)]),              # w5 横
+]
+
+# [クリアーターゲット番号] で、達成となる石の並びのマスのビットの一覧
+_clear_target_line_masks = []
+for (_line_length, _steps) in _clear_target_line_shapes:
+    _line_masks = []
+    for (_file_step, _rank_step) in _steps:
+        for _rank in range(0, RANK_LEN):
+            for _file in range(0, FILE_LEN):
+                # 並びの終わりが盤の外に出るなら、ここからは並ばない
+                _last_file = _file + _file_step * (_line_length - 1)
+                _last_rank = _rank + _rank_step * (_line_length - 1)
+                if not (0 <= _last_file < FILE_LEN and 0 <= _last_rank < RANK_LEN):
+                    continue
+
+                _line_mask = 0
+                for _i in range(0, _line_length):
+                    _line_mask |= 1 << Square.file_rank_to_sq(_file + _file_step * _i, _rank + _rank_step * _i)
+
+                _line_masks.append(_line_mask)
+
+    _clear_target_line_masks.append(_line_masks)
+
+# [クリアーターゲット番号][路番号] で、その路のマスを１つでも含む石の並びの一覧
+#
+#   演算子は対象路の石しか変えないので、１手指した後は、対象路と交わる並びだけ調べればよい
+#
+_way_to_clear_target_line_masks = [
+    [[_line_mask for _line_mask in _line_masks if _line_mask & _way_bits] for _way_bits in _way_bits_list]
+    for _line_masks in _clear_target_line_masks]
+
+
+# プレイアウトで、これだけ指しても終局しなければ点数計算で勝ち負けを決める
+DEFAULT_PLAYOUT_MAX_PLY = 256
+
+# [路番号] で、路上の小さい方へ１つ、２つ隣、大きい方へ１つ、２つ隣の路番号。盤の外なら -1
+_way_neighbor_indexes = []
+for _way in _all_ways:
+    _axis_length = _way.absorb_axes().axis_length
+    _way_neighbor_indexes.append((
+        _way.low_way().index if 0 < _way.number else -1,
+        _way.low_way(diff=2).index if 1 < _way.number else -1,
+        _way.high_way().index if _way.number < _axis_length - 1 else -1,
+        _way.high_way(diff=2).index if _way.number < _axis_length - 2 else -1))
+
+# [路番号] で、路のパターンを取り出すためのシフト量と、筋の路か
+_way_pattern_shifts = [
+    (_way.number * RANK_LEN if _way.is_file else _way.number, _way.is_file)
+    for _way in _all_ways]
+
+# [路番号][演算子コード] で、対局で使う指し手
+_playout_way_moves = [
+    {_operator_u: Move.way_operator_to_obj(_way, _operator_u)
+     for _operator_u in ['s1', 's2', 's3', 's4', 's5', 's6', 'n', 'nL', 'nH', 'a', 'o', 'no', 'xo', 'na', 'xn']}
+    for _way in _all_ways]
+
+# 対局で使う二項演算子。 SearchLegalMoves が生成する順
+_playout_binary_operators = ['a', 'o', 'no', 'xo', 'na', 'xn']
+
+
+class PlayoutBoard():
+    """プレイアウト用の軽い盤
+
+    黒石、白石のビット、路ロックのビット、手番、達成済みクリアーターゲットのビットだけを整数で持つ。
+    盤面編集履歴もＳＦＥＮも持たず、一手戻すこともできない。
+    Board から作り、終局まで指し進めて勝ち負けを調べるためのもの
+    """
+
+
+    def __init__(self, black_bits, white_bits, way_locks_bits, next_turn, clear_targets_bits):
+        """初期化
+
+        Parameters
+        ----------
+        black_bits : int
+            黒石のあるマスの、マス番号 sq のビットを立てたもの
+        white_bits : int
+            白石のあるマスの、マス番号 sq のビットを立てたもの
+        way_locks_bits : int
+            路ロックが掛かっている路の、路番号のビットを立てたもの
+        next_turn : int
+            手番
+        clear_targets_bits : int
+            達成済みのクリアーターゲット番号のビットを立てたもの
+        """
+        self._black_bits = black_bits
+        self._white_bits = white_bits
+        self._way_locks_bits = way_locks_bits
+        self._next_turn = next_turn
+        self._clear_targets_bits = clear_targets_bits
+
+
+    @staticmethod
+    def from_board(board):
+        """盤の現局面を写す"""
+
+        way_locks_bits = 0
+        for (way_u, way_lock) in board.way_locks.items():
+            if way_lock:
+                way_locks_bits |= 1 << _way_code_to_index[way_u]
+
+        return PlayoutBoard(
+            black_bits=board.get_color_bits(C_BLACK),
+            white_bits=board.get_color_bits(C_WHITE),
+            way_locks_bits=way_locks_bits,
+            next_turn=board.get_next_turn(),
+            clear_targets_bits=board.clear_targets_bits)
+
+
+    @property
+    def black_bits(self):
+        return self._black_bits
+
+
+    @property
+    def white_bits(self):
+        return self._white_bits
+
+
+    @property
+    def way_locks_bits(self):
+        return self._way_locks_bits
+
+
+    @property
+    def next_turn(self):
+        return self._next_turn
+
+
+    @property
+    def clear_targets_bits(self):
+        return self._clear_targets_bits
+
+
+    @staticmethod
+    def get_pattern(bits, way_index):
+        """盤のビットから、路のパターンを取り出す"""
+        (shift, is_file) = _way_pattern_shifts[way_index]
+
+        if is_file:
+            return (bits >> shift) & _FILE_WAY_BITS
+
+        return _rank_bits_to_pattern[(bits >> shift) & _RANK_WAY_BITS]
+
+
+    def get_occupied_ways(self):
+        """石のある路の、路番号のビットを立てたもの（１３ビット）"""
+        occupied_bits = self._black_bits | self._white_bits
+        occupied_ways = 0
+
+        for (way_index, way_bits) in enumerate(_way_bits_list):
+            if occupied_bits & way_bits:
+                occupied_ways |= 1 << way_index
+
+        return occupied_ways
+
+
+    def generate_moves(self):
+        """合法手の一覧
+
+        SearchLegalMoves.iter_distinct_legal_moves() と違い、指した結果が同じになる指し手も省かない。
+        同じ路への、隣の路からのノットの新規作成は１つにまとめる
+
+        Returns
+        -------
+        move_list : list
+            指し手のリスト
+        """
+
+        occupied_bits = self._black_bits | self._white_bits
+        occupied_ways = self.get_occupied_ways()
+        way_locks_bits = self._way_locks_bits
+        move_list = []
+
+        for (way_index, way_moves) in enumerate(_playout_way_moves):
+            (low_index, low_2_index, high_index, high_2_index) = _way_neighbor_indexes[way_index]
+            exists_low = low_index != -1 and occupied_ways & (1 << low_index)
+            exists_high = high_index != -1 and occupied_ways & (1 << high_index)
+            is_way_locked = way_locks_bits & (1 << way_index)
+
+            # 石が置いてある路
+            if occupied_ways & (1 << way_index):
+
+                # 路にロックが掛かっていたら、シフトも、ノット、二項演算子の Reverse も禁止
+                if is_way_locked:
+                    continue
+
+                # シフト
+                way_segment = _pattern_to_way_segment[PlayoutBoard.get_pattern(occupied_bits, way_index)]
+                for i in range(1, way_segment.length):
+                    move_list.append(way_moves[f's{i}'])
+
+                # ノット（Reverse）
+                if exists_low:
+                    move_list.append(way_moves['nL'])
+
+                if exists_high:
+                    move_list.append(way_moves['nH'])
+
+                # 二項演算子。ロウ、ハイの両方に石が置いてある必要がある
+                if exists_low and exists_high:
+                    for operator_u in _playout_binary_operators:
+                        move_list.append(way_moves[operator_u])
+
+            # 石が置いてない路
+            else:
+
+                # ノットの新規作成は、路ロックに関わらずできる
+                if exists_low or exists_high:
+                    move_list.append(way_moves['n'])
+
+                # 路にロックが掛かっていたら、二項演算子の新規作成は禁止
+                if is_way_locked:
+                    continue
+
+                # 隣のどちらかに２つ続けて石が置いているか？
+                if ((exists_low and low_2_index != -1 and occupied_ways & (1 << low_2_index)) or
+                    (exists_high and high_2_index != -1 and occupied_ways & (1 << high_2_index))):
+                    for operator_u in _playout_binary_operators:
+                        move_list.append(way_moves[operator_u])
+
+        return move_list
+
+
+    def get_patterns_on_way_after_move(self, move):
+        """一手指した後の、対象路上の黒石、白石のパターン
+
+        Board.get_patterns_on_way_after_move() と同じ結果を、ビットだけで求める
+
+        Returns
+        -------
+        black_pattern : int
+            黒石のパターン
+        white_pattern : int
+            白石のパターン
+        """
+
+        way_index = move.way.index
+        op = move.operator.code
+        black_bits = self._black_bits
+        white_bits = self._white_bits
+        (low_index, low_2_index, high_index, high_2_index) = _way_neighbor_indexes[way_index]
+
+        # シフト
+        if op[0] == 's':
+            return Board.rotate_patterns(
+                PlayoutBoard.get_pattern(black_bits, way_index),
+                PlayoutBoard.get_pattern(white_bits, way_index),
+                int(op[1:2]))
+
+        occupied_bits = black_bits | white_bits
+
+        # ノット。入力路は、盤の端でなければ、石の置いてある小さい方の隣
+        if op in ['n', 'nL', 'nH']:
+            if low_index == -1 or (high_index != -1 and not occupied_bits & _way_bits_list[low_index]):
+                src_index = high_index
+            else:
+                src_index = low_index
+
+            src_black_pattern = PlayoutBoard.get_pattern(black_bits, src_index)
+            src_white_pattern = PlayoutBoard.get_pattern(white_bits, src_index)
+
+            if op == 'n':
+                return (src_white_pattern, src_black_pattern)
+
+            src_pattern = src_black_pattern | src_white_pattern
+            return ((PlayoutBoard.get_pattern(black_bits, way_index) & ~src_pattern) | src_white_pattern,
+                    (PlayoutBoard.get_pattern(white_bits, way_index) & ~src_pattern) | src_black_pattern)
+
+        # 二項演算子。対象路に石があれば両隣、無ければ石が２つ続けて置いてある方が入力路
+        if occupied_bits & _way_bits_list[way_index]:
+            (input_index_1, input_index_2) = (low_index, high_index)
+        elif low_2_index != -1 and occupied_bits & _way_bits_list[low_index] and occupied_bits & _way_bits_list[low_2_index]:
+            (input_index_1, input_index_2) = (low_index, low_2_index)
+        else:
+            (input_index_1, input_index_2) = (high_index, high_2_index)
+
+        black_pattern_1 = PlayoutBoard.get_pattern(black_bits, input_index_1)
+        black_pattern_2 = PlayoutBoard.get_pattern(black_bits, input_index_2)
+        both_pattern = ((black_pattern_1 | PlayoutBoard.get_pattern(white_bits, input_index_1)) &
+                        (black_pattern_2 | PlayoutBoard.get_pattern(white_bits, input_index_2)))
+        result_pattern = _binary_operate_table[move.operator.index][(black_pattern_1 << FILE_LEN) | black_pattern_2] & both_pattern
+
+        return ((PlayoutBoard.get_pattern(black_bits, way_index) & ~both_pattern) | result_pattern,
+                (PlayoutBoard.get_pattern(white_bits, way_index) & ~both_pattern) | (both_pattern & ~result_pattern))
+
+
+    def get_bits_after_move(self, move):
+        """一手指した後の、黒石、白石のビットと、達成済みクリアーターゲット番号のビット
+
+        Returns
+        -------
+        black_bits : int
+            黒石のビット
+        white_bits : int
+            白石のビット
+        clear_targets_bits : int
+            達成済みのクリアーターゲット番号のビット
+        """
+
+        way_index = move.way.index
+        pattern_to_square_bits = _way_pattern_to_square_bits[way_index]
+        way_square_bits = pattern_to_square_bits[-1]
+
+        (black_pattern, white_pattern) = self.get_patterns_on_way_after_move(move)
+        black_bits = (self._black_bits & ~way_square_bits) | pattern_to_square_bits[black_pattern]
+        white_bits = (self._white_bits & ~way_square_bits) | pattern_to_square_bits[white_pattern]
+
+        # 対象路と交わる石の並びだけ調べる
+        clear_targets_bits = self._clear_targets_bits
+
+        for index in range(0, CLEAR_TARGETS_LEN):
+            if clear_targets_bits & (1 << index):
+                continue
+
+            stone_bits = black_bits if _clear_target_colors[index] == C_BLACK else white_bits
+
+            for line_mask in _way_to_clear_target_line_masks[index][way_index]:
+                if stone_bits & line_mask == line_mask:
+                    clear_targets_bits |= 1 << index
+                    break
+
+        return (black_bits, white_bits, clear_targets_bits)
+
+
+    def push_move(self, move):
+        """一手指す
+
+        Board.push_move() と同じく、石の置いてある路を改変したなら路ロックを掛け、新規作成なら外す
+        """
+
+        way_bit = 1 << move.way.index
+
+        # 指す前に石が置いてあったか
+        if (self._black_bits | self._white_bits) & _way_bits_list[move.way.index] and move.operator.code != 'n':
+            self._way_locks_bits |= way_bit
+        else:
+            self._way_locks_bits &= ~way_bit
+
+        (self._black_bits, self._white_bits, self._clear_targets_bits) = self.get_bits_after_move(move)
+        self._next_turn = C_WHITE if self._next_turn == C_BLACK else C_BLACK
+
+
+    def get_winner_by_point(self):
+        """盤上の石の数（コミ込み）で勝った方の色。後手の白番にコミがあるので、必ずどちらかの勝ち"""
+
+        if WHITE_KOMI + self._white_bits.bit_count() < BLACK_KOMI + self._black_bits.bit_count():
+            return C_BLACK
+
+        return C_WHITE
+
+
+    def get_winner_by_clear_targets(self):
+        """クリアーターゲットで決着が付いていれば勝った方の色。付いていなければ C_EMPTY
+
+        GameoverOracle.search() と同じく、両者が同時に揃えたら点数計算
+        """
+
+        clear_targets_bits = self._clear_targets_bits
+        is_black_win = clear_targets_bits & _BLACK_CLEAR_TARGETS_BITS == _BLACK_CLEAR_TARGETS_BITS
+        is_white_win = clear_targets_bits & _WHITE_CLEAR_TARGETS_BITS == _WHITE_CLEAR_TARGETS_BITS
+
+        if is_black_win and is_white_win:
+            return self.get_winner_by_point()
+
+        if is_black_win:
+            return C_BLACK
+
+        if is_white_win:
+            return C_WHITE
+
+        return C_EMPTY
+
+
+    def choose_heavy_move(self, move_list, random_obj):
+        """重いプレイアウトの指し手選び
+
+        自分のクリアーターゲットが全て揃う指し手があれば、それを指す。
+        無ければ、 UsiEngine の Profit と同じく、指した後の石の数の［利］が正、零、負の順に、その中から乱択する
+        """
+
+        turn = self._next_turn
+        own_clear_targets_bits = _BLACK_CLEAR_TARGETS_BITS if turn == C_BLACK else _WHITE_CLEAR_TARGETS_BITS
+        stone_difference = self._black_bits.bit_count() - self._white_bits.bit_count()
+
+        positive_move_list = []
+        come_out_even_move_list = []
+        negative_move_list = []
+
+        for move in move_list:
+            (black_bits, white_bits, clear_targets_bits) = self.get_bits_after_move(move)
+
+            if clear_targets_bits & own_clear_targets_bits == own_clear_targets_bits:
+                return move
+
+            profit = black_bits.bit_count() - white_bits.bit_count() - stone_difference
+            if turn == C_WHITE:
+                profit = -profit
+
+            if 0 < profit:
+                positive_move_list.append(move)
+            elif profit == 0:
+                come_out_even_move_list.append(move)
+            else:
+                negative_move_list.append(move)
+
+        for candidate_move_list in [positive_move_list, come_out_even_move_list, negative_move_list]:
+            if 0 < len(candidate_move_list):
+                return random_obj.choice(candidate_move_list)
+
+        raise ValueError(f"どのリストも空だ  {len(move_list)=}")
+
+
+    def playout(self, random_obj, is_heavy=False, max_ply=DEFAULT_PLAYOUT_MAX_PLY):
+        """終局まで指し進めて、勝った方の色を返す
+
+        Parameters
+        ----------
+        random_obj : random.Random
+            乱数
+        is_heavy : bool
+            偽なら合法手から一様に乱択する。真なら choose_heavy_move() で選ぶ
+        max_ply : int
+            これだけ指しても終局しなければ、点数計算で勝ち負けを決める
+
+        Returns
+        -------
+        winner : int
+            C_BLACK か C_WHITE
+        """
+
+        for _ in range(0, max_ply):
+            winner = self.get_winner_by_clear_targets()
+            if winner != C_EMPTY:
+                return winner
+
+            move_list = self.generate_moves()
+
+            # ステールメートなら点数計算
+            if len(move_list) < 1:
+                return self.get_winner_by_point()
+
+            if is_heavy:
+                self.push_move(self.choose_heavy_move(move_list, random_obj))
+            else:
+                self.push_move(random_obj.choice(move_list))
+
+        winner = self.get_winner_by_clear_targets()
+        if winner != C_EMPTY:
+            return winner
+
+        return self.get_winner_by_point()
+
+
 class SearchedClearTargets():
     """クリアーターゲット探索"""
 
@@ -2727,7 +4485,42 @@ class SearchedClearTargets():
 
 
     @staticmethod
-    def update_clear_target_b3(board, clear_targets_list):
+    def update_clear_target(board, clear_targets_list, index, move=None):
+        """石の並びを１つでも満たしていれば、クリアーターゲットを達成したとして手数を記録する
+
+        石の並びは、マスのビットを立てたものとして予め作っておき、石のビットと重ねて調べる
+
+        Parameters
+        ----------
+        clear_targets_list : list
+            クリアーターゲット一覧。達成していれば、ここを更新する
+        index : int
+            クリアーターゲット番号。 0 ～ 2 は黒番、 3 ～ 5 は白番
+        move : Move
+            直前に指した手。指定すると、その手の対象路と交わる並びだけ調べる。
+            ナンなら盤全体を調べる
+        """
+
+        if move is None:
+            line_masks = _clear_target_line_masks[index]
+
+        # パスは石を変えない
+        elif move.is_pass:
+            return
+
+        else:
+            line_masks = _way_to_clear_target_line_masks[index][move.way.index]
+
+        stone_bits = board.get_color_bits(_clear_target_colors[index])
+
+        for line_mask in line_masks:
+            if stone_bits & line_mask == line_mask:
+                clear_targets_list[index] = board.moves_number
+                return
+
+
+    @staticmethod
+    def update_clear_target_b3(board, clear_targets_list, move=None):
         """クリアー条件　黒番１　横に３つ 1 が並んでいること
         
                  [b3]
@@ -2741,41 +4534,14 @@ class SearchedClearTargets():
           f | ^ ^ ^ ^ ^ . . |
             +---------------+
         
-        図中の ^ は、ループでスキャンする開始地点の範囲を表現している
+        図中の ^ は、並びの開始地点の範囲を表現している
         """
 
-        # 棒サイズ
-        line_length = 3
-        my_stone_color = C_BLACK
-        hit_count = 0
-
-        for rank in range(0, RANK_LEN):
-            #             0,        6
-
-            for file in range(0, FILE_LEN-line_length+1):
-                #             0,        7-          3+1
-                #             0,       =5 
-
-                for i in range(0, line_length):
-                    if board.get_color(Square.file_rank_to_sq(file + i, rank)) != my_stone_color:
-                        break
-
-                    hit_count += 1
-
-                if hit_count == line_length:
-                    clear_targets_list[0] = board.moves_number
-                    break
-
-                hit_count = 0
-
-
-            if hit_count == line_length:
-                hit_count = 0
-                break
+        SearchedClearTargets.update_clear_target(board, clear_targets_list, 0, move)
 
 
     @staticmethod
-    def update_clear_target_b4(board, clear_targets_list):
+    def update_clear_target_b4(board, clear_targets_list, move=None):
         """クリアー条件　黒番２　斜め（左右反転でも構わない）に４つ 1 が並んでいること
         
           Sinister Diagonal     Baroque Diagonal
@@ -2790,70 +4556,15 @@ class SearchedClearTargets():
          f | . . . . . . . |    f | . . . . . . . |
            +---------------+      +---------------+
         
-        図中の ^ は、ループでスキャンする開始地点の範囲を表現している
+        図中の ^ は、並びの開始地点の範囲を表現している
         
         """
 
-        # 棒サイズ
-        line_length = 4
-        my_stone_color = C_BLACK
-        hit_count = 0
-
-        # Sinister Diagonal
-        for rank in range(0, RANK_LEN-line_length+1):
-            #             0,        6-          4+1
-            #             0,       =3
-
-            for file in range(0, FILE_LEN-line_length+1):
-                #             0,        7-          4+1
-                #             0,       =4
-
-                for i in range(0, line_length):
-                    if board.get_color(Square.file_rank_to_sq(file + i, rank + i)) != my_stone_color:
-                        break
-
-                    hit_count += 1
-
-                if hit_count == line_length:
-                    clear_targets_list[1] = board.moves_number
-                    break
-
-                hit_count = 0
-
-
-            if hit_count == line_length:
-                hit_count = 0
-                break
-
-
-        # Baroque Diagonal
-        for rank in range(0, RANK_LEN-(RANK_LEN-line_length)-1):
-            #             0,        6-(       6-          4)-1
-            #             0,       =3 
-            for file in range(line_length-1, FILE_LEN):
-                #                       4-1,        7
-                #                      =3  ,        7
-
-                for i in range(0, line_length):
-                    if board.get_color(Square.file_rank_to_sq(file - i, rank + i)) != my_stone_color:
-                        break
-
-                    hit_count += 1
-
-                if hit_count == line_length:
-                    clear_targets_list[1] = board.moves_number
-                    break
-
-                hit_count = 0
-
-
-            if hit_count == line_length:
-                hit_count = 0
-                break
+        SearchedClearTargets.update_clear_target(board, clear_targets_list, 1, move)
 
 
     @staticmethod
-    def update_clear_target_b5(board, clear_targets_list):
+    def update_clear_target_b5(board, clear_targets_list, move=None):
         """クリアー条件　黒番３　縦に５つ 1 が並んでいること
         
                  [b5]
@@ -2867,42 +4578,15 @@ class SearchedClearTargets():
           f | . . . . . . . |
             +---------------+
         
-        図中の ^ は、ループでスキャンする開始地点の範囲を表現している
+        図中の ^ は、並びの開始地点の範囲を表現している
         
         """
 
-        # 棒サイズ
-        line_length = 5
-        my_stone_color = C_BLACK
-        hit_count = 0
-
-        for rank in range(0, RANK_LEN-line_length+1):
-            #             0,        6-          5+1
-            #             0,       =2
-
-            for file in range(0, FILE_LEN):
-                #             0,        7
-
-                for i in range(0, line_length):
-                    if board.get_color(Square.file_rank_to_sq(file, rank + i)) != my_stone_color:
-                        break
-
-                    hit_count += 1
-
-                if hit_count == line_length:
-                    clear_targets_list[2] = board.moves_number
-                    break
-
-                hit_count = 0
-
-
-            if hit_count == line_length:
-                hit_count = 0
-                break
+        SearchedClearTargets.update_clear_target(board, clear_targets_list, 2, move)
 
 
     @staticmethod
-    def update_clear_target_w3(board, clear_targets_list):
+    def update_clear_target_w3(board, clear_targets_list, move=None):
         """クリアー条件　白番１　縦に３つ 0 が並んでいること
 
                  [w3]
@@ -2916,119 +4600,36 @@ class SearchedClearTargets():
           f | . . . . . . . |
             +---------------+
         
-        図中の ^ は、ループでスキャンする開始地点の範囲を表現している
-        """
-
-        # 棒サイズ
-        line_length = 3
-        my_stone_color = C_WHITE
-        hit_count = 0
-
-        for rank in range(0, RANK_LEN-line_length+1):
-            #             0,        6-          3+1
-            #             0,       =4
-
-            for file in range(0, FILE_LEN):
-                #             0,        7
-
-                for i in range(0, line_length):
-                    if board.get_color(Square.file_rank_to_sq(file, rank + i)) != my_stone_color:
-                        break
-
-                    hit_count += 1
-
-                if hit_count == line_length:
-                    clear_targets_list[3] = board.moves_number
-                    break
-
-                hit_count = 0
-
-
-            if hit_count == line_length:
-                hit_count = 0
-                break
-
-
-    @staticmethod
-    def update_clear_target_w4(board, clear_targets_list):
-        """クリアー条件　白番２　斜め（左右反転でも構わない）に４つ 0 が並んでいること
-        
-          Sinister Diagonal     Baroque Diagonal
-                  [w4]
-             1 2 3 4 5 6 7          1 2 3 4 5 6 7
-           +---------------+      +---------------+
-         a | 0 ^ ^ ^ . . . |    a | . . . 0 ^ ^ ^ |
-         b | ^ 0 ^ ^ . . . |    b | . . 0 ^ ^ ^ ^ |
-         c | ^ ^ 0 ^ . . . |    c | . 0 . ^ ^ ^ ^ |
-         d | . . . 0 . . . |    d | 0 . . . . . . |
-         e | . . . . . . . |    e | . . . . . . . |
-         f | . . . . . . . |    f | . . . . . . . |
-           +---------------+      +---------------+
-        
-        図中の ^ は、ループでスキャンする開始地点の範囲を表現している
-        """
-
-        # 棒サイズ
-        line_length = 4
-        my_stone_color = C_WHITE
-        hit_count = 0
-
-        # Sinister Diagonal
-        for rank in range(0, RANK_LEN-line_length+1):
-            #             0,        6-          4+1
-            #             0,       =3
-
-            for file in range(0, FILE_LEN-line_length+1):
-                #             0,        7-          4+1
-                #             0,       =4
-
-                for i in range(0, line_length):
-                    if board.get_color(Square.file_rank_to_sq(file + i, rank + i)) != my_stone_color:
-                        break
-
-                    hit_count += 1
-
-                if hit_count == line_length:
-                    clear_targets_list[4] = board.moves_number
-                    break
-
-                hit_count = 0
-
-
-            if hit_count == line_length:
-                hit_count = 0
-                break
-
-
-        # Baroque Diagonal
-        for rank in range(0, RANK_LEN-(RANK_LEN-line_length)-1):
-            #             0,        6-(       6-          4)-1
-            #             0,       =3
-
-            for file in range(line_length-1, FILE_LEN):
-                #                       4-1,        7
-                #                      =3  ,        7
-
-                for i in range(0, line_length):
-                    if board.get_color(Square.file_rank_to_sq(file - i, rank + i)) != my_stone_color:
-                        break
-
-                    hit_count += 1
+        図中の ^ は、並びの開始地点の範囲を表現している
+        """
 
-                if hit_count == line_length:
-                    clear_targets_list[4] = board.moves_number
-                    break
+        SearchedClearTargets.update_clear_target(board, clear_targets_list, 3, move)
 
-                hit_count = 0
 
+    @staticmethod
+    def update_clear_target_w4(board, clear_targets_list, move=None):
+        """クリアー条件　白番２　斜め（左右反転でも構わない）に４つ 0 が並んでいること
+        
+          Sinister Diagonal     Baroque Diagonal
+                  [w4]
+             1 2 3 4 5 6 7          1 2 3 4 5 6 7
+           +---------------+      +---------------+
+         a | 0 ^ ^ ^ . . . |    a | . . . 0 ^ ^ ^ |
+         b | ^ 0 ^ ^ . . . |    b | . . 0 ^ ^ ^ ^ |
+         c | ^ ^ 0 ^ . . . |    c | . 0 . ^ ^ ^ ^ |
+         d | . . . 0 . . . |    d | 0 . . . . . . |
+         e | . . . . . . . |    e | . . . . . . . |
+         f | . . . . . . . |    f | . . . . . . . |
+           +---------------+      +---------------+
+        
+        図中の ^ は、並びの開始地点の範囲を表現している
+        """
 
-            if hit_count == line_length:
-                hit_count = 0
-                break
+        SearchedClearTargets.update_clear_target(board, clear_targets_list, 4, move)
 
 
     @staticmethod
-    def update_clear_target_w5(board, clear_targets_list):
+    def update_clear_target_w5(board, clear_targets_list, move=None):
         """クリアー条件　白番３　横に５つ 0 が並んでいること
         
                  [w5]
@@ -3042,41 +4643,14 @@ class SearchedClearTargets():
           f | ^ ^ ^ . . . . |
             +---------------+
         
-        図中の ^ は、ループでスキャンする開始地点の範囲を表現している
+        図中の ^ は、並びの開始地点の範囲を表現している
         """
 
-        # 棒サイズ
-        line_length = 5
-        my_stone_color = C_WHITE
-        hit_count = 0
-
-        for rank in range(0, RANK_LEN):
-            #             0,        6
-
-            for file in range(0, FILE_LEN-line_length+1):
-                #             0,        7-          5+1
-                #             0,       =3
-
-                for i in range(0, line_length):
-                    if board.get_color(Square.file_rank_to_sq(file + i, rank)) != my_stone_color:
-                        break
-
-                    hit_count += 1
-
-                if hit_count == line_length:
-                    clear_targets_list[5] = board.moves_number
-                    break
-
-                hit_count = 0
-
-
-            if hit_count == line_length:
-                hit_count = 0
-                break
+        SearchedClearTargets.update_clear_target(board, clear_targets_list, 5, move)
 
 
     @staticmethod
-    def create_new_clear_targets(board, clear_targets_list):
+    def create_new_clear_targets(board, clear_targets_list, move=None):
         """クリアーターゲット判定オブジェクトを新規作成
         
         先に generate_legal_moves() メソッドを呼び出すように働きます
@@ -3085,28 +4659,18 @@ class SearchedClearTargets():
         ----------
         clear_targets_list : list
             引き継ぐ（変更しません）
+        move : Move
+            直前に指した手。指定すると、その手の対象路と交わる石の並びだけ調べる。
+            引き継ぐ一覧に、指す前の局面で達成済みのクリアーターゲットが漏れなく記録されているときだけ指定してください。
+            ナンなら盤全体を調べる
         """
 
         # NOTE 元のリストを変更しないように注意
         new_clear_targets_list = list(clear_targets_list)
 
-        if new_clear_targets_list[0] == -1:
-            SearchedClearTargets.update_clear_target_b3(board, new_clear_targets_list)
-
-        if new_clear_targets_list[1] == -1:
-            SearchedClearTargets.update_clear_target_b4(board, new_clear_targets_list)
-
-        if new_clear_targets_list[2] == -1:
-            SearchedClearTargets.update_clear_target_b5(board, new_clear_targets_list)
-
-        if new_clear_targets_list[3] == -1:
-            SearchedClearTargets.update_clear_target_w3(board, new_clear_targets_list)
-
-        if new_clear_targets_list[4] == -1:
-            SearchedClearTargets.update_clear_target_w4(board, new_clear_targets_list)
-
-        if new_clear_targets_list[5] == -1:
-            SearchedClearTargets.update_clear_target_w5(board, new_clear_targets_list)
+        for index in range(0, CLEAR_TARGETS_LEN):
+            if new_clear_targets_list[index] == -1:
+                SearchedClearTargets.update_clear_target(board, new_clear_targets_list, index, move)
 
         # TODO 投了しているケースに対応したい
 
@@ -3122,19 +4686,21 @@ class SearchLegalMoves():
 
 
     @staticmethod
-    def _append_binary_operation(board, legal_moves, operator_u, for_edit_mode=False):
-        """
+    def _generate_binary_operation(board, operator_u):
+        """二項演算子の合法手生成
+
         Parameters
         ----------
-        legal_moves : LegalMoves
-            合法手一覧
         board : Board
             盤
         operator_u : str
             演算子コード
             例： 'o'
-        for_edit_mode : bool
-            盤面編集用
+
+        Yields
+        ------
+        move : Move
+            指し手
         """
 
         ## DEBUG ブレークポイントを付ける
@@ -3156,56 +4722,50 @@ class SearchLegalMoves():
 
                 ## DEBUG 表示抑制
                 #if operator_u=='xo':
-                #    print(f"[_append_binary_operation] modify  {way.number=}  {axes_absorber.axis_length=}  {way.low_way().to_code()=}  {way.high_way().to_code()=}")
+                #    print(f"[_generate_binary_operation] modify  {way.number=}  {axes_absorber.axis_length=}  {way.low_way().to_code()=}  {way.high_way().to_code()=}")
 
                 # ロウ、ハイの両方に石が置いてある必要がある
                 if 0 < way.number and way.number < axes_absorber.axis_length - 1 and board.exists_stone_on_way(way.low_way()) and board.exists_stone_on_way(way.high_way()):
                     # modify 操作追加
 
-                    move = Move(way, Operator.code_to_obj(operator_u))
-
-                    ## DEBUG 表示抑制
-                    #if operator_u=='xo':
-                    #    print(f"[_append_binary_operation] append modify  {move.to_code()=}  {for_edit_mode=}")
-
-                    legal_moves.append(board, move, for_edit=for_edit_mode)
+                    yield Move.way_operator_to_obj(way, operator_u)
 
             # 石が置いてない路
             else:
 
+                # 路にロックが掛かっていたら New も禁止（盤面編集の c 演算の後に起こる）
+                if board._way_locks[way.to_code()]:
+                    continue
+
                 ## DEBUG 表示抑制
                 #if operator_u=='xo':
-                #    print(f"[_append_binary_operation] new  {way.number=}  {axes_absorber.axis_length=}  {way.low_way().to_code()=}  {way.low_way(diff=2).to_code()=}  {way.high_way().to_code()=}  {way.high_way(diff=2).to_code()=}")
+                #    print(f"[_generate_binary_operation] new  {way.number=}  {axes_absorber.axis_length=}  {way.low_way().to_code()=}  {way.low_way(diff=2).to_code()=}  {way.high_way().to_code()=}  {way.high_way(diff=2).to_code()=}")
 
                 # 隣のどちらかに２つ続けて石が置いているか？
                 if ((1 < way.number and board.exists_stone_on_way(way.low_way()) and board.exists_stone_on_way(way.low_way(diff=2))) or
                     (way.number < axes_absorber.axis_length - 2 and board.exists_stone_on_way(way.high_way()) and board.exists_stone_on_way(way.high_way(diff=2)))):
                     # new 操作追加
 
-                    move = Move(way, Operator.code_to_obj(operator_u))
-
-                    ## DEBUG 表示抑制
-                    #if operator_u=='xo':
-                    #    print(f"[_append_binary_operation] append new  {move.to_code()=}  {for_edit_mode=}")
-
-                    legal_moves.append(board, move, for_edit=for_edit_mode)
+                    yield Move.way_operator_to_obj(way, operator_u)
 
 
-    def _append_cut_the_edge_operation(board, legal_moves):
+    @staticmethod
+    def _generate_cut_the_edge_operation(board):
         """カットザエッジ（Cut the edge）の合法手生成（盤面編集用）"""
         (rect_exists, left_file, right_file, top_rank, bottom_rank) = board.get_edges()
 
         if rect_exists:
             if 0 < right_file - left_file:
-                legal_moves.append(board=board, move=Move(Way(FILE_AXIS, left_file), Operator.code_to_obj('c')), for_edit=True)
-                legal_moves.append(board=board, move=Move(Way(FILE_AXIS, right_file), Operator.code_to_obj('c')), for_edit=True)
+                yield Move.way_operator_to_obj(Way(FILE_AXIS, left_file), 'c')
+                yield Move.way_operator_to_obj(Way(FILE_AXIS, right_file), 'c')
             
             if 0 < bottom_rank - top_rank:
-                legal_moves.append(board=board, move=Move(Way(RANK_AXIS, top_rank), Operator.code_to_obj('c')), for_edit=True)
-                legal_moves.append(board=board, move=Move(Way(RANK_AXIS, bottom_rank), Operator.code_to_obj('c')), for_edit=True)
+                yield Move.way_operator_to_obj(Way(RANK_AXIS, top_rank), 'c')
+                yield Move.way_operator_to_obj(Way(RANK_AXIS, bottom_rank), 'c')
 
 
-    def _append_shift_operation(board, legal_moves):
+    @staticmethod
+    def _generate_shift_operation(board):
         """シフト（Shift）の合法手生成
         
         例えば：
@@ -3239,13 +4799,11 @@ class SearchLegalMoves():
             if 0 < way_segment.length:
                 # Shift できる
                 for i in range(1, way_segment.length):
-                    move = Move(way, Operator.code_to_obj(f's{i}'))
+                    yield Move.way_operator_to_obj(way, f's{i}')
 
-                    # 合法手として記憶
-                    legal_moves.append(board=board, move=move)
 
-
-    def _append_not_operation(board, legal_moves):
+    @staticmethod
+    def _generate_not_operation(board):
         """ノット（Not）の合法手生成"""
 
         # 全ての種類の路
@@ -3263,28 +4821,37 @@ class SearchLegalMoves():
 
                 if 0 < way.number and board.exists_stone_on_way(way.low_way()):
                     # 路上で小さい方にある石を Not して Reverse できる
-                    legal_moves.append(board=board, move=Move(way, Operator.code_to_obj('nL')))
+                    yield Move.way_operator_to_obj(way, 'nL')
 
                 if way.number < axes_absorber.axis_length - 1 and board.exists_stone_on_way(way.high_way()):
                     # 路上で大きい方にある石を Not して Reverse できる
-                    legal_moves.append(board=board, move=Move(way, Operator.code_to_obj('nH')))
+                    yield Move.way_operator_to_obj(way, 'nH')
 
             # 石が置いてない路
             else:
                 # 隣のどちらかに石が置いているか？
                 if 0 < way.number and board.exists_stone_on_way(way.low_way()):
                     # Not で New できる
-                    legal_moves.append(board=board, move=Move(way, Operator.code_to_obj('n')))
+                    yield Move.way_operator_to_obj(way, 'n')
 
                 if way.number < axes_absorber.axis_length - 1 and board.exists_stone_on_way(way.high_way()):
                     # Not で New できる
-                    legal_moves.append(board=board, move=Move(way, Operator.code_to_obj('n')))
+                    yield Move.way_operator_to_obj(way, 'n')
 
 
     @staticmethod
-    def generate_legal_moves(board):
+    def generate_legal_moves(board, distinct_by_canonical_key=False, debug_push_and_pop=False):
         """現局面から合法手一覧を生成する
-        
+
+        Parameters
+        ----------
+        board : Board
+            盤
+        distinct_by_canonical_key : bool
+            真なら、指した結果が互いに対称形になる指し手同士も distinct_items から省く
+        debug_push_and_pop : bool
+            （デバッグ用）真なら、合法手毎に実際に一手指して戻して確かめる
+
         Returns
         -------
         legal_moves : LegalMoves
@@ -3294,42 +4861,105 @@ class SearchLegalMoves():
         #print("[SearchLegalMoves > generate_legal_moves] 実行")
 
         # 現局面から合法手を生成する
-        legal_moves = LegalMoves(board)
+        legal_moves = LegalMoves(
+                board,
+                distinct_by_canonical_key=distinct_by_canonical_key,
+                debug_push_and_pop=debug_push_and_pop)
+
+        for (move, for_edit) in SearchLegalMoves._generate_candidate_moves(board):
+            legal_moves.append(board=board, move=move, for_edit=for_edit)
+
+        return legal_moves
+
+
+    @staticmethod
+    def _generate_candidate_moves(board, with_edit=True):
+        """合法手の候補を、合法手一覧に並べる順に１つずつ返す
+
+        Parameters
+        ----------
+        board : Board
+            盤
+        with_edit : bool
+            偽なら、盤面編集用の手（カットザエッジ、ゼロ、ワン）は生成しない
+
+        Yields
+        ------
+        move : Move
+            指し手
+        for_edit : bool
+            盤面編集用の手か？
+        """
 
         # カットザエッジ（Cut the edge）の合法手生成（盤面編集用）
-        SearchLegalMoves._append_cut_the_edge_operation(board, legal_moves)
+        if with_edit:
+            for move in SearchLegalMoves._generate_cut_the_edge_operation(board):
+                yield (move, True)
 
         # シフト（Shift）の合法手生成
-        SearchLegalMoves._append_shift_operation(board, legal_moves)
+        for move in SearchLegalMoves._generate_shift_operation(board):
+            yield (move, False)
 
         # ノット（Not）の合法手生成
-        SearchLegalMoves._append_not_operation(board, legal_moves)
+        for move in SearchLegalMoves._generate_not_operation(board):
+            yield (move, False)
 
-        # アンド（AND）の合法手生成
-        SearchLegalMoves._append_binary_operation(board, legal_moves, operator_u='a')
+        # アンド（AND）、オア（OR）、ゼロ（ZERO）、ノア（NOR）、エクソア（XOR）、ナンド（NAND）、エクスノア（XNOR）、ワン（ONE）の合法手生成
+        #
+        #   ゼロ、ワンは盤面編集用
+        #
+        for (operator_u, for_edit) in [('a', False), ('o', False), ('ze', True), ('no', False), ('xo', False), ('na', False), ('xn', False), ('on', True)]:
+            if for_edit and not with_edit:
+                continue
+
+            for move in SearchLegalMoves._generate_binary_operation(board, operator_u=operator_u):
+                yield (move, for_edit)
 
-        # オア（OR）の合法手生成
-        SearchLegalMoves._append_binary_operation(board, legal_moves, operator_u='o')
 
-        # ゼロ（ZERO）の合法手生成
-        SearchLegalMoves._append_binary_operation(board, legal_moves, operator_u='ze', for_edit_mode=True)
+    @staticmethod
+    def iter_distinct_legal_moves(board, with_edit=False, distinct_by_canonical_key=False):
+        """現局面の、結果が同じになる指し手を除いた合法手を、必要になった分だけ１つずつ返す
+
+        generate_legal_moves() の distinct_items と同じ指し手を、同じ順に返す。
+        途中でループを抜ければ、残りの指し手は生成しない。
+        次の指し手を取り出すまでに、盤は元の局面に戻しておくこと
+
+        Parameters
+        ----------
+        board : Board
+            盤
+        with_edit : bool
+            真なら、盤面編集用の手（カットザエッジ、ゼロ、ワン）も、生成した順に混ぜて返す
+        distinct_by_canonical_key : bool
+            真なら、指した結果が互いに対称形になる指し手同士も省く
 
-        # ノア（NOR）の合法手生成
-        SearchLegalMoves._append_binary_operation(board, legal_moves, operator_u='no')
+        Yields
+        ------
+        move : Move
+            指し手
+        """
 
-        # エクソア（XOR）の合法手生成
-        SearchLegalMoves._append_binary_operation(board, legal_moves, operator_u='xo')
+        # 結果が同じになる指し手を省くためだけに使う
+        legal_moves = LegalMoves(board, distinct_by_canonical_key=distinct_by_canonical_key)
 
-        # ナンド（NAND）の合法手生成
-        SearchLegalMoves._append_binary_operation(board, legal_moves, operator_u='na')
+        for (move, for_edit) in SearchLegalMoves._generate_candidate_moves(board, with_edit=with_edit):
+            if for_edit:
+                yield move
 
-        # エクスノア（XNOR）の合法手生成
-        SearchLegalMoves._append_binary_operation(board, legal_moves, operator_u='xn')
+            elif legal_moves.append(board=board, move=move):
+                yield move
 
-        # ワン（ONE）の合法手生成
-        SearchLegalMoves._append_binary_operation(board, legal_moves, operator_u='on', for_edit_mode=True)
 
-        return legal_moves
+    @staticmethod
+    def has_any_legal_move(board):
+        """現局面に、（盤面編集用の手を除く）結果が現局面と異なる合法手が１つでもあるか？
+
+        len(generate_legal_moves(board).distinct_items) が 1 以上かと同じ。最初の１手が見つかれば止める
+        """
+        for _ in SearchLegalMoves.iter_distinct_legal_moves(board):
+            return True
+
+        return False
 
 
 class SearchMateMoveIn1Play():
@@ -3337,11 +4967,13 @@ class SearchMateMoveIn1Play():
 
 
     @staticmethod
-    def find_mate_move_in_1ply(board, move_list, searched_clear_targets):
+    def find_mate_move_in_1ply(board, move_list):
         """１手詰めがあるか調べる
         
         cshogi では Board のメソッド mate_move_in_1ply()。ビナーシでは変更した
 
+        クリアーターゲットは、盤が持っている一覧を使う
+
         Return
         ------
         mate_move_in_1ply : Move
@@ -3354,20 +4986,14 @@ class SearchMateMoveIn1Play():
 
         for move in move_list:
 
-            # DO 試しに一手指す
-            board.push_usi(move.to_code())
-
-            # 新規合法手生成
-            next_legal_moves = SearchLegalMoves.generate_legal_moves(board)
-
-            # 未来のクリアーターゲット新規作成
-            next_searched_clear_targets = SearchedClearTargets.create_new_clear_targets(
-                board=board,
-                # 引き継ぎ
-                clear_targets_list=searched_clear_targets.clear_targets_list)
+            # DO 試しに一手指す。クリアーターゲットも盤が更新する
+            board.push_move(move)
 
             # 未来の終局判定新規作成
-            next_searched_gameover = SearchedGameover.search(board, next_legal_moves, next_searched_clear_targets.clear_targets_list)
+            #
+            #   合法手一覧は作らず、ステールメートかどうかは合法手が１つでもあるかだけで調べる
+            #
+            next_searched_gameover = GameoverOracle.search(board)
 
             # DO 勝ちかどうか判定する。自分に勝ちが有ったら真を返す
             if board.is_gameover(next_searched_gameover):
@@ -3392,6 +5018,322 @@ class SearchMateMoveIn1Play():
         return found_move
 
 
+# N手詰め探索で、既定で読む最大の手数
+DEFAULT_MATE_MAX_PLY = 7
+
+# N手詰め探索の証明数表に、既定で覚えておく局面の数
+DEFAULT_MATE_TABLE_ENTRIES = 1 << 18
+
+# 証明数、反証数の無限大
+_DFPN_INFINITE = 1 << 30
+
+# N手詰め探索で、何ノード毎に、時間切れかどうか調べるか
+_DFPN_CHECK_TIME_INTERVAL_NODES = 256
+
+
+class SearchMateMoveInNPly():
+    """N手詰め探索
+
+    df-pn（深さ優先の証明数探索）で、手番のプレイヤーが何手以内に必ず勝てるかを調べる。
+    手番のプレイヤーが指す局面では、勝てる指し手が１つあればよく、
+    相手が指す局面では、全ての指し手に対して勝てなければならない。
+
+    証明数、反証数は、その局面の手番のプレイヤーから見た φ、δ として持つ。
+    φ が 0 なら、その局面の手番のプレイヤーの勝ち。 δ が 0 なら、勝てない
+    """
+
+
+    def __init__(self, board, max_ply=DEFAULT_MATE_MAX_PLY, max_nodes=None, time_limit_ms=None, max_table_entries=DEFAULT_MATE_TABLE_ENTRIES, stop_event=None):
+        """初期化
+
+        Parameters
+        ----------
+        board : Board
+            盤。探索中は一手指して戻すを繰り返すが、探索後は元の局面に戻る
+        max_ply : int
+            読む最大の手数。１、３、５…と、手数を伸ばしながら短い詰みから探す
+        max_nodes : int
+            探索するノード数の上限。ナンなら、ノード数では止めない
+        time_limit_ms : int
+            探索に使う時間（ミリ秒）。ナンなら、時間では止めない
+        max_table_entries : int
+            証明数表に覚えておく局面の数。あふれたら、古いものから忘れる
+        stop_event : threading.Event
+            セットされたら、時間切れと同じく止める。ナンなら使わない
+        """
+        self._board = board
+        self._max_ply = max_ply
+        self._max_nodes = max_nodes
+        self._time_limit_ms = time_limit_ms
+        self._max_table_entries = max_table_entries
+        self._stop_event = stop_event
+
+        # 証明数表
+        #
+        #   （ゾブリスト・ハッシュ, 探索開始局面からの手数）をキーに、（φ, δ）を覚える。
+        #   同じ局面でも、残りの手数で結果が変わるので、手数もキーに含める。手数は必ず増えるので、循環もしない
+        #
+        self._proof_table = {}
+
+        # 今、読んでいる最大の手数
+        self._current_max_ply = 0
+
+        # 探索したノード数
+        self._nodes = 0
+
+        # 時間切れか、ノード数の上限に達したか？
+        self._stopped = False
+
+        # 探索開始時刻
+        self._start_time = None
+
+
+    @property
+    def nodes(self):
+        """探索したノード数"""
+        return self._nodes
+
+
+    @property
+    def elapsed_ms(self):
+        """探索開始からの経過時間（ミリ秒）"""
+        return int((time.time() - self._start_time) * 1000)
+
+
+    def search(self):
+        """詰みを探す
+
+        Returns
+        -------
+        result : str
+            'mate' なら詰みあり、 'nomate' なら読んだ手数内に詰み無し、 'timeout' なら時間切れかノード数の上限
+        pv : list
+            詰みまでの指し手。詰みが無ければ空
+        """
+
+        self._start_time = time.time()
+        self._nodes = 0
+        self._stopped = False
+
+        # 既に終局していれば、詰みは無い
+        if GameoverOracle.is_gameover(self._board):
+            return 'nomate', []
+
+        # 詰みは、手番のプレイヤーが最後に指すので、手数は奇数
+        for max_ply in range(1, self._max_ply + 1, 2):
+            self._current_max_ply = max_ply
+
+            # 読む手数が変わると、手数の上限の局面の値が変わるので、証明数表は作り直す
+            self._proof_table.clear()
+
+            (phi, _) = self._mid(
+                ply=0,
+                threshold_phi=_DFPN_INFINITE,
+                threshold_delta=_DFPN_INFINITE)
+
+            if self._stopped:
+                return 'timeout', []
+
+            if phi == 0:
+                return 'mate', self._make_pv()
+
+        return 'nomate', []
+
+
+    def _mid(self, ply, threshold_phi, threshold_delta):
+        """φ か δ が閾値以上になるまで、局面を展開する
+
+        Parameters
+        ----------
+        ply : int
+            探索開始局面からの手数
+        threshold_phi : int
+            φ の閾値
+        threshold_delta : int
+            δ の閾値
+
+        Returns
+        -------
+        proof_numbers : tuple
+            （φ, δ）
+        """
+
+        self._nodes += 1
+
+        if self._max_nodes is not None and self._max_nodes <= self._nodes:
+            self._stopped = True
+
+        if self._nodes % _DFPN_CHECK_TIME_INTERVAL_NODES == 0:
+            if self._time_limit_ms is not None and self._time_limit_ms <= self.elapsed_ms:
+                self._stopped = True
+
+            if self._stop_event is not None and self._stop_event.is_set():
+                self._stopped = True
+
+        board = self._board
+        key = (board.zobrist_key_with_clear_targets, ply)
+
+        # 読む手数の上限の局面
+        is_frontier = self._current_max_ply <= ply
+
+        # 終局しているか？
+        #
+        #   上限の局面でなければ、この後で合法手を全て作るので、ステールメートかどうかはそこで分かる
+        #
+        proof_numbers = self._evaluate_gameover(has_legal_move=None if is_frontier else True)
+
+        if proof_numbers is None and is_frontier:
+            # 詰める側の手番なら、手数内に勝てなかった。詰められる側の手番なら、逃れた
+            if ply % 2 == 0:
+                proof_numbers = (_DFPN_INFINITE, 0)
+            else:
+                proof_numbers = (0, _DFPN_INFINITE)
+
+        if proof_numbers is not None:
+            self._store(key, proof_numbers)
+            return proof_numbers
+
+        # 子局面のキーを、盤を変えずに作っておく
+        is_child_frontier = self._current_max_ply <= ply + 1
+        children = []
+
+        for move in SearchLegalMoves.iter_distinct_legal_moves(board):
+            child_clear_targets_bits = board.get_clear_targets_bits_after_move(move)
+            child_key = (board.get_zobrist_keys_after_move(move)[0] ^ _zobrist_clear_targets_bits[child_clear_targets_bits], ply + 1)
+
+            # 読む手数の上限の子局面と、クリアーターゲットで決着が付く子局面は、ここで値を決めておく
+            if (child_key not in self._proof_table and
+                (is_child_frontier or
+                 child_clear_targets_bits & _BLACK_CLEAR_TARGETS_BITS == _BLACK_CLEAR_TARGETS_BITS or
+                 child_clear_targets_bits & _WHITE_CLEAR_TARGETS_BITS == _WHITE_CLEAR_TARGETS_BITS)):
+                board.push_move(move)
+                self._mid(ply + 1, _DFPN_INFINITE, _DFPN_INFINITE)
+                board.pop()
+
+            children.append((move, child_key))
+
+        # ステールメート
+        if len(children) < 1:
+            proof_numbers = self._evaluate_gameover(has_legal_move=False)
+            self._store(key, proof_numbers)
+            return proof_numbers
+
+        while True:
+            # φ は子の δ の最小、 δ は子の φ の和
+            delta = 0
+            best_index = -1
+            best_child_phi = 0
+            best_child_delta = _DFPN_INFINITE + 1
+            second_child_delta = _DFPN_INFINITE
+
+            for index, (_, child_key) in enumerate(children):
+                (child_phi, child_delta) = self._proof_table.get(child_key, (1, 1))
+                delta = min(delta + child_phi, _DFPN_INFINITE)
+
+                if child_delta < best_child_delta:
+                    second_child_delta = best_child_delta
+                    best_child_delta = child_delta
+                    best_child_phi = child_phi
+                    best_index = index
+
+                elif child_delta < second_child_delta:
+                    second_child_delta = child_delta
+
+            phi = min(best_child_delta, _DFPN_INFINITE)
+            self._store(key, (phi, delta))
+
+            if threshold_phi <= phi or threshold_delta <= delta or self._stopped:
+                return (phi, delta)
+
+            # δ が最も小さい子を読む
+            (move, _) = children[best_index]
+
+            board.push_move(move)
+            self._mid(
+                ply=ply + 1,
+                threshold_phi=min(threshold_delta - delta + best_child_phi, _DFPN_INFINITE),
+                threshold_delta=min(threshold_phi, second_child_delta + 1))
+            board.pop()
+
+
+    def _evaluate_gameover(self, has_legal_move=None):
+        """終局していれば、手番のプレイヤーから見た（φ, δ）を返す。終局していなければナン
+
+        Parameters
+        ----------
+        has_legal_move : bool
+            GameoverOracle.search() に渡す
+        """
+
+        board = self._board
+
+        searched_gameover = GameoverOracle.search(board, has_legal_move=has_legal_move)
+        if not board.is_gameover(searched_gameover):
+            return None
+
+        next_turn = board.get_next_turn()
+
+        if ((searched_gameover.is_black_win and next_turn == C_BLACK) or
+            (searched_gameover.is_white_win and next_turn == C_WHITE)):
+            return (0, _DFPN_INFINITE)
+
+        return (_DFPN_INFINITE, 0)
+
+
+    def _store(self, key, proof_numbers):
+        """証明数表に書く。あふれたら、最も前に書いた局面を忘れる"""
+
+        table = self._proof_table
+
+        if key in table:
+            # 書いた順を新しくする
+            del table[key]
+
+        elif self._max_table_entries <= len(table):
+            del table[next(iter(table))]
+
+        table[key] = proof_numbers
+
+
+    def _make_pv(self):
+        """証明数表をたどって、詰みまでの指し手を作る
+
+        詰める側は、勝ちが証明された指し手を、詰められる側は、どの指し手でも負けるので最初の指し手を選ぶ。
+        証明数表から忘れた局面に当たれば、そこで止める
+        """
+
+        board = self._board
+        pv = []
+
+        while len(pv) < self._current_max_ply and not GameoverOracle.is_gameover(board):
+            ply = len(pv)
+            found_move = None
+
+            for move in SearchLegalMoves.iter_distinct_legal_moves(board):
+                board.push_move(move)
+                proof_numbers = self._proof_table.get((board.zobrist_key_with_clear_targets, ply + 1))
+                board.pop()
+
+                if proof_numbers is None:
+                    continue
+
+                # 子局面は、相手の手番から見た値
+                if (ply % 2 == 0 and proof_numbers[1] == 0) or (ply % 2 == 1 and proof_numbers[0] == 0):
+                    found_move = move
+                    break
+
+            if found_move is None:
+                break
+
+            board.push_move(found_move)
+            pv.append(found_move)
+
+        for _ in pv:
+            board.pop()
+
+        return pv
+
+
 class SearchedGameover():
     """ゲームオーバー探索"""
 
@@ -3573,7 +5515,8 @@ class SearchedGameover():
             盤
         legal_moves : LegalMoves
             合法手一覧
-            ステールメートしているか（点数勝負するか）どうかの判定に使う
+            ステールメートしているか（点数勝負するか）どうかの判定に使う。
+            ナンなら、合法手が１つでもあるかだけを調べる
         clear_targets_list : ClearTargetsList
             クリアーターゲット一覧
         """
@@ -3613,7 +5556,12 @@ class SearchedGameover():
                 reason='white win')
 
         # ステールメートしている
-        if len(legal_moves.distinct_items) < 1:
+        if legal_moves is None:
+            is_stalemate = not SearchLegalMoves.has_any_legal_move(board)
+        else:
+            is_stalemate = len(legal_moves.distinct_items) < 1
+
+        if is_stalemate:
             # 点数勝負
             return SearchedGameover._point_calculation(board, is_simultaneous_clearing=False)
 
@@ -3630,6 +5578,119 @@ class SearchedGameover():
             reason='playing')
 
 
+# 終局判定の結果のうち、盤によらず同じになるもの
+#
+#   SearchedGameover は作った後で変わらないので、使い回す
+#
+_searched_gameover_black_win = SearchedGameover(
+    is_black_win=True,
+    is_white_win=False,
+    is_simultaneous_clearing=False,
+    black_count_with_komi = -1,
+    white_count_with_komi = -1,
+    reason='black win')
+
+_searched_gameover_white_win = SearchedGameover(
+    is_black_win=False,
+    is_white_win=True,
+    is_simultaneous_clearing=False,
+    black_count_with_komi = -1,
+    white_count_with_komi = -1,
+    reason='white win')
+
+_searched_gameover_playing = SearchedGameover(
+    is_black_win=False,
+    is_white_win=False,
+    is_simultaneous_clearing=False,
+    black_count_with_komi = -1,
+    white_count_with_komi = -1,
+    reason='playing')
+
+# クリアーターゲット番号のビットを立てたもので、黒番、白番のクリアーターゲット全て
+_BLACK_CLEAR_TARGETS_BITS = 0b000111
+_WHITE_CLEAR_TARGETS_BITS = 0b111000
+
+
+class GameoverOracle():
+    """終局判定
+
+    合法手一覧は作らず、盤が持っている達成済みクリアーターゲットのビットと、
+    結果が現局面と異なる合法手が１つでもあるか（見つかれば止める）だけで、終局しているか、どちらの勝ちか、その理由を答える。
+    結果は SearchedGameover.search() と同じ
+    """
+
+
+    @staticmethod
+    def is_gameover(board, has_legal_move=None):
+        """終局しているか？
+
+        Parameters
+        ----------
+        board : Board
+            盤
+        has_legal_move : bool
+            合法手が１つでもあるか、呼び出し側で分かっていれば指定する。
+            ナンなら、クリアーターゲットで決着が付いていないときだけ調べる
+        """
+
+        clear_targets_bits = board.clear_targets_bits
+
+        if (clear_targets_bits & _BLACK_CLEAR_TARGETS_BITS == _BLACK_CLEAR_TARGETS_BITS or
+            clear_targets_bits & _WHITE_CLEAR_TARGETS_BITS == _WHITE_CLEAR_TARGETS_BITS):
+            return True
+
+        if has_legal_move is None:
+            has_legal_move = SearchLegalMoves.has_any_legal_move(board)
+
+        # ステールメートなら点数勝負。後手の白番にコミがあるので、必ずどちらかの勝ち
+        return not has_legal_move
+
+
+    @staticmethod
+    def search(board, has_legal_move=None):
+        """終局判定
+
+        Parameters
+        ----------
+        board : Board
+            盤
+        has_legal_move : bool
+            合法手が１つでもあるか、呼び出し側で分かっていれば指定する。
+            ナンなら、クリアーターゲットで決着が付いていないときだけ調べる
+
+        Returns
+        -------
+        searched_gameover : SearchedGameover
+            終局判定。 SearchedGameover.search(board, None, board.clear_targets_list) と同じ結果
+        """
+
+        clear_targets_bits = board.clear_targets_bits
+
+        # どちらかのプレイヤーが３つのターゲットを完了した
+        is_black_win = clear_targets_bits & _BLACK_CLEAR_TARGETS_BITS == _BLACK_CLEAR_TARGETS_BITS
+        is_white_win = clear_targets_bits & _WHITE_CLEAR_TARGETS_BITS == _WHITE_CLEAR_TARGETS_BITS
+
+        if is_black_win and is_white_win:
+            # 両者が同時にクリアーターゲットを全て揃えた場合、点数勝負
+            return SearchedGameover._point_calculation(board, is_simultaneous_clearing=True)
+
+        if is_black_win:
+            return _searched_gameover_black_win
+
+        if is_white_win:
+            return _searched_gameover_white_win
+
+        if has_legal_move is None:
+            has_legal_move = SearchLegalMoves.has_any_legal_move(board)
+
+        # ステールメートしているなら、点数勝負
+        if not has_legal_move:
+            return SearchedGameover._point_calculation(board, is_simultaneous_clearing=False)
+
+        # 終局していない
+        return _searched_gameover_playing
+
+
 class PositionCommand():
     """position コマンド"""
 
@@ -3677,11 +5738,10 @@ class PositionCommand():
         # 平手初期局面に変更
         if sfen_u == 'startpos':
             board.reset()
-            position_command._searched_clear_targets = SearchedClearTargets.make_new_obj()
 
         # 指定局面に変更
         elif sfen_u[:5] == 'sfen ':
-            position_command._searched_clear_targets = board.set_sfen(sfen_u[5:])
+            board.set_sfen(sfen_u[5:])
         
         else:
             raise ValueError(f"unsupported position  {sfen_u=}")
@@ -3694,6 +5754,10 @@ class PositionCommand():
         for move_u in move_u_list:
             board.push_usi(move_u)
 
+        # 再生中に達成したものも含めた、現局面のクリアーターゲット
+        position_command._searched_clear_targets = SearchedClearTargets(
+            clear_targets_list=list(board.clear_targets_list))
+
         return position_command
 
 
@@ -1,29 +1,96 @@
 import datetime
 import random
+import threading
 import time
-from py_binarsi import C_EMPTY, C_BLACK, C_WHITE, Move, Board, SearchedClearTargets, SearchLegalMoves, SearchMateMoveIn1Play, SearchedGameover, PositionCommand, SfenHelper
+from py_binarsi import C_EMPTY, C_BLACK, C_WHITE, BOARD_BACKEND_LIST, Move, Board, SearchedClearTargets, SearchLegalMoves, SearchMateMoveIn1Play, SearchMateMoveInNPly, GameoverOracle, PositionCommand, SfenHelper
+from usi_engine.search_alpha_beta import MAX_PLY, SearchAlphaBeta
+from usi_engine.search_mcts import DEFAULT_EXPLORATION, DEFAULT_MAX_NODES, PLAYOUT_HEAVY, PLAYOUT_RANDOM, SearchMcts
+from usi_engine.search_lazy_smp import SearchLazySmp
+from usi_engine.search_root_split import SearchRootSplit
+from usi_engine.time_manager import DEFAULT_NETWORK_DELAY_MS, TimeManager
+from usi_engine.transposition_table import DEFAULT_HASH_MB, TranspositionTable
 
 
 # 思考エンジンの名前が書かれたテキストファイル
 _engine_name_file_path = "usi_engine/engine_name.txt"
 
+# 探索部の種類
+SEARCH_PROFIT = 'Profit'
+SEARCH_ALPHA_BETA = 'AlphaBeta'
+SEARCH_MCTS = 'MCTS'
+
+# 複数のプロセスを使うアルファベータ探索の種類
+PARALLEL_ROOT_SPLIT = 'RootSplit'
+PARALLEL_LAZY_SMP = 'LazySMP'
+
+# 探索中でも、探索を止めずに受け付けるコマンド。これ以外のコマンドは、探索を止めてからする
+_COMMANDS_DURING_SEARCH = ['usi', 'isready', 'stop', 'ponderhit', 'quit']
+
 
 class UsiEngine():
     """USIエンジン"""
 
 
-    def __init__(self):
-        """初期化"""
+    def __init__(self, board_backend=BOARD_BACKEND_LIST):
+        """初期化
+
+        Parameters
+        ----------
+        board_backend : str
+            盤の内部表現。 'list' か 'bitboard'
+        """
 
         # 盤
-        self._board = Board()
+        self._board = Board.make_new_obj(board_backend)
+
+        # エンジン・オプション。 setoption コマンドで変更できる
+        #
+        #   Search      : 探索部の種類
+        #   SearchDepth : 探索する最大の深さ
+        #   MoveTime    : go に時間の引数が無いときに、１手に使う時間（ミリ秒）
+        #   NetworkDelay : 通信の遅れに備えて、持ち時間から引いておく時間（ミリ秒）
+        #   Hash        : 置換表に使うメモリ（メガバイト）
+        #   MctsExploration : ＵＣＴの探索定数の１００倍
+        #   MctsPlayout     : プレイアウトの種類
+        #   MctsMaxNodes    : モンテカルロ木探索の木に持てるノード数
+        #   Threads     : アルファベータ探索に使うプロセスの数
+        #   ParallelSearch : Threads が２以上のときの、プロセスの使い方
+        #
+        self._options = {
+            'Search': SEARCH_PROFIT,
+            'SearchDepth': MAX_PLY - 1,
+            'MoveTime': 3000,
+            'NetworkDelay': DEFAULT_NETWORK_DELAY_MS,
+            'Hash': DEFAULT_HASH_MB,
+            'MctsExploration': int(DEFAULT_EXPLORATION * 100),
+            'MctsPlayout': PLAYOUT_RANDOM,
+            'MctsMaxNodes': DEFAULT_MAX_NODES,
+            'Threads': 1,
+            'ParallelSearch': PARALLEL_ROOT_SPLIT,
+        }
+
+        # 置換表。対局をまたいで使い回し、 usinewgame で空にする
+        self._transposition_table = TranspositionTable(hash_mb=DEFAULT_HASH_MB)
+
+        # モンテカルロ木探索の木。次の go で使い回し、 usinewgame で捨てる
+        self._mcts_root = None
+
+        # 複数の子プロセスで探索するもの（SearchRootSplit か SearchLazySmp）。 Threads が２以上のとき、初めての go で作る
+        self._parallel_search = None
+
+        # 探索するスレッド。 go で作り、 bestmove を出力したら終わる
+        self._search_thread = None
+
+        # 探索を止める合図。 stop, ponderhit, quit でセットする
+        self._search_stop_event = threading.Event()
 
 
     def usi_loop(self):
-        """USIループ"""
+        """USIループ
 
-        # 終局判定を新規作成
-        searched_clear_targets = SearchedClearTargets.make_new_obj()
+        クリアーターゲットは盤が持っていて、一手指す、一手戻すと一緒に更新される。
+        探索は別スレッドでするので、探索中も入力を読み続け、 stop などを受け付ける
+        """
 
         while True:
 
@@ -31,6 +98,10 @@ class UsiEngine():
             input_str = input()
             cmd = input_str.split(' ', 1)
 
+            # 探索中は盤を一手指して戻しているので、盤を使うコマンドの前に探索を止める
+            if cmd[0] not in _COMMANDS_DURING_SEARCH:
+                self.stop()
+
             # USI握手
             if cmd[0] == 'usi':
                 self.usi()
@@ -39,30 +110,38 @@ class UsiEngine():
             elif cmd[0] == 'isready':
                 self.isready()
 
+            # エンジン・オプション設定
+            #   code: setoption name Search value AlphaBeta
+            elif cmd[0] == 'setoption':
+                self.setoption(cmd)
+
             # 新しい対局
             elif cmd[0] == 'usinewgame':
                 self.usinewgame()
 
             # 局面データ解析
             elif cmd[0] == 'position':
-                searched_clear_targets = self.position(input_str)
-                if searched_clear_targets is None:
-                    raise ValueError("searched_clear_targets is None")
+                self.position(input_str)
 
             # 思考開始～最善手返却
             elif cmd[0] == 'go':
-                self.go(searched_clear_targets)
+                self.go(cmd)
 
             # 中断
             elif cmd[0] == 'stop':
                 self.stop()
 
+            # 先読みしていた指し手を、相手が指した
+            elif cmd[0] == 'ponderhit':
+                self.ponderhit()
+
             # 対局終了
             elif cmd[0] == 'gameover':
                 self.gameover(cmd)
 
             # アプリケーション終了
             elif cmd[0] == 'quit':
+                self.quit()
                 break
 
             # 以下、独自拡張
@@ -70,21 +149,22 @@ class UsiEngine():
             # 一手指す
             #   code: do 4n
             elif cmd[0] == 'do':
-                searched_clear_targets = self.do(cmd, searched_clear_targets)
-                if searched_clear_targets is None:
-                    raise ValueError("searched_clear_targets is None")
+                self.do(cmd)
 
             # 一手戻す
             #   code: undo
             elif cmd[0] == 'undo':
-                searched_clear_targets = self.undo(searched_clear_targets)
-                if searched_clear_targets is None:
-                    raise ValueError("searched_clear_targets is None")
+                self.undo()
 
             # SFENを出力
             #   code: sfen
             elif cmd[0] == 'sfen':
-                print(SfenHelper.stringify_sfen(self._board, searched_clear_targets))
+                print(SfenHelper.stringify_sfen(self._board, SearchedClearTargets(clear_targets_list=self._board.clear_targets_list)))
+
+            # 局面のハッシュ（クリアーターゲット込み）を１６進数で出力。コロシアムが、盤がずれていないか確かめる
+            #   code: hash
+            elif cmd[0] == 'hash':
+                print(f"hash {self._board.zobrist_key_with_clear_targets:016x}", flush=True)
 
             # デバッグ情報表示
             #   code: dump
@@ -111,14 +191,70 @@ class UsiEngine():
 
         print(f'id name {engine_name}')
         print(f'id author Muzudho')
+        print(f"option name Search type combo default {SEARCH_PROFIT} var {SEARCH_PROFIT} var {SEARCH_ALPHA_BETA} var {SEARCH_MCTS}")
+        print(f"option name SearchDepth type spin default {MAX_PLY - 1} min 1 max {MAX_PLY - 1}")
+        print(f"option name MoveTime type spin default 3000 min 1 max 3600000")
+        print(f"option name NetworkDelay type spin default {DEFAULT_NETWORK_DELAY_MS} min 0 max 10000")
+        print(f"option name Hash type spin default {DEFAULT_HASH_MB} min 1 max 4096")
+        print(f"option name MctsExploration type spin default {int(DEFAULT_EXPLORATION * 100)} min 0 max 1000")
+        print(f"option name MctsPlayout type combo default {PLAYOUT_RANDOM} var {PLAYOUT_RANDOM} var {PLAYOUT_HEAVY}")
+        print(f"option name MctsMaxNodes type spin default {DEFAULT_MAX_NODES} min 1 max 100000000")
+        print(f"option name Threads type spin default 1 min 1 max 256")
+        print(f"option name ParallelSearch type combo default {PARALLEL_ROOT_SPLIT} var {PARALLEL_ROOT_SPLIT} var {PARALLEL_LAZY_SMP}")
         print('usiok', flush=True)
 
 
     def isready(self):
-        """対局準備"""
+        """対局準備。探索中でも、すぐ返事する"""
         print('readyok', flush=True)
 
 
+    def setoption(self, cmd):
+        """エンジン・オプション設定
+
+        Parameters
+        ----------
+        cmd : list
+            例： ["setoption", "name Search value AlphaBeta"]
+        """
+
+        if len(cmd) < 2:
+            return
+
+        tokens = cmd[1].split(' ')
+
+        if len(tokens) < 4 or tokens[0] != 'name' or tokens[2] != 'value':
+            print(f"[setoption] unexpected format  {cmd=}")
+            return
+
+        name = tokens[1]
+        value = ' '.join(tokens[3:])
+
+        if name not in self._options:
+            print(f"[setoption] undefined option  {name=}")
+            return
+
+        # 数値のオプションは数値に変換する
+        if isinstance(self._options[name], int):
+            try:
+                value = int(value)
+
+            except ValueError:
+                print(f"[setoption] value must be an integer  {name=}  {value=}")
+                return
+
+        self._options[name] = value
+
+        # 置換表の大きさを変える
+        if name == 'Hash' and value != self._transposition_table.hash_mb:
+            self._transposition_table.resize(value)
+
+        # 子プロセスの数や使い方、置換表の大きさが変わったら、子プロセスは作り直す
+        if name in ['Threads', 'ParallelSearch', 'Hash'] and self._parallel_search is not None:
+            self._parallel_search.close()
+            self._parallel_search = None
+
+
     def usinewgame(self):
         """対局中モードに遷移する
         
@@ -128,16 +264,21 @@ class UsiEngine():
         # （しなくていいが？）盤をクリアー
         self._board.clear()
 
+        # 前の対局の探索結果は使わない
+        self._transposition_table.clear()
+        self._mcts_root = None
+
+        if self._parallel_search is not None:
+            self._parallel_search.new_game()
+
         print(f"[{datetime.datetime.now()}] usinewgame end", flush=True)
 
 
     def position(self, input_str):
         """局面データ解析"""
 
-        # position 行を解析します
-        position_command = PositionCommand.parse_and_update_board(self._board, input_str)
-
-        return position_command.searched_clear_targets
+        # position 行を解析します。クリアーターゲットは盤に設定されます
+        PositionCommand.parse_and_update_board(self._board, input_str)
 
 
     @staticmethod
@@ -231,7 +372,7 @@ class UsiEngine():
                 #print(f"[sub_go]  {move.to_code()=}  {current_colors=}  {current_color_count=}")
 
                 # DO １手指す
-                board.push_usi(move.to_code())
+                board.push_move(move)
 
                 # 指し手生成中に合法手生成したら処理速度が激減するので、やってはいけない
                 # 指し手生成中にクリアーターゲット判定をしたら処理速度が激減するので、やってはいけない
@@ -315,33 +456,190 @@ class UsiEngine():
             raise ValueError(f"どのリストも空だ  {len(positive_move_list)=}  {len(come_out_even_move_list)=}  {len(negative_move_list)=}")
 
 
-    def go(self, searched_clear_targets):
-        """思考開始～最善手返却"""
+    def go(self, cmd):
+        """思考開始。探索は別スレッドでして、すぐ戻る
+
+        Parameters
+        ----------
+        cmd : list
+            例： ["go"], ["go", "btime 60000 wtime 50000 byoyomi 10000"], ["go", "btime 60000 wtime 50000 binc 1000 winc 1000"],
+            ["go", "depth 3"], ["go", "movetime 1000"], ["go", "infinite"], ["go", "ponder"], ["go", "mate 1000"]
+        """
+
+        # 前の探索が残っていれば止める
+        self.stop()
+
+        # 複数の子プロセスを使うアルファベータ探索。子プロセスは、このスレッドで作っておく
+        if self._options['Search'] == SEARCH_ALPHA_BETA and 1 < self._options['Threads']:
+            if self._parallel_search is None:
+                if self._options['ParallelSearch'] == PARALLEL_LAZY_SMP:
+                    self._parallel_search = SearchLazySmp(
+                        threads=self._options['Threads'],
+                        hash_mb=self._options['Hash'])
+
+                else:
+                    self._parallel_search = SearchRootSplit(
+                        threads=self._options['Threads'],
+                        hash_mb=self._options['Hash'])
+
+            self._parallel_search.open()
+
+        self._search_stop_event.clear()
+        self._search_thread = threading.Thread(target=self.think, args=(cmd,), daemon=True)
+        self._search_thread.start()
+
+
+    def think(self, cmd):
+        """思考開始～最善手返却。探索するスレッドで呼ばれる
+
+        go infinite, go ponder のときは、読み終えても stop か ponderhit が来るまで bestmove を出力しない。
+        探索中に例外が起きても、将棋所などの GUI が待ち続けないように、 bestmove resign （go mate なら checkmate nomate）は必ず出力する
+
+        Parameters
+        ----------
+        cmd : list
+            go コマンド
+        """
+
+        tokens = cmd[1].split(' ') if 2 <= len(cmd) else []
+
+        # 詰み探索
+        if 0 < len(tokens) and tokens[0] == 'mate':
+            try:
+                self.go_mate(tokens)
+
+            except Exception as err:
+                print(f"[usi engine > think] unexpected error  {err=}, {type(err)=}", flush=True)
+                print('checkmate nomate', flush=True)
+                raise
+
+            return
+
+        best_move_u = 'resign'
+
+        # stop か ponderhit が来るまで探索するか
+        is_infinite = False
+
+        try:
+            # go コマンドの引数
+            go_args = TimeManager.parse_go_tokens(tokens)
+            max_depth = go_args.get('depth', self._options['SearchDepth'])
+            max_nodes = go_args.get('nodes')
+
+            # 持ち時間から、この手に使う時間を決める
+            time_manager = TimeManager(
+                go_args=go_args,
+                next_turn=self._board.get_next_turn(),
+                default_move_time_ms=self._options['MoveTime'],
+                network_delay_ms=self._options['NetworkDelay'])
+
+            is_infinite = time_manager.is_infinite
+            best_move_u = self.think_best_move(max_depth, time_manager, max_nodes)
+
+        except Exception as err:
+            # 例外はスレッドの外へ投げ直して、スタックトレースを標準エラー出力に出させる
+            print(f"[usi engine > think] unexpected error  {err=}, {type(err)=}", flush=True)
+            raise
+
+        finally:
+            # 読み終えても、止める合図を待つ
+            if is_infinite:
+                self._search_stop_event.wait()
+
+            print(f'bestmove {best_move_u}', flush=True)
+
+
+    def think_best_move(self, max_depth, time_manager, max_nodes=None):
+        """最善手を探す
+
+        Parameters
+        ----------
+        max_depth : int
+            アルファベータ探索で読む最大の深さ
+        time_manager : TimeManager
+            この手に使う時間。時間が決まっていなければ、止める合図があるまで探索する
+        max_nodes : int
+            探索するノード数の上限（go nodes）。ナンならノード数では止めない
+
+        Returns
+        -------
+        best_move_u : str
+            最善手の符号。投了なら 'resign'
+        """
+
+        stop_event = self._search_stop_event
 
         legal_moves = SearchLegalMoves.generate_legal_moves(self._board)
         
         # 一手詰めの手を返す。無ければナンを返す
         mate_move_in_1ply = SearchMateMoveIn1Play.find_mate_move_in_1ply(
             board=self._board,
-            move_list=legal_moves.distinct_items,
-            searched_clear_targets=searched_clear_targets)
+            move_list=legal_moves.distinct_items)
 
-        # クリアーターゲット新規作成
-        searched_clear_targets = SearchedClearTargets.create_new_clear_targets(
-            board=self._board,
-            # 引き継ぎ
-            clear_targets_list=searched_clear_targets.clear_targets_list)
+        # クリアーターゲット。盤が持っているものを使う
+        searched_clear_targets = SearchedClearTargets(
+            clear_targets_list=self._board.clear_targets_list)
 
         # 終局判定
-        searched_gameover = SearchedGameover.search(self._board, legal_moves, searched_clear_targets.clear_targets_list)
+        searched_gameover = GameoverOracle.search(self._board, has_legal_move=0 < len(legal_moves.distinct_items))
+
+        # 複数の子プロセスを使うアルファベータ探索
+        if self._options['Search'] == SEARCH_ALPHA_BETA and 1 < self._options['Threads'] and not self._board.is_gameover(searched_gameover) and mate_move_in_1ply is None:
+            (best_move, _, _) = self._parallel_search.go(
+                board=self._board,
+                max_depth=max_depth,
+                time_limit_ms=time_manager.hard_limit_ms,
+                info_printer=lambda info_u: print(info_u, flush=True),
+                stop_event=stop_event,
+                soft_time_limit_ms=time_manager.soft_limit_ms,
+                max_nodes=max_nodes)
+
+            return best_move.to_code()
+
+        # アルファベータ探索
+        if self._options['Search'] == SEARCH_ALPHA_BETA and not self._board.is_gameover(searched_gameover) and mate_move_in_1ply is None:
+            search = SearchAlphaBeta(
+                board=self._board,
+                max_depth=max_depth,
+                time_limit_ms=time_manager.hard_limit_ms,
+                info_printer=lambda info_u: print(info_u, flush=True),
+                transposition_table=self._transposition_table,
+                stop_event=stop_event,
+                soft_time_limit_ms=time_manager.soft_limit_ms,
+                max_nodes=max_nodes)
+
+            (best_move, _, _) = search.go()
+            return best_move.to_code()
+
+        # モンテカルロ木探索。反復が無く、いつ止めても最善手があるので、目安の時間で止める
+        if self._options['Search'] == SEARCH_MCTS and not self._board.is_gameover(searched_gameover) and mate_move_in_1ply is None:
+            time_limit_ms = time_manager.soft_limit_ms
+
+            # go depth の深さでは止められないので、 MoveTime の時間で止める
+            if time_limit_ms is None and max_nodes is None and not time_manager.is_infinite:
+                time_limit_ms = self._options['MoveTime']
+
+            search = SearchMcts(
+                board=self._board,
+                time_limit_ms=time_limit_ms,
+                max_playouts=max_nodes,
+                exploration=self._options['MctsExploration'] / 100,
+                playout=self._options['MctsPlayout'],
+                max_nodes=self._options['MctsMaxNodes'],
+                info_printer=lambda info_u: print(info_u, flush=True),
+                root=self._mcts_root,
+                stop_event=stop_event)
+
+            (best_move, _, _) = search.go()
+            self._mcts_root = search.root
+            return best_move.to_code()
 
         # 次の１手取得
         (best_move, reason) = UsiEngine.sub_go(self._board, legal_moves, mate_move_in_1ply, searched_clear_targets, searched_gameover)
 
         if reason == 'resign':
             # 投了
-            print(f'bestmove resign', flush=True)
-            return
+            return 'resign'
 
         # ビナーシに入玉はありません
 
@@ -349,17 +647,76 @@ class UsiEngine():
         if reason == 'mate 1 move':
             best_move_u = best_move.to_code()
             print('info score mate 1 pv {}'.format(best_move_u), flush=True)
-            print(f'bestmove {best_move_u}', flush=True)
-            return
+            return best_move_u
 
         # １手指す
-        print(f"info depth 0 seldepth 0 time 1 nodes 0 score cp 0 string I'm random move")
-        print(f'bestmove {best_move.to_code()}', flush=True)
+        print(f"info depth 0 seldepth 0 time 1 nodes 0 score cp 0 string I'm random move", flush=True)
+        return best_move.to_code()
+
+
+    def go_mate(self, tokens):
+        """詰み探索
+            code: go mate 1000
+
+        Parameters
+        ----------
+        tokens : list
+            例： ["mate", "1000"], ["mate", "infinite"]
+        """
+
+        # 探索に使う時間（ミリ秒）
+        if 2 <= len(tokens) and tokens[1] != 'infinite':
+            time_limit_ms = int(tokens[1])
+        else:
+            time_limit_ms = None
+
+        search = SearchMateMoveInNPly(
+            board=self._board,
+            time_limit_ms=time_limit_ms,
+            stop_event=self._search_stop_event)
+
+        (result, pv) = search.search()
+
+        if result == 'mate':
+            print(f"checkmate {' '.join([move.to_code() for move in pv])}", flush=True)
+
+        elif result == 'timeout':
+            print('checkmate timeout', flush=True)
+
+        else:
+            print('checkmate nomate', flush=True)
 
 
     def stop(self):
-        """中断"""
-        print('bestmove resign', flush=True)
+        """中断
+
+        探索中なら止めて、それまでに読んだ最善手を bestmove で返させる。探索中でなければ何もしない
+        """
+
+        if self._search_thread is None:
+            return
+
+        self._search_stop_event.set()
+        self._search_thread.join()
+        self._search_thread = None
+
+
+    def ponderhit(self):
+        """先読みしていた指し手を、相手が指した
+
+        先読みしていた探索を止め、それまでに読んだ最善手を返す
+        """
+        self.stop()
+
+
+    def quit(self):
+        """アプリケーション終了。探索中なら止め、子プロセスがあれば終了し、共有メモリを破棄する"""
+
+        self.stop()
+
+        if self._parallel_search is not None:
+            self._parallel_search.close()
+            self._parallel_search = None
 
 
     def gameover(self, cmd):
@@ -383,70 +740,50 @@ class UsiEngine():
                 print(f"（・＿・）何だろな？：'{cmd[1]}'")
 
 
-    def do(self, cmd, searched_clear_targets):
+    def do(self, cmd):
         """一手指す　～　盤表示
 
+        クリアーターゲットは、盤が一緒に更新する
+
         Parameters
         ----------
         cmd : list
             例： ["do", "4n"]
-        searched_clear_targets : SearchedClearTargets
-            クリアーターゲット
-        
-        Returns
-        -------
-        searched_clear_targets : SearchedClearTargets
-            クリアーターゲット
         """
 
         move_u = cmd[1]
 
         if not Move.validate_code(move_u):
             print("illegal move")
-            return searched_clear_targets
+            return
 
         # 一手指す
         self._board.push_usi(move_u)
 
-        # 新規クリアーターゲット作成（そして関数の戻り値として返却）
-        searched_clear_targets = SearchedClearTargets.create_new_clear_targets(
-            board=self._board,
-            # 引き継ぎ
-            clear_targets_list=searched_clear_targets.clear_targets_list)
-
         # 終了の符牒
         print("do ok")
 
-        return searched_clear_targets
 
-
-    def undo(self, searched_clear_targets):
+    def undo(self):
         """一手戻す
             code: undo
+
+        クリアーターゲットも、盤が一緒に元に戻す
         """
         self._board.pop()
 
-        legal_moves = SearchLegalMoves.generate_legal_moves(self._board)
-
-        # クリアーターゲット新規作成
-        searched_clear_targets = SearchedClearTargets.create_new_clear_targets(
-            board=self._board,
-            # 引き継ぎ
-            clear_targets_list=searched_clear_targets.clear_targets_list)
-
-        # 終局判定
-        searched_gameover = SearchedGameover.search(self._board, legal_moves, searched_clear_targets.clear_targets_list)
+        searched_clear_targets = SearchedClearTargets(
+            clear_targets_list=self._board.clear_targets_list)
 
         # 現在の状況表示
         print(SfenHelper.stringify_sfen(self._board, searched_clear_targets, from_present=True))
         print("") # 空行
 
-        return searched_clear_targets
-
 
     def dump(self):
         """デバッグ情報表示"""
         print(f"[dump] {self._board._next_turn_at_init=}")
+        print(self._transposition_table.stringify_dump())
 
 
     def test(self):
@@ -457,7 +794,7 @@ class UsiEngine():
         self.usi()
         self.isready()
         self.usinewgame()
-        searched_clear_targets = self.position('position sfen 7/7/2o4/7/7/7 w - - 1 moves 4n')
+        self.position('position sfen 7/7/2o4/7/7/7 w - - 1 moves 4n')
 
         legal_moves = SearchLegalMoves.generate_legal_moves(self._board)
 
@@ -0,0 +1,485 @@
+import time
+from py_binarsi import C_BLACK, C_WHITE, MOVE_ID_LEN, GameoverOracle, SearchLegalMoves
+from usi_engine.transposition_table import BOUND_EXACT, BOUND_LOWER, BOUND_UPPER
+
+
+# 勝ちの評価値。 SCORE_MATE - 手数 を、その手数で勝つ評価値とする
+SCORE_MATE = 30000
+
+# 評価値の上限
+SCORE_INFINITE = SCORE_MATE + 1
+
+# 探索できる最大の手数
+MAX_PLY = 64
+
+# これより絶対値が大きい評価値は、何手で勝つ（負ける）かを表す
+SCORE_MATE_IN_MAX_PLY = SCORE_MATE - MAX_PLY
+
+# 静的評価で、クリアーターゲット１本の価値
+SCORE_CLEAR_TARGET = 1000
+
+# 静的評価で、石１つの価値
+SCORE_STONE = 100
+
+# 何ノード毎に、持ち時間を使い切ったか調べるか
+_CHECK_TIME_INTERVAL_NODES = 256
+
+# 反復の途中で、何ミリ秒毎に info 行を出力するか
+_INFO_INTERVAL_MS = 1000
+
+
+class SearchAlphaBeta():
+    """アルファベータ探索（ネガマックス法）
+
+    反復深化で１手ずつ深く読み、前回の読み筋、キラー手、ヒストリーで指し手を並べ替える。
+    評価値は、手番から見た値で返す
+    """
+
+
+    def __init__(self, board, max_depth=MAX_PLY, time_limit_ms=None, info_printer=print, transposition_table=None, root_moves=None, start_depth=1, stop_event=None, advances_tt_generation=True, soft_time_limit_ms=None, must_finish_first_iteration=True, max_nodes=None):
+        """初期化
+
+        Parameters
+        ----------
+        board : Board
+            盤。探索中は一手指して戻すを繰り返すが、探索後は元の局面に戻る。
+            クリアーターゲットも、盤が持っているものを使う
+        max_depth : int
+            反復深化で読む最大の深さ
+        time_limit_ms : int
+            打ち切りの時間（ミリ秒）。これを過ぎたら、読んでいる途中でも止める。ナンなら時間では止めない
+        info_printer : function
+            info 行を出力する関数
+        transposition_table : TranspositionTable
+            置換表。ナンなら使わない
+        root_moves : list
+            探索開始局面で読む指し手。ナンなら全ての合法手を読む
+        start_depth : int
+            反復深化で最初に読む深さ。 Lazy SMP で、プロセス毎に読む深さをずらすためのもの
+        stop_event : Event
+            threading.Event か multiprocessing.Event 。セットされたら、最初の反復を除いて止める。ナンなら使わない
+        advances_tt_generation : bool
+            偽なら、探索開始時に置換表の世代を進めない。置換表を共有するプロセス同士で、世代を揃えてあるとき
+        soft_time_limit_ms : int
+            目安の時間（ミリ秒）。これを過ぎたら、次の深さを読まない。ナンなら time_limit_ms まで読む
+        must_finish_first_iteration : bool
+            偽なら、最初の反復も、持ち時間を使い切るか止めるように言われたら途中で止める。
+            Lazy SMP の補助の子プロセスのように、指し手は他の探索が必ず返すとき
+        max_nodes : int
+            探索するノード数の上限。これを超えたら、読んでいる途中でも止める。ナンならノード数では止めない
+        """
+        self._board = board
+        self._max_depth = min(max_depth, MAX_PLY - 1)
+        self._time_limit_ms = time_limit_ms
+        self._info_printer = info_printer
+        self._transposition_table = transposition_table
+        self._root_moves = root_moves
+        self._start_depth = max(min(start_depth, self._max_depth), 1)
+        self._stop_event = stop_event
+        self._advances_tt_generation = advances_tt_generation
+        self._soft_time_limit_ms = soft_time_limit_ms
+        self._max_nodes = max_nodes
+
+        # 探索したノード数
+        self._nodes = 0
+
+        # 今の反復で、探索開始局面から最も深く読んだ手数
+        self._seldepth = 0
+
+        # 持ち時間を使い切ったか？
+        self._stopped = False
+
+        # 持ち時間で止めてよいか？　既定では、最初の反復を読み終えるまでは止めない
+        self._can_stop = not must_finish_first_iteration
+
+        # 探索開始時刻
+        self._start_time = None
+
+        # 最後に info 行を出力した、探索開始からの経過時間（ミリ秒）
+        self._last_info_ms = 0
+
+        # [手数] で、その深さでベータカットを起こした指し手２つ
+        self._killer_moves = [[None, None] for _ in range(0, MAX_PLY)]
+
+        # [指し手番号] で、ベータカットを起こした深さの２乗の合計
+        self._history = [0] * MOVE_ID_LEN
+
+        # [手数] で、その深さからの読み筋
+        self._pv_table = [[] for _ in range(0, MAX_PLY + 1)]
+
+        # 前回の反復で得た読み筋
+        self._previous_pv = []
+
+        # 読み終えた反復毎の（深さ, 最も深く読んだ手数, 評価値, 読み筋）
+        self._iterations = []
+
+
+    @property
+    def nodes(self):
+        """探索したノード数"""
+        return self._nodes
+
+
+    @property
+    def iterations(self):
+        """読み終えた反復毎の（深さ, 最も深く読んだ手数, 評価値, 読み筋）のリスト"""
+        return self._iterations
+
+
+    @property
+    def elapsed_ms(self):
+        """探索開始からの経過時間（ミリ秒）"""
+        return int((time.time() - self._start_time) * 1000)
+
+
+    def go(self):
+        """反復深化で探索する
+
+        最初の反復（既定では深さ１）は、 must_finish_first_iteration が偽でなければ、持ち時間を使い切っても最後まで読む
+
+        Returns
+        -------
+        best_move : Move
+            最善手。合法手が無ければナン
+        score : int
+            最善手の評価値
+        pv : list
+            読み筋
+        """
+
+        self._start_time = time.time()
+
+        if self._transposition_table is not None and self._advances_tt_generation:
+            self._transposition_table.new_search()
+
+        best_move = None
+        best_score = 0
+        best_pv = []
+
+        for depth in range(self._start_depth, self._max_depth + 1):
+            self._seldepth = 0
+
+            score = self._search(
+                depth=depth,
+                ply=0,
+                alpha=-SCORE_INFINITE,
+                beta=SCORE_INFINITE,
+                is_following_pv=True)
+
+            # 途中で止めた反復の結果は使わない
+            if self._stopped:
+                break
+
+            best_pv = list(self._pv_table[0])
+            self._previous_pv = best_pv
+            self._can_stop = True
+
+            if len(best_pv) < 1:
+                break
+
+            best_move = best_pv[0]
+            best_score = score
+            self._iterations.append((depth, self._seldepth, score, best_pv))
+
+            self._info_printer(self.stringify_info(depth, self._seldepth, score, best_pv))
+            self._last_info_ms = self.elapsed_ms
+
+            # 勝ち負けが読み切れたら、それ以上深く読まない
+            if SCORE_MATE_IN_MAX_PLY <= abs(score):
+                break
+
+            # 目安の時間を過ぎたら、次の深さは読まない
+            if self._soft_time_limit_ms is not None and self._soft_time_limit_ms <= self._last_info_ms:
+                break
+
+        return best_move, best_score, best_pv
+
+
+    def stringify_info(self, depth, seldepth, score, pv):
+        """info 行を作る"""
+
+        elapsed_ms = self.elapsed_ms
+        nps = self._nodes * 1000 // max(elapsed_ms, 1)
+        score_u = SearchAlphaBeta.stringify_score(score)
+        pv_u = ' '.join([move.to_code() for move in pv])
+
+        return f"info depth {depth} seldepth {seldepth} time {elapsed_ms} nodes {self._nodes} nps {nps} score {score_u} pv {pv_u}"
+
+
+    @staticmethod
+    def stringify_score(score):
+        """info 行の score の後ろ。例： "cp 50", "mate 3", "mate -2" """
+
+        if SCORE_MATE_IN_MAX_PLY <= abs(score):
+            # 何手で勝つ（負ける）か
+            if 0 < score:
+                return f"mate {SCORE_MATE - score}"
+
+            return f"mate -{SCORE_MATE + score}"
+
+        return f"cp {score}"
+
+
+    def _search(self, depth, ply, alpha, beta, is_following_pv):
+        """ネガマックス法によるアルファベータ探索
+
+        Parameters
+        ----------
+        depth : int
+            残りの深さ
+        ply : int
+            探索開始局面からの手数
+        alpha : int
+            下限
+        beta : int
+            上限
+        is_following_pv : bool
+            前回の反復の読み筋をたどっているか？
+
+        Returns
+        -------
+        score : int
+            手番から見た評価値
+        """
+
+        self._nodes += 1
+        self._pv_table[ply] = []
+
+        if self._seldepth < ply:
+            self._seldepth = ply
+
+        # 持ち時間かノード数を使い切るか、止めるように言われたら、最初の反復を除いて止める
+        if self._nodes % _CHECK_TIME_INTERVAL_NODES == 0:
+            elapsed_ms = self.elapsed_ms
+
+            if self._can_stop:
+                if self._time_limit_ms is not None and self._time_limit_ms <= elapsed_ms:
+                    self._stopped = True
+
+                if self._max_nodes is not None and self._max_nodes <= self._nodes:
+                    self._stopped = True
+
+                if self._stop_event is not None and self._stop_event.is_set():
+                    self._stopped = True
+
+            # 反復が長引いても、探索が進んでいることを知らせる
+            if self._last_info_ms + _INFO_INTERVAL_MS <= elapsed_ms:
+                self._last_info_ms = elapsed_ms
+                self._info_printer(f"info time {elapsed_ms} nodes {self._nodes} nps {self._nodes * 1000 // max(elapsed_ms, 1)}")
+
+        if self._stopped:
+            return 0
+
+        board = self._board
+        is_leaf = depth <= 0 or MAX_PLY - 1 <= ply
+
+        # 終局しているか？
+        #
+        #   葉でなければ、この後で合法手を全て作るので、ステールメートかどうかはそこで分かる
+        #
+        searched_gameover = GameoverOracle.search(board, has_legal_move=None if is_leaf else True)
+        if board.is_gameover(searched_gameover):
+            return SearchAlphaBeta.score_gameover(board, searched_gameover, ply)
+
+        if is_leaf:
+            return SearchAlphaBeta.evaluate(board)
+
+        # 置換表を引く
+        tt = self._transposition_table
+        tt_move_id = -1
+
+        if tt is not None:
+            key = SearchAlphaBeta.make_key(board)
+            entry = tt.probe(key)
+
+            if entry is not None:
+                (tt_depth, tt_bound, tt_score, tt_move_id) = entry
+                tt_score = SearchAlphaBeta.score_from_tt(tt_score, ply)
+
+                # 読み筋を作りたいので、探索開始局面では置換表の評価値を返さない。
+                # 読み筋になり得る局面（PV ノード）でも、ちょうどの評価値（EXACT）では返さない。返すと、そこから先の読み筋が途切れる
+                is_pv_node = is_following_pv or 1 < beta - alpha
+
+                if 0 < ply and depth <= tt_depth:
+                    if ((tt_bound == BOUND_EXACT and not is_pv_node) or
+                        (tt_bound == BOUND_LOWER and beta <= tt_score) or
+                        (tt_bound == BOUND_UPPER and tt_score <= alpha)):
+                        return tt_score
+
+        # 探索開始局面で読む指し手が決まっていれば、それだけ読む
+        if ply == 0 and self._root_moves is not None:
+            move_list = list(self._root_moves)
+        else:
+            move_list = list(SearchLegalMoves.iter_distinct_legal_moves(board))
+
+        # ステールメート
+        if len(move_list) < 1:
+            return SearchAlphaBeta.score_gameover(board, GameoverOracle.search(board, has_legal_move=False), ply)
+
+        # 前回の反復の読み筋の指し手を、最初に読む
+        if is_following_pv and ply < len(self._previous_pv):
+            pv_move = self._previous_pv[ply]
+        else:
+            pv_move = None
+
+        self._order_moves(move_list, ply, pv_move, tt_move_id)
+
+        alpha_at_begin = alpha
+        best_score = -SCORE_INFINITE
+        best_move = None
+
+        for move in move_list:
+
+            # クリアーターゲットも、盤が差分更新する
+            board.push_move(move)
+
+            score = -self._search(
+                depth=depth - 1,
+                ply=ply + 1,
+                alpha=-beta,
+                beta=-alpha,
+                is_following_pv=pv_move is not None and move.id == pv_move.id)
+
+            board.pop()
+
+            if self._stopped:
+                return 0
+
+            if best_score < score:
+                best_score = score
+
+                if alpha < score:
+                    alpha = score
+                    best_move = move
+                    self._pv_table[ply] = [move] + self._pv_table[ply + 1]
+
+                    if beta <= alpha:
+                        self._on_beta_cut(move, ply, depth)
+                        break
+
+        # 置換表に書く。探索開始局面で一部の指し手しか読んでいなければ書かない
+        if tt is not None and not (ply == 0 and self._root_moves is not None):
+            if beta <= best_score:
+                bound = BOUND_LOWER
+            elif alpha_at_begin < best_score:
+                bound = BOUND_EXACT
+            else:
+                bound = BOUND_UPPER
+
+            tt.store(
+                key=key,
+                depth=depth,
+                bound=bound,
+                score=SearchAlphaBeta.score_to_tt(best_score, ply),
+                move_id=best_move.id if best_move is not None else -1)
+
+        return best_score
+
+
+    def _order_moves(self, move_list, ply, pv_move, tt_move_id=-1):
+        """指し手を、読む順に並べ替える
+
+        前回の読み筋の指し手、置換表の最善手、キラー手、ヒストリーの大きい指し手の順
+        """
+
+        killer_ids = [killer.id for killer in self._killer_moves[ply] if killer is not None]
+        pv_move_id = pv_move.id if pv_move is not None else -1
+        history = self._history
+
+        def priority(move):
+            if move.id == pv_move_id:
+                return (3, 0)
+
+            if move.id == tt_move_id:
+                return (2, 0)
+
+            if move.id in killer_ids:
+                return (1, 0)
+
+            return (0, history[move.id])
+
+        move_list.sort(key=priority, reverse=True)
+
+
+    def _on_beta_cut(self, move, ply, depth):
+        """ベータカットを起こした指し手を、キラー手とヒストリーに記憶する"""
+
+        killers = self._killer_moves[ply]
+        if killers[0] is None or killers[0].id != move.id:
+            killers[1] = killers[0]
+            killers[0] = move
+
+        self._history[move.id] += depth * depth
+
+
+    @staticmethod
+    def make_key(board):
+        """置換表のキー
+
+        盤面、路ロック、手番に、どのクリアーターゲットを達成済みかを混ぜる
+        """
+
+        return board.zobrist_key_with_clear_targets
+
+
+    @staticmethod
+    def score_to_tt(score, ply):
+        """置換表に書く評価値
+
+        勝ち負けの評価値は、探索開始局面からではなく、その局面から何手で勝つ（負ける）かに直す
+        """
+        if SCORE_MATE_IN_MAX_PLY <= score:
+            return score + ply
+
+        if score <= -SCORE_MATE_IN_MAX_PLY:
+            return score - ply
+
+        return score
+
+
+    @staticmethod
+    def score_from_tt(score, ply):
+        """置換表から読んだ評価値。 score_to_tt() の逆"""
+        if SCORE_MATE_IN_MAX_PLY <= score:
+            return score - ply
+
+        if score <= -SCORE_MATE_IN_MAX_PLY:
+            return score + ply
+
+        return score
+
+
+    @staticmethod
+    def score_gameover(board, searched_gameover, ply):
+        """終局した局面の、手番から見た評価値
+
+        早く勝つほど、遅く負けるほど良い
+        """
+
+        if ((searched_gameover.is_black_win and board.get_next_turn() == C_BLACK) or
+            (searched_gameover.is_white_win and board.get_next_turn() == C_WHITE)):
+            return SCORE_MATE - ply
+
+        return -(SCORE_MATE - ply)
+
+
+    @staticmethod
+    def evaluate(board):
+        """終局していない局面の、手番から見た静的評価値
+
+        クリアーターゲットの本数の差と、コミを含めた石の数の差
+        """
+
+        clear_targets_list = board.clear_targets_list
+
+        black_clear_targets = sum([1 for moves_number in clear_targets_list[0:3] if moves_number != -1])
+        white_clear_targets = sum([1 for moves_number in clear_targets_list[3:6] if moves_number != -1])
+
+        score = int(
+            SCORE_CLEAR_TARGET * (black_clear_targets - white_clear_targets) +
+            SCORE_STONE * (board.black_count_with_komi - board.white_count_with_komi))
+
+        if board.get_next_turn() == C_BLACK:
+            return score
+
+        return -score
@@ -0,0 +1,276 @@
+import multiprocessing
+import time
+from py_binarsi import Board, Move
+from usi_engine.search_alpha_beta import SearchAlphaBeta
+from usi_engine.search_root_split import _InfoRelay, _drain_info_queue, _wait_async_result
+from usi_engine.transposition_table import TranspositionTable
+
+
+# 子プロセスが使う、共有メモリの置換表
+_worker_transposition_table = None
+
+# 子プロセスが見る、探索を止める合図
+_worker_stop_event = None
+
+# 子プロセスが、親プロセスへ info 行を送るキュー
+_worker_info_queue = None
+
+# ０番の子プロセスが読み終えてから、他の子プロセスの結果を何秒まで待つか
+_HELPER_RESULT_WAIT_SECONDS = 0.1
+
+
+def _init_worker(shared_memory_name, hash_mb, stop_event, info_queue):
+    """子プロセスの初期化
+
+    Parameters
+    ----------
+    shared_memory_name : str
+        置換表を置いた共有メモリの名前
+    hash_mb : int
+        置換表に使うメモリ（メガバイト）
+    stop_event : multiprocessing.Event
+        探索を止める合図
+    info_queue : multiprocessing.Queue
+        親プロセスへ info 行を送るキュー
+    """
+    global _worker_transposition_table, _worker_stop_event, _worker_info_queue
+    _worker_transposition_table = TranspositionTable(hash_mb=hash_mb, shared_memory_name=shared_memory_name)
+    _worker_stop_event = stop_event
+    _worker_info_queue = info_queue
+
+
+def _search_position(task):
+    """子プロセスで、局面をアルファベータ探索する
+
+    Parameters
+    ----------
+    task : tuple
+        （Board.as_compact() で作った局面, 盤の内部表現, 最大の深さ, 打ち切りの時間（ミリ秒）, 目安の時間（ミリ秒）, ノード数の上限, 最初に読む深さ, 置換表の世代, 最初の反復を読み終えるまで止めないか, 探索の番号）
+
+    Returns
+    -------
+    iterations : list
+        読み終えた反復毎の（深さ, 最も深く読んだ手数, 評価値, 読み筋の指し手番号のリスト）
+    nodes : int
+        探索したノード数
+    """
+
+    (compact, board_backend, max_depth, time_limit_ms, soft_time_limit_ms, max_nodes, start_depth, generation, must_finish_first_iteration, search_number) = task
+
+    board = Board.make_new_obj(board_backend)
+    board.set_compact(compact)
+
+    _worker_transposition_table.set_generation(generation)
+
+    # 深さ１から読む０番の子プロセスの info 行だけ、親プロセスがそのまま出力する
+    info_relay = _InfoRelay(_worker_info_queue, search_number, 0)
+
+    search = SearchAlphaBeta(
+        board=board,
+        max_depth=max_depth,
+        time_limit_ms=time_limit_ms,
+        info_printer=info_relay.print_info if must_finish_first_iteration else lambda info_u: None,
+        transposition_table=_worker_transposition_table,
+        start_depth=start_depth,
+        stop_event=_worker_stop_event,
+        soft_time_limit_ms=soft_time_limit_ms,
+        advances_tt_generation=False,
+        must_finish_first_iteration=must_finish_first_iteration,
+        max_nodes=max_nodes)
+    info_relay.search = search
+
+    search.go()
+
+    iterations = [(depth, seldepth, score, [move.id for move in pv]) for (depth, seldepth, score, pv) in search.iterations]
+    return iterations, search.nodes
+
+
+class SearchLazySmp():
+    """Lazy SMP 。複数の子プロセスで同じ局面を、置換表を共有しながらアルファベータ探索する
+
+    置換表は multiprocessing.shared_memory に置き、ロック無しで読み書きする。
+    子プロセス毎に最初に読む深さをずらして、互いに置換表へ書いた結果を使わせる。
+    ０番の子プロセスが読み終えたら、他の子プロセスも止め、最も深く読み終えた子プロセスの結果を使う。
+    指し手は０番の子プロセスが必ず返すので、他の子プロセスは最初の反復の途中でも止まる
+    """
+
+
+    def __init__(self, threads, hash_mb):
+        """初期化
+
+        Parameters
+        ----------
+        threads : int
+            子プロセスの数
+        hash_mb : int
+            共有する置換表に使うメモリ（メガバイト）
+        """
+        self._threads = threads
+        self._hash_mb = hash_mb
+
+        # 共有する置換表。初めて探索するときに作る
+        self._transposition_table = None
+
+        # 子プロセスのプール。初めて探索するときに作る
+        self._pool = None
+
+        # 子プロセスに探索を止めさせる合図
+        self._stop_event = multiprocessing.Event()
+
+        # 前回の探索で、待たずに置いてきた子プロセスの結果
+        self._pending_async_results = []
+
+        # ０番の子プロセスが info 行を送ってくるキュー
+        self._info_queue = multiprocessing.Queue()
+
+        # 探索の番号。 go 毎に増やし、前の探索の info 行を読み捨てる
+        self._search_number = 0
+
+
+    @property
+    def threads(self):
+        """子プロセスの数"""
+        return self._threads
+
+
+    @property
+    def transposition_table(self):
+        """共有する置換表。まだ作っていなければナン"""
+        return self._transposition_table
+
+
+    def new_game(self):
+        """新しい対局。共有する置換表を空にする"""
+        if self._transposition_table is not None:
+            self._transposition_table.clear()
+
+
+    def stop(self):
+        """探索中の子プロセスを止める。それまでに読み終えた結果で指し手を返す"""
+        self._stop_event.set()
+
+
+    def open(self):
+        """共有する置換表と子プロセスを作る。作ってあれば何もしない
+
+        SearchRootSplit.open() と同じく、探索を別スレッドでするなら、先に元のスレッドで呼んでおく
+        """
+        if self._pool is None:
+            self._transposition_table = TranspositionTable.create_shared(self._hash_mb)
+            self._pool = multiprocessing.Pool(
+                processes=self._threads,
+                initializer=_init_worker,
+                initargs=(self._transposition_table.shared_memory_name, self._hash_mb, self._stop_event, self._info_queue))
+
+
+    def close(self):
+        """子プロセスを終了し、共有メモリを破棄する"""
+
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+            self._pending_async_results = []
+
+        if self._transposition_table is not None:
+            self._transposition_table.close()
+            self._transposition_table = None
+
+
+    def go(self, board, max_depth, time_limit_ms, info_printer=print, stop_event=None, soft_time_limit_ms=None, max_nodes=None):
+        """探索する
+
+        Parameters
+        ----------
+        board : Board
+            盤。変更しない
+        max_depth : int
+            反復深化で読む最大の深さ
+        time_limit_ms : int
+            打ち切りの時間（ミリ秒）。ナンなら時間では止めない
+        info_printer : function
+            info 行を出力する関数
+        stop_event : threading.Event
+            セットされたら、子プロセスを止める。ナンなら使わない
+        soft_time_limit_ms : int
+            目安の時間（ミリ秒）。子プロセスは、これを過ぎたら次の深さを読まない
+        max_nodes : int
+            探索するノード数の上限。子プロセス毎の上限で、０番の子プロセスが止まれば他も止まる。ナンならノード数では止めない
+
+        Returns
+        -------
+        best_move : Move
+            最善手。合法手が無ければナン
+        score : int
+            最善手の評価値
+        pv : list
+            読み筋
+        """
+
+        start_time = time.time()
+
+        self.open()
+
+        # 前回の探索で置いてきた子プロセスは、止める合図を見て止まっているはずなので、それを待ってから合図を消す
+        for async_result in self._pending_async_results:
+            async_result.wait()
+
+        self._pending_async_results = []
+        self._stop_event.clear()
+        self._transposition_table.new_search()
+
+        compact = board.as_compact()
+        board_backend = board.board_backend
+        generation = self._transposition_table.generation
+
+        # 子プロセス毎に、最初に読む深さを 1, 2, 3, 1, 2, 3, ... とずらす。
+        # 最初の反復を読み終えるまで止めないのは、０番の子プロセスだけ
+        self._search_number += 1
+        async_results = [
+            self._pool.apply_async(
+                _search_position,
+                ((compact, board_backend, max_depth, time_limit_ms, soft_time_limit_ms, max_nodes, 1 + i % 3, generation, i == 0, self._search_number),))
+            for i in range(0, self._threads)]
+
+        def on_poll():
+            """０番の子プロセスの info 行を、届いた順に出力する"""
+            for (_, _, info_u, _) in _drain_info_queue(self._info_queue, self._search_number):
+                info_printer(info_u)
+
+        # ０番の子プロセスが読み終えたら、他の子プロセスも止める
+        _wait_async_result(async_results[0], stop_event, self._stop_event, on_poll=on_poll)
+        results = [async_results[0].get()]
+        self._stop_event.set()
+        on_poll()
+
+        # 他の子プロセスは少しだけ待ち、間に合わなければ結果を使わずに置いていく
+        deadline = time.time() + _HELPER_RESULT_WAIT_SECONDS
+        for async_result in async_results[1:]:
+            async_result.wait(timeout=max(deadline - time.time(), 0))
+
+            if async_result.ready():
+                results.append(async_result.get())
+            else:
+                self._pending_async_results.append(async_result)
+
+        nodes = sum([worker_nodes for (_, worker_nodes) in results])
+        elapsed_ms = int((time.time() - start_time) * 1000)
+        nps = nodes * 1000 // max(elapsed_ms, 1)
+
+        # 最も深く読み終えた子プロセスの結果を使う。同じ深さなら番号の小さい方
+        best_iterations = []
+        for (iterations, _) in results:
+            if 0 < len(iterations) and (len(best_iterations) < 1 or best_iterations[-1][0] < iterations[-1][0]):
+                best_iterations = iterations
+
+        if len(best_iterations) < 1:
+            return None, 0, []
+
+        # ０番の子プロセスの info 行は出力済みなので、最後に、全ての子プロセスのノード数で最善の結果を出力する
+        (depth, seldepth, best_score, best_pv_ids) = best_iterations[-1]
+        best_pv = [Move.id_to_obj(move_id) for move_id in best_pv_ids]
+
+        pv_u = ' '.join([move.to_code() for move in best_pv])
+        info_printer(f"info depth {depth} seldepth {seldepth} time {elapsed_ms} nodes {nodes} nps {nps} hashfull {self._transposition_table.hashfull()} score {SearchAlphaBeta.stringify_score(best_score)} pv {pv_u}")
+
+        return best_pv[0], best_score, best_pv
@@ -0,0 +1,398 @@
+import math
+import random
+import time
+from py_binarsi import C_BLACK, C_WHITE, GameoverOracle, PlayoutBoard, SearchLegalMoves
+
+
+# ＵＣＴの探索定数の既定値
+DEFAULT_EXPLORATION = 1.41
+
+# 木に持てるノード数の既定値
+DEFAULT_MAX_NODES = 200000
+
+# プレイアウトの種類
+PLAYOUT_RANDOM = 'Random'
+PLAYOUT_HEAVY = 'Heavy'
+
+# 何プレイアウト毎に、持ち時間を使い切ったか調べるか
+_CHECK_TIME_INTERVAL_PLAYOUTS = 16
+
+# 何ミリ秒毎に info 行を出力するか
+_INFO_INTERVAL_MS = 1000
+
+# 勝率を評価値に直すときの係数
+_SCORE_SCALE = 600
+
+
+class MctsNode():
+    """モンテカルロ木探索の木のノード
+
+    探索中に何度も読み書きするので、属性はプロパティを介さずに使う
+    """
+
+    __slots__ = ('move', 'mover', 'children', 'untried_moves', 'visits', 'wins', 'key', 'winner')
+
+
+    def __init__(self, move=None, mover=None):
+        """初期化
+
+        Parameters
+        ----------
+        move : Move
+            親の局面から、このノードの局面へ進む指し手。根ならナン
+        mover : int
+            move を指した手番
+        """
+
+        # 親の局面から、このノードの局面へ進む指し手
+        self.move = move
+
+        # move を指した手番。勝ち数は、この手番から見たもの
+        self.mover = mover
+
+        # 展開済みの子ノード
+        self.children = []
+
+        # まだ子ノードにしていない合法手。木の中を下りる途中で訪れたときに作る。ナンならまだ作っていない
+        self.untried_moves = None
+
+        # 訪れた回数
+        self.visits = 0
+
+        # mover から見た勝ち数
+        self.wins = 0
+
+        # 局面のゾブリスト・ハッシュ（クリアーターゲット込み）。初めて訪れたときに設定する
+        self.key = None
+
+        # 終局していれば勝った方の色。していなければナン
+        self.winner = None
+
+
+    def count_nodes(self):
+        """このノードを根とする部分木のノード数"""
+        count = 0
+        stack = [self]
+
+        while 0 < len(stack):
+            node = stack.pop()
+            count += 1
+            stack.extend(node.children)
+
+        return count
+
+
+class SearchMcts():
+    """モンテカルロ木探索（ＵＣＴ）
+
+    木の中は盤を一手指して戻しながら下り、葉からは PlayoutBoard に写して終局まで乱択で指し進める。
+    勝率は、その指し手を指した手番から見た値
+    """
+
+
+    def __init__(self, board, time_limit_ms=None, max_playouts=None, exploration=DEFAULT_EXPLORATION, playout=PLAYOUT_RANDOM, max_nodes=DEFAULT_MAX_NODES, info_printer=print, root=None, stop_event=None):
+        """初期化
+
+        Parameters
+        ----------
+        board : Board
+            盤。探索中は一手指して戻すを繰り返すが、探索後は元の局面に戻る
+        time_limit_ms : int
+            探索に使う時間（ミリ秒）。ナンなら時間では止めない
+        max_playouts : int
+            プレイアウトの回数の上限。ナンなら回数では止めない。
+            time_limit_ms と両方ナンなら 1000 回で止める（stop_event が無ければ）
+        exploration : float
+            ＵＣＴの探索定数。大きいほど、訪れた回数の少ない指し手を試す
+        playout : str
+            プレイアウトの種類。 'Random' か 'Heavy'
+        max_nodes : int
+            木に持てるノード数。これを超えたら展開せず、葉からプレイアウトだけする
+        info_printer : function
+            info 行を出力する関数
+        root : MctsNode
+            前回の探索の木の根。現局面が、その２手先までにあれば木を使い回す
+        stop_event : threading.Event
+            セットされたら止める。ナンなら使わない
+        """
+        self._board = board
+        self._time_limit_ms = time_limit_ms
+        self._max_playouts = max_playouts
+        self._exploration = exploration
+        self._is_heavy = playout == PLAYOUT_HEAVY
+        self._max_nodes = max_nodes
+        self._info_printer = info_printer
+        self._stop_event = stop_event
+
+        if time_limit_ms is None and max_playouts is None and stop_event is None:
+            self._max_playouts = 1000
+
+        self._random = random.Random()
+
+        # 木の根
+        self._root = SearchMcts.find_reusable_root(root, board)
+        if self._root is None:
+            self._root = MctsNode()
+
+        # 木のノード数
+        self._node_count = self._root.count_nodes()
+
+        # 今回の探索でしたプレイアウトの回数
+        self._playouts = 0
+
+        # 探索開始時刻
+        self._start_time = None
+
+
+    @property
+    def root(self):
+        """木の根。次の探索に渡すと、木を使い回せる"""
+        return self._root
+
+
+    @property
+    def node_count(self):
+        """木のノード数"""
+        return self._node_count
+
+
+    @property
+    def playouts(self):
+        """今回の探索でしたプレイアウトの回数"""
+        return self._playouts
+
+
+    @property
+    def elapsed_ms(self):
+        """探索開始からの経過時間（ミリ秒）"""
+        return int((time.time() - self._start_time) * 1000)
+
+
+    @staticmethod
+    def find_reusable_root(root, board):
+        """前回の木のうち、盤の現局面のノードを探す
+
+        前回の根、その子（相手の手番で探索したとき）、孫（自分の手番で探索したとき）の順に探す
+
+        Returns
+        -------
+        node : MctsNode
+            見つからなければナン
+        """
+
+        if root is None:
+            return None
+
+        key = board.zobrist_key_with_clear_targets
+        nodes = [root]
+
+        for _ in range(0, 3):
+            for node in nodes:
+                if node.key == key:
+                    return node
+
+            nodes = [child for node in nodes for child in node.children]
+
+        return None
+
+
+    def go(self):
+        """探索する
+
+        Returns
+        -------
+        best_move : Move
+            最も多く訪れた指し手。合法手が無ければナン
+        win_rate : float
+            最善手を指した手番から見た勝率
+        pv : list
+            読み筋。訪れた回数の多い指し手をたどったもの
+        """
+
+        self._start_time = time.time()
+        last_info_ms = 0
+
+        while True:
+            self._playout_once()
+            self._playouts += 1
+
+            # ステールメートなど、根で決着が付いていれば探索しない
+            if self._root.winner is not None:
+                break
+
+            if self._max_playouts is not None and self._max_playouts <= self._playouts:
+                break
+
+            if self._stop_event is not None and self._stop_event.is_set():
+                break
+
+            if self._playouts % _CHECK_TIME_INTERVAL_PLAYOUTS == 0:
+                elapsed_ms = self.elapsed_ms
+
+                if self._time_limit_ms is not None and self._time_limit_ms <= elapsed_ms:
+                    break
+
+                if last_info_ms + _INFO_INTERVAL_MS <= elapsed_ms:
+                    last_info_ms = elapsed_ms
+                    self._info_printer(self.stringify_info())
+
+        pv = self.make_pv()
+        if len(pv) < 1:
+            return None, 0.0, []
+
+        best_child = SearchMcts.most_visited_child(self._root)
+        self._info_printer(self.stringify_info())
+        return best_child.move, best_child.wins / best_child.visits, pv
+
+
+    def stringify_info(self):
+        """info 行を作る"""
+
+        elapsed_ms = self.elapsed_ms
+        nps = self._playouts * 1000 // max(elapsed_ms, 1)
+        pv = self.make_pv()
+
+        if len(pv) < 1:
+            return f"info time {elapsed_ms} nodes {self._playouts} nps {nps}"
+
+        best_child = SearchMcts.most_visited_child(self._root)
+        win_rate = best_child.wins / best_child.visits
+        pv_u = ' '.join([move.to_code() for move in pv])
+
+        return f"info depth {len(pv)} time {elapsed_ms} nodes {self._playouts} nps {nps} score cp {SearchMcts.win_rate_to_score(win_rate)} pv {pv_u} string winrate {win_rate:.3f} treenodes {self._node_count}"
+
+
+    def make_pv(self):
+        """読み筋。根から、訪れた回数の最も多い子をたどる"""
+
+        pv = []
+        node = SearchMcts.most_visited_child(self._root)
+
+        while node is not None:
+            pv.append(node.move)
+            node = SearchMcts.most_visited_child(node)
+
+        return pv
+
+
+    @staticmethod
+    def most_visited_child(node):
+        """訪れた回数の最も多い子。無ければナン"""
+
+        best_child = None
+
+        for child in node.children:
+            if best_child is None or best_child.visits < child.visits:
+                best_child = child
+
+        return best_child
+
+
+    @staticmethod
+    def win_rate_to_score(win_rate):
+        """勝率を、評価値（センチポーン）に直す"""
+
+        win_rate = min(max(win_rate, 0.001), 0.999)
+        return int(-_SCORE_SCALE * math.log10(1 / win_rate - 1))
+
+
+    def _playout_once(self):
+        """選択、展開、プレイアウト、逆伝播を１回する"""
+
+        board = self._board
+        node = self._root
+        path = [node]
+        pushed = 0
+
+        if node.key is None:
+            self._visit(node)
+
+        # 選択。全ての合法手を展開し終えたノードでは、ＵＣＢ値の最も大きい子へ下りる
+        while True:
+            if node.winner is None and node.untried_moves is None:
+                self._generate_untried_moves(node)
+
+            if node.winner is not None or 0 < len(node.untried_moves) or len(node.children) < 1:
+                break
+
+            node = self._select_child(node)
+            board.push_move(node.move)
+            pushed += 1
+            path.append(node)
+
+        # 展開
+        if node.winner is None and 0 < len(node.untried_moves) and self._node_count < self._max_nodes:
+            untried_moves = node.untried_moves
+            index = self._random.randrange(len(untried_moves))
+            move = untried_moves[index]
+            untried_moves[index] = untried_moves[-1]
+            untried_moves.pop()
+
+            child = MctsNode(move=move, mover=board.get_next_turn())
+            node.children.append(child)
+            self._node_count += 1
+
+            board.push_move(move)
+            pushed += 1
+            path.append(child)
+            self._visit(child)
+            node = child
+
+        # プレイアウト
+        if node.winner is not None:
+            winner = node.winner
+        else:
+            winner = PlayoutBoard.from_board(board).playout(self._random, is_heavy=self._is_heavy)
+
+        for _ in range(0, pushed):
+            board.pop()
+
+        # 逆伝播
+        for node in path:
+            node.visits += 1
+            if node.mover == winner:
+                node.wins += 1
+
+
+    def _visit(self, node):
+        """初めて訪れたノードの、局面のキーと、クリアーターゲットで決着が付いているかを調べる
+
+        合法手の生成は重いので、２回目に訪れるまで遅らせる。ステールメートはプレイアウトで分かる
+        """
+
+        board = self._board
+        node.key = board.zobrist_key_with_clear_targets
+
+        searched_gameover = GameoverOracle.search(board, has_legal_move=True)
+        if board.is_gameover(searched_gameover):
+            node.winner = C_BLACK if searched_gameover.is_black_win else C_WHITE
+
+
+    def _generate_untried_moves(self, node):
+        """ノードの合法手を作る。合法手が無ければステールメート"""
+
+        board = self._board
+        node.untried_moves = list(SearchLegalMoves.iter_distinct_legal_moves(board))
+
+        # ステールメート
+        if len(node.untried_moves) < 1:
+            searched_gameover = GameoverOracle.search(board, has_legal_move=False)
+            node.winner = C_BLACK if searched_gameover.is_black_win else C_WHITE
+
+
+    def _select_child(self, node):
+        """ＵＣＢ値の最も大きい子"""
+
+        log_visits = math.log(node.visits)
+        exploration = self._exploration
+        best_child = None
+        best_value = -1.0
+
+        for child in node.children:
+            value = child.wins / child.visits + exploration * math.sqrt(log_visits / child.visits)
+
+            if best_value < value:
+                best_value = value
+                best_child = child
+
+        return best_child
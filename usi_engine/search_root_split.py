@@ -0,0 +1,449 @@
+import multiprocessing
+import queue
+import time
+from py_binarsi import Board, Move, SearchLegalMoves
+from usi_engine.search_alpha_beta import SCORE_MATE_IN_MAX_PLY, SearchAlphaBeta
+from usi_engine.transposition_table import TranspositionTable
+
+
+# 子プロセスの置換表。子プロセス毎に１つ持ち、探索をまたいで使い回す
+_worker_transposition_table = None
+
+# 子プロセスの置換表を使った対局の番号。変わったら置換表を空にする
+_worker_game_number = None
+
+# 子プロセスが見る、探索を止める合図
+_worker_stop_event = None
+
+# 子プロセスが、親プロセスへ info 行を送るキュー
+_worker_info_queue = None
+
+# 子プロセスの結果を待つ間、呼び出し側の止める合図と info 行のキューを何秒毎に見るか
+_STOP_EVENT_POLL_SECONDS = 0.01
+
+# 深さの途中で、何ミリ秒毎に info 行を出力するか。 SearchAlphaBeta と同じ
+_INFO_INTERVAL_MS = 1000
+
+
+def _init_worker(hash_mb, stop_event, info_queue):
+    """子プロセスの初期化
+
+    Parameters
+    ----------
+    hash_mb : int
+        子プロセス１つの置換表に使うメモリ（メガバイト）
+    stop_event : multiprocessing.Event
+        探索を止める合図
+    info_queue : multiprocessing.Queue
+        親プロセスへ info 行を送るキュー
+    """
+    global _worker_transposition_table, _worker_stop_event, _worker_info_queue
+    _worker_transposition_table = TranspositionTable(hash_mb=hash_mb)
+    _worker_stop_event = stop_event
+    _worker_info_queue = info_queue
+
+
+class _InfoRelay():
+    """子プロセスの SearchAlphaBeta の info 行を、親プロセスへキューで送る
+
+    キューには（探索の番号, 子プロセスの番号, 探索したノード数, info 行, 読み終えた反復）を送る。
+    読み終えた反復は、深さを読み終えたときの info 行なら（深さ, 最も深く読んだ手数, 評価値, 読み筋の指し手番号のリスト）、そうでなければナン
+    """
+
+
+    def __init__(self, info_queue, search_number, worker_index):
+        """初期化
+
+        Parameters
+        ----------
+        info_queue : multiprocessing.Queue
+            親プロセスへ info 行を送るキュー
+        search_number : int
+            探索の番号。前の探索で送り残したものを、親プロセスが読み捨てるためのもの
+        worker_index : int
+            子プロセスの番号
+        """
+        self._info_queue = info_queue
+        self._search_number = search_number
+        self._worker_index = worker_index
+
+        # info 行を送る探索。 SearchAlphaBeta を作った後で設定する
+        self.search = None
+
+
+    def print_info(self, info_u):
+        """SearchAlphaBeta の info_printer に渡す"""
+
+        iteration = None
+        if info_u.startswith('info depth '):
+            (depth, seldepth, score, pv) = self.search.iterations[-1]
+            iteration = (depth, seldepth, score, [move.id for move in pv])
+
+        self._info_queue.put((self._search_number, self._worker_index, self.search.nodes, info_u, iteration))
+
+
+def _drain_info_queue(info_queue, search_number):
+    """キューに届いている info 行を全て取り出す。前の探索のものは読み捨てる
+
+    Returns
+    -------
+    items : list
+        （子プロセスの番号, 探索したノード数, info 行, 読み終えた反復）のリスト
+    """
+
+    items = []
+
+    while True:
+        try:
+            item = info_queue.get_nowait()
+
+        except queue.Empty:
+            return items
+
+        if item[0] == search_number:
+            items.append(item[1:])
+
+
+def _search_root_moves(task):
+    """子プロセスで、探索開始局面の指し手の一部だけをアルファベータ探索する
+
+    Parameters
+    ----------
+    task : tuple
+        （Board.as_compact() で作った局面, 盤の内部表現, 読む指し手の指し手番号のリスト, 最大の深さ, 打ち切りの時間（ミリ秒）, 目安の時間（ミリ秒）, ノード数の上限, 対局の番号, 子プロセスの番号, 探索の番号）
+
+    Returns
+    -------
+    iterations : list
+        読み終えた反復毎の（深さ, 最も深く読んだ手数, 評価値, 読み筋の指し手番号のリスト）
+    nodes : int
+        探索したノード数
+    """
+    global _worker_game_number
+
+    (compact, board_backend, move_ids, max_depth, time_limit_ms, soft_time_limit_ms, max_nodes, game_number, worker_index, search_number) = task
+
+    if _worker_game_number != game_number:
+        _worker_transposition_table.clear()
+        _worker_game_number = game_number
+
+    board = Board.make_new_obj(board_backend)
+    board.set_compact(compact)
+
+    # 受け持った指し手だけの結果なので、 info 行はそのまま出力せず、親プロセスが全ての子プロセスの分をまとめる
+    info_relay = _InfoRelay(_worker_info_queue, search_number, worker_index)
+
+    search = SearchAlphaBeta(
+        board=board,
+        max_depth=max_depth,
+        time_limit_ms=time_limit_ms,
+        info_printer=info_relay.print_info,
+        transposition_table=_worker_transposition_table,
+        root_moves=[Move.id_to_obj(move_id) for move_id in move_ids],
+        stop_event=_worker_stop_event,
+        soft_time_limit_ms=soft_time_limit_ms,
+        max_nodes=max_nodes)
+    info_relay.search = search
+
+    search.go()
+
+    iterations = [(depth, seldepth, score, [move.id for move in pv]) for (depth, seldepth, score, pv) in search.iterations]
+    return iterations, search.nodes
+
+
+def _wait_async_result(async_result, stop_event, worker_stop_event, on_poll=None):
+    """子プロセスの結果を待つ。その間に stop_event がセットされたら、子プロセスに止める合図を送る
+
+    Parameters
+    ----------
+    async_result : multiprocessing.pool.AsyncResult
+        子プロセスの結果
+    stop_event : threading.Event
+        呼び出し側の、止める合図。ナンなら使わない
+    worker_stop_event : multiprocessing.Event
+        子プロセスが見る、止める合図
+    on_poll : function
+        待つ間に繰り返し呼ぶ関数。 info 行のキューを見るためのもの。ナンなら呼ばない
+    """
+
+    while not async_result.ready():
+        if stop_event is not None and stop_event.is_set():
+            worker_stop_event.set()
+
+        if on_poll is not None:
+            on_poll()
+
+        async_result.wait(timeout=_STOP_EVENT_POLL_SECONDS)
+
+
+class SearchRootSplit():
+    """探索開始局面の指し手を子プロセスに分けて、アルファベータ探索する
+
+    Python のスレッドは GIL のせいで同時に動かないので、 multiprocessing のプロセスを使う。
+    子プロセスには局面を Board.as_compact() のタプルで渡し、それぞれ受け持った指し手だけを読ませ、
+    全ての子プロセスが読み終えた深さのうち最も深いところで、評価値の最も良い指し手を選ぶ
+    """
+
+
+    def __init__(self, threads, hash_mb):
+        """初期化
+
+        Parameters
+        ----------
+        threads : int
+            子プロセスの数
+        hash_mb : int
+            置換表に使うメモリ（メガバイト）。子プロセスで等分する
+        """
+        self._threads = threads
+        self._hash_mb = hash_mb
+
+        # 子プロセスのプール。初めて探索するときに作る
+        self._pool = None
+
+        # 対局の番号。 usinewgame 毎に増やし、子プロセスの置換表を空にさせる
+        self._game_number = 0
+
+        # 子プロセスに探索を止めさせる合図
+        self._stop_event = multiprocessing.Event()
+
+        # 子プロセスが info 行を送ってくるキュー
+        self._info_queue = multiprocessing.Queue()
+
+        # 探索の番号。 go 毎に増やし、前の探索の info 行を読み捨てる
+        self._search_number = 0
+
+
+    @property
+    def threads(self):
+        """子プロセスの数"""
+        return self._threads
+
+
+    @property
+    def hash_mb(self):
+        """置換表に使うメモリ（メガバイト）"""
+        return self._hash_mb
+
+
+    def new_game(self):
+        """新しい対局。子プロセスの置換表は、次の探索で空にさせる"""
+        self._game_number += 1
+
+
+    def stop(self):
+        """探索中の子プロセスを止める。それまでに読み終えた結果で指し手を返す"""
+        self._stop_event.set()
+
+
+    def open(self):
+        """子プロセスを作る。作ってあれば何もしない
+
+        fork で子プロセスを作るので、他のスレッドが input() で標準入力を読んでいる間に呼ぶと、子プロセスが止まってしまう。
+        探索を別スレッドでするなら、先に元のスレッドで呼んでおく
+        """
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(
+                processes=self._threads,
+                initializer=_init_worker,
+                initargs=(max(self._hash_mb // self._threads, 1), self._stop_event, self._info_queue))
+
+
+    def close(self):
+        """子プロセスを終了する"""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+
+    def go(self, board, max_depth, time_limit_ms, info_printer=print, stop_event=None, soft_time_limit_ms=None, max_nodes=None):
+        """探索する
+
+        Parameters
+        ----------
+        board : Board
+            盤。変更しない
+        max_depth : int
+            反復深化で読む最大の深さ
+        time_limit_ms : int
+            打ち切りの時間（ミリ秒）。ナンなら時間では止めない
+        info_printer : function
+            info 行を出力する関数
+        stop_event : threading.Event
+            セットされたら、子プロセスを止める。ナンなら使わない
+        soft_time_limit_ms : int
+            目安の時間（ミリ秒）。子プロセスは、これを過ぎたら次の深さを読まない
+        max_nodes : int
+            探索するノード数の上限。子プロセスで等分する。ナンならノード数では止めない
+
+        Returns
+        -------
+        best_move : Move
+            最善手。合法手が無ければナン
+        score : int
+            最善手の評価値
+        pv : list
+            読み筋
+        """
+
+        start_time = time.time()
+
+        move_list = list(SearchLegalMoves.iter_distinct_legal_moves(board))
+        if len(move_list) < 1:
+            return None, 0, []
+
+        # 指し手を、子プロセスへ順番に配る
+        move_ids_list = [[] for _ in range(0, min(self._threads, len(move_list)))]
+        for (i, move) in enumerate(move_list):
+            move_ids_list[i % len(move_ids_list)].append(move.id)
+
+        self.open()
+        self._stop_event.clear()
+
+        compact = board.as_compact()
+        board_backend = board.board_backend
+        worker_max_nodes = max(max_nodes // len(move_ids_list), 1) if max_nodes is not None else None
+        self._search_number += 1
+        tasks = [
+            (compact, board_backend, move_ids, max_depth, time_limit_ms, soft_time_limit_ms, worker_max_nodes, self._game_number, worker_index, self._search_number)
+            for (worker_index, move_ids) in enumerate(move_ids_list)]
+
+        # 子プロセス毎の、読み終えた反復と、探索したノード数。キューで届いたものと、最後に結果で受け取ったもの
+        worker_iterations = [[] for _ in tasks]
+        worker_nodes = [0] * len(tasks)
+
+        # 出力を済ませた深さ
+        printed_depth = 0
+
+        # 最後に info 行を出力した、探索開始からの経過時間（ミリ秒）
+        last_info_ms = 0
+
+        # 出力を済ませた深さのうち、最も深いところの最善手、評価値、読み筋
+        best_move = None
+        best_score = 0
+        best_pv = []
+
+        def print_info():
+            """全ての子プロセスが読み終えた深さの info 行を出力する。出力するものが無ければ、１秒毎に探索の進み具合を出力する"""
+            nonlocal printed_depth, last_info_ms, best_move, best_score, best_pv
+
+            elapsed_ms = int((time.time() - start_time) * 1000)
+            nodes = sum(worker_nodes)
+            nps = nodes * 1000 // max(elapsed_ms, 1)
+
+            # 勝ち負けが読み切れたら、それ以上深い結果は見ない
+            if SCORE_MATE_IN_MAX_PLY <= abs(best_score):
+                return
+
+            for depth in range(printed_depth + 1, SearchRootSplit.get_common_depth(worker_iterations, max_depth) + 1):
+                (seldepth, score, pv_ids) = SearchRootSplit.combine_iterations(worker_iterations, depth)
+
+                best_pv = [Move.id_to_obj(move_id) for move_id in pv_ids]
+                best_move = best_pv[0]
+                best_score = score
+                printed_depth = depth
+                last_info_ms = elapsed_ms
+
+                score_u = SearchAlphaBeta.stringify_score(best_score)
+                pv_u = ' '.join([move.to_code() for move in best_pv])
+                info_printer(f"info depth {depth} seldepth {seldepth} time {elapsed_ms} nodes {nodes} nps {nps} score {score_u} pv {pv_u}")
+
+                if SCORE_MATE_IN_MAX_PLY <= abs(best_score):
+                    return
+
+            # 深さが長引いても、探索が進んでいることを知らせる
+            if last_info_ms + _INFO_INTERVAL_MS <= elapsed_ms:
+                last_info_ms = elapsed_ms
+                info_printer(f"info time {elapsed_ms} nodes {nodes} nps {nps}")
+
+        def on_poll():
+            """キューに届いた子プロセスの進み具合を集めて、 info 行を出力する"""
+            for (worker_index, nodes, _, iteration) in _drain_info_queue(self._info_queue, self._search_number):
+                worker_nodes[worker_index] = nodes
+
+                if iteration is not None:
+                    worker_iterations[worker_index].append(iteration)
+
+            print_info()
+
+        async_result = self._pool.map_async(_search_root_moves, tasks)
+        _wait_async_result(async_result, stop_event, self._stop_event, on_poll=on_poll)
+
+        # キューより、子プロセスが返した結果の方が確か
+        for (worker_index, (iterations, nodes)) in enumerate(async_result.get()):
+            worker_iterations[worker_index] = iterations
+            worker_nodes[worker_index] = nodes
+
+        print_info()
+
+        return best_move, best_score, best_pv
+
+
+    @staticmethod
+    def get_common_depth(worker_iterations, max_depth):
+        """全ての子プロセスが読み終えた深さ
+
+        勝ち負けを読み切った子プロセスは、それより深く読まなくても結果は変わらない
+
+        Parameters
+        ----------
+        worker_iterations : list
+            子プロセス毎の、読み終えた反復のリスト
+        max_depth : int
+            反復深化で読む最大の深さ
+
+        Returns
+        -------
+        common_depth : int
+            まだ１つも反復を読み終えていない子プロセスがあれば 0
+        """
+
+        common_depth = max_depth
+
+        for iterations in worker_iterations:
+            if len(iterations) < 1:
+                return 0
+
+            (last_depth, _, last_score, _) = iterations[-1]
+
+            if abs(last_score) < SCORE_MATE_IN_MAX_PLY:
+                common_depth = min(common_depth, last_depth)
+
+        return common_depth
+
+
+    @staticmethod
+    def combine_iterations(worker_iterations, depth):
+        """子プロセス毎の、その深さの結果のうち、評価値の最も良いものを選ぶ
+
+        その深さを読み終えていない子プロセス（勝ち負けを読み切ったもの）は、読み切った最後の結果を使う
+
+        Returns
+        -------
+        seldepth : int
+            子プロセスのうち、最も深く読んだ手数
+        score : int
+            評価値
+        pv_ids : list
+            読み筋の指し手番号のリスト
+        """
+
+        best_score = None
+        best_pv_ids = None
+        best_seldepth = 0
+
+        for iterations in worker_iterations:
+            (_, seldepth, score, pv_ids) = iterations[-1]
+            for (iteration_depth, iteration_seldepth, iteration_score, iteration_pv_ids) in iterations:
+                if iteration_depth == depth:
+                    (seldepth, score, pv_ids) = (iteration_seldepth, iteration_score, iteration_pv_ids)
+                    break
+
+            best_seldepth = max(best_seldepth, seldepth)
+
+            if best_score is None or best_score < score:
+                best_score = score
+                best_pv_ids = pv_ids
+
+        return best_seldepth, best_score, best_pv_ids
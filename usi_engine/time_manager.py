@@ -0,0 +1,135 @@
+from py_binarsi import C_BLACK
+
+
+# 持ち時間を、あと何手で使い切るつもりで配分するか
+_MOVES_TO_GO = 30
+
+# 打ち切りの時間は、目安の時間の何倍までにするか
+_HARD_LIMIT_RATIO = 4
+
+# 通信の遅れに備えて、持ち時間から引いておく時間（ミリ秒）の既定値
+DEFAULT_NETWORK_DELAY_MS = 100
+
+# go コマンドの、数値の引数の名前
+_GO_INT_ARG_NAMES = ['btime', 'wtime', 'byoyomi', 'binc', 'winc', 'movetime', 'depth', 'nodes']
+
+# go コマンドの、数値の無い引数の名前
+_GO_FLAG_ARG_NAMES = ['infinite', 'ponder']
+
+
+class TimeManager():
+    """１手に使う時間を決める
+
+    目安の時間（soft limit）と、打ち切りの時間（hard limit）を決める。
+    反復深化では、目安の時間を過ぎたら次の深さを読まず、打ち切りの時間を過ぎたら読んでいる途中でも止める
+    """
+
+
+    def __init__(self, go_args, next_turn, default_move_time_ms, network_delay_ms=DEFAULT_NETWORK_DELAY_MS):
+        """初期化
+
+        Parameters
+        ----------
+        go_args : dict
+            TimeManager.parse_go_tokens() で作った go コマンドの引数
+        next_turn : int
+            手番。 C_BLACK なら btime, binc を、 C_WHITE なら wtime, winc を使う
+        default_move_time_ms : int
+            go コマンドに時間の引数が無いときに、１手に使う時間（ミリ秒）
+        network_delay_ms : int
+            通信の遅れに備えて、持ち時間から引いておく時間（ミリ秒）
+        """
+
+        # 目安の時間（ミリ秒）。ナンなら時間では止めない
+        self._soft_limit_ms = None
+
+        # 打ち切りの時間（ミリ秒）。ナンなら時間では止めない
+        self._hard_limit_ms = None
+
+        # stop か ponderhit が来るまで探索するか
+        self._is_infinite = 'infinite' in go_args or 'ponder' in go_args
+
+        if self._is_infinite:
+            return
+
+        # １手に使う時間が決まっている
+        if 'movetime' in go_args:
+            self._soft_limit_ms = go_args['movetime']
+            self._hard_limit_ms = go_args['movetime']
+            return
+
+        if next_turn == C_BLACK:
+            time_left_ms = go_args.get('btime')
+            increment_ms = go_args.get('binc', 0)
+        else:
+            time_left_ms = go_args.get('wtime')
+            increment_ms = go_args.get('winc', 0)
+
+        byoyomi_ms = go_args.get('byoyomi', 0)
+
+        # 時間の引数が無ければ、エンジン・オプションの MoveTime を使う。
+        # ただし、深さかノード数の指定があれば、それで止めるので時間では止めない
+        if time_left_ms is None and byoyomi_ms == 0 and increment_ms == 0:
+            if 'depth' in go_args or 'nodes' in go_args:
+                return
+
+            self._soft_limit_ms = default_move_time_ms
+            self._hard_limit_ms = default_move_time_ms
+            return
+
+        if time_left_ms is None:
+            time_left_ms = 0
+
+        # この手で使い切ってよい時間。秒読みと加算は、この手で使わなければ無くなるか、次の手で戻ってくる
+        available_ms = max(time_left_ms + byoyomi_ms + increment_ms - network_delay_ms, 1)
+
+        soft_limit_ms = time_left_ms // _MOVES_TO_GO + byoyomi_ms + increment_ms - network_delay_ms
+        self._soft_limit_ms = min(max(soft_limit_ms, 1), available_ms)
+
+        # 秒読みだけなら、打ち切りまで使ってよい。持ち時間があれば、目安の数倍までにする
+        self._hard_limit_ms = min(max(time_left_ms // _MOVES_TO_GO * _HARD_LIMIT_RATIO + byoyomi_ms + increment_ms - network_delay_ms, self._soft_limit_ms), available_ms)
+
+
+    @property
+    def is_infinite(self):
+        """stop か ponderhit が来るまで探索するか？"""
+        return self._is_infinite
+
+
+    @property
+    def soft_limit_ms(self):
+        """目安の時間（ミリ秒）。これを過ぎたら、次の深さを読まない。ナンなら時間では止めない"""
+        return self._soft_limit_ms
+
+
+    @property
+    def hard_limit_ms(self):
+        """打ち切りの時間（ミリ秒）。これを過ぎたら、読んでいる途中でも止める。ナンなら時間では止めない"""
+        return self._hard_limit_ms
+
+
+    @staticmethod
+    def parse_go_tokens(tokens):
+        """go コマンドの引数を解析する
+
+        Parameters
+        ----------
+        tokens : list
+            go の後ろを空白で区切ったもの。例： ["btime", "60000", "wtime", "50000", "byoyomi", "10000"]
+
+        Returns
+        -------
+        go_args : dict
+            例： {"btime": 60000, "wtime": 50000, "byoyomi": 10000}, {"depth": 5}, {"nodes": 100000}, {"infinite": True}
+        """
+
+        go_args = {}
+
+        for i in range(0, len(tokens)):
+            if tokens[i] in _GO_FLAG_ARG_NAMES:
+                go_args[tokens[i]] = True
+
+            elif tokens[i] in _GO_INT_ARG_NAMES and i + 1 < len(tokens):
+                go_args[tokens[i]] = int(tokens[i + 1])
+
+        return go_args
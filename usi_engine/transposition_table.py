@@ -0,0 +1,366 @@
+from array import array
+from multiprocessing import shared_memory
+
+
+# 置換表の既定の大きさ（メガバイト）
+DEFAULT_HASH_MB = 16
+
+# 評価値の種類
+BOUND_NONE = 0
+BOUND_UPPER = 1     # 評価値は上限。本当の評価値はこれ以下
+BOUND_LOWER = 2     # 評価値は下限。本当の評価値はこれ以上
+BOUND_EXACT = 3     # 評価値は正確
+
+# １バケツに入るエントリーの数
+#
+#   0 番目は深く読んだ結果を優先して残す。 1 番目は常に上書きする
+#
+_BUCKET_SIZE = 2
+
+# １エントリーのバイト数。キーとデータで８バイトずつ
+_ENTRY_BYTES = 16
+
+# データのビットの並び
+#
+#   指し手番号 + 1 : 12 ビット（0 は指し手無し）
+#   評価値の種類   :  2 ビット
+#   深さ           :  8 ビット
+#   世代           :  8 ビット
+#   評価値 + 32768 : 16 ビット
+#
+_MOVE_SHIFT = 0
+_BOUND_SHIFT = 12
+_DEPTH_SHIFT = 14
+_GENERATION_SHIFT = 22
+_SCORE_SHIFT = 30
+_SCORE_OFFSET = 32768
+
+
+class TranspositionTable():
+    """置換表
+
+    局面の６４ビットのハッシュをキーにして、探索結果（深さ、評価値の種類、評価値、最善手の指し手番号）を覚える。
+    大きさ固定の配列で持ち、１つのバケツに２つのエントリーを入れる。
+
+    キーはデータと XOR して書く。共有メモリの置換表を複数のプロセスがロック無しで読み書きして、
+    キーとデータが別々のプロセスの書いたものになっても、引くときにキーが一致しなくなるので、壊れたエントリーは使われない
+    """
+
+
+    def __init__(self, hash_mb=DEFAULT_HASH_MB, shared_memory_name=None):
+        """初期化
+
+        Parameters
+        ----------
+        hash_mb : int
+            置換表に使うメモリ（メガバイト）
+        shared_memory_name : str
+            共有メモリの名前。指定すれば、 create_shared() で作った置換表の共有メモリを、このプロセスからも使う
+        """
+        self._hash_mb = None
+        self._bucket_mask = 0
+        self._keys = None
+        self._data = None
+
+        # 置換表を置いた共有メモリ。共有しなければナン
+        self._shared_memory = None
+
+        # 共有メモリを作ったのがこのオブジェクトか。真なら close() で共有メモリを破棄する
+        self._is_shared_memory_owner = False
+
+        # 探索毎に増やす世代。古い世代のエントリーは、深さに関わらず上書きしてよい
+        self._generation = 0
+
+        if shared_memory_name is not None:
+            self._attach_shared_memory(hash_mb, shared_memory.SharedMemory(name=shared_memory_name))
+        else:
+            self.resize(hash_mb)
+
+
+    @staticmethod
+    def create_shared(hash_mb=DEFAULT_HASH_MB):
+        """共有メモリに置いた置換表を作る
+
+        他のプロセスでは、 shared_memory_name を渡して TranspositionTable を作れば、同じ置換表を使える
+        """
+        tt = TranspositionTable(hash_mb=1)
+        tt._attach_shared_memory(
+            hash_mb,
+            shared_memory.SharedMemory(create=True, size=TranspositionTable.count_buckets(hash_mb) * _BUCKET_SIZE * _ENTRY_BYTES))
+        tt._is_shared_memory_owner = True
+        return tt
+
+
+    @staticmethod
+    def count_buckets(hash_mb):
+        """バケツの数。メモリに収まる２のべき乗に切り下げる"""
+
+        bucket_count = 1
+        while bucket_count * 2 * _BUCKET_SIZE * _ENTRY_BYTES <= hash_mb * 1024 * 1024:
+            bucket_count *= 2
+
+        return bucket_count
+
+
+    def _attach_shared_memory(self, hash_mb, shared_memory_obj):
+        """共有メモリを、キーとデータの配列として使う"""
+
+        entry_count = TranspositionTable.count_buckets(hash_mb) * _BUCKET_SIZE
+
+        self._hash_mb = hash_mb
+        self._bucket_mask = entry_count // _BUCKET_SIZE - 1
+        self._shared_memory = shared_memory_obj
+        self._keys = shared_memory_obj.buf[0:8 * entry_count].cast('Q')
+        self._data = shared_memory_obj.buf[8 * entry_count:16 * entry_count].cast('Q')
+        self.clear_counters()
+
+
+    @property
+    def shared_memory_name(self):
+        """置換表を置いた共有メモリの名前。共有していなければナン"""
+        if self._shared_memory is None:
+            return None
+
+        return self._shared_memory.name
+
+
+    @property
+    def generation(self):
+        """世代"""
+        return self._generation
+
+
+    def set_generation(self, generation):
+        """世代を揃える。共有メモリの置換表を使うプロセス同士で、同じ世代で書き込むためのもの"""
+        self._generation = generation & 0xff
+
+
+    def close(self):
+        """共有メモリを使うのをやめる。作ったのがこのオブジェクトなら破棄もする"""
+
+        if self._shared_memory is None:
+            return
+
+        self._keys.release()
+        self._data.release()
+        self._keys = None
+        self._data = None
+        self._shared_memory.close()
+
+        if self._is_shared_memory_owner:
+            self._shared_memory.unlink()
+
+        self._shared_memory = None
+
+
+    @property
+    def hash_mb(self):
+        """置換表に使うメモリ（メガバイト）"""
+        return self._hash_mb
+
+
+    @property
+    def entry_count(self):
+        """エントリーの数"""
+        return len(self._keys)
+
+
+    def resize(self, hash_mb):
+        """大きさを変えて、中身を空にする
+
+        バケツの数は、メモリに収まる２のべき乗に切り下げる。共有メモリの置換表の大きさは変えられない
+        """
+
+        if self._shared_memory is not None:
+            raise ValueError(f"共有メモリの置換表の大きさは変えられません  {hash_mb=}")
+
+        bucket_count = TranspositionTable.count_buckets(hash_mb)
+
+        self._hash_mb = hash_mb
+        self._bucket_mask = bucket_count - 1
+        self._keys = array('Q', bytes(8 * bucket_count * _BUCKET_SIZE))
+        self._data = array('Q', bytes(8 * bucket_count * _BUCKET_SIZE))
+        self.clear_counters()
+
+
+    def clear(self):
+        """中身を空にする"""
+
+        if self._shared_memory is not None:
+            size = len(self._keys) * _ENTRY_BYTES
+            self._shared_memory.buf[0:size] = bytes(size)
+            self.clear_counters()
+            return
+
+        self.resize(self._hash_mb)
+
+
+    def clear_counters(self):
+        """統計を 0 に戻す"""
+
+        # 引いた回数
+        self.probes = 0
+
+        # 引いて見つかった回数
+        self.hits = 0
+
+        # 引いて見つからなかった回数
+        self.misses = 0
+
+        # 引いて見つからなかったうち、バケツが別の局面で埋まっていた回数
+        self.collisions = 0
+
+        # 書き込んだ回数
+        self.stores = 0
+
+
+    def new_search(self):
+        """探索を始める前に呼ぶ。世代を進める"""
+        self._generation = (self._generation + 1) & 0xff
+
+
+    def probe(self, key):
+        """置換表を引く
+
+        Parameters
+        ----------
+        key : int
+            局面の６４ビットのハッシュ
+
+        Returns
+        -------
+        entry : tuple
+            （深さ, 評価値の種類, 評価値, 指し手番号）。見つからなければナン。
+            指し手番号は、最善手が無ければ -1
+        """
+
+        self.probes += 1
+
+        index = (key & self._bucket_mask) * _BUCKET_SIZE
+        is_occupied = False
+
+        for i in range(index, index + _BUCKET_SIZE):
+            data = self._data[i]
+
+            if data == 0:
+                continue
+
+            if self._keys[i] ^ data == key:
+                self.hits += 1
+                return TranspositionTable.unpack(data)
+
+            is_occupied = True
+
+        self.misses += 1
+
+        if is_occupied:
+            self.collisions += 1
+
+        return None
+
+
+    def store(self, key, depth, bound, score, move_id):
+        """置換表に書き込む
+
+        同じ局面が入っていれば、そこを上書きする。
+        無ければ、 0 番目のエントリーには、それより深く読んだか、古い世代のときだけ書き込み、
+        そうでなければ 1 番目のエントリーを上書きする
+
+        Parameters
+        ----------
+        key : int
+            局面の６４ビットのハッシュ
+        depth : int
+            読んだ深さ
+        bound : int
+            評価値の種類
+        score : int
+            評価値
+        move_id : int
+            最善手の指し手番号。無ければ -1
+        """
+
+        self.stores += 1
+
+        index = (key & self._bucket_mask) * _BUCKET_SIZE
+        data = self.pack(depth, bound, score, move_id)
+
+        # 同じ局面
+        for i in range(index, index + _BUCKET_SIZE):
+            old_data = self._data[i]
+
+            if old_data != 0 and self._keys[i] ^ old_data == key:
+                # 最善手が分からなければ、前の最善手を残す
+                if move_id < 0:
+                    (_, _, _, old_move_id) = TranspositionTable.unpack(old_data)
+                    data = self.pack(depth, bound, score, old_move_id)
+
+                self._keys[i] = key ^ data
+                self._data[i] = data
+                return
+
+        # 深さ優先のエントリー
+        old_data = self._data[index]
+        old_depth = (old_data >> _DEPTH_SHIFT) & 0xff
+        old_generation = (old_data >> _GENERATION_SHIFT) & 0xff
+
+        if old_data == 0 or old_generation != self._generation or old_depth <= depth:
+            self._keys[index] = key ^ data
+            self._data[index] = data
+            return
+
+        # 常に上書きするエントリー
+        self._keys[index + 1] = key ^ data
+        self._data[index + 1] = data
+
+
+    def pack(self, depth, bound, score, move_id):
+        """エントリーのデータを１つの整数に詰める"""
+        return (((move_id + 1) << _MOVE_SHIFT) |
+                (bound << _BOUND_SHIFT) |
+                (max(depth, 0) << _DEPTH_SHIFT) |
+                (self._generation << _GENERATION_SHIFT) |
+                ((score + _SCORE_OFFSET) << _SCORE_SHIFT))
+
+
+    @staticmethod
+    def unpack(data):
+        """pack() で詰めたデータを取り出す
+
+        Returns
+        -------
+        entry : tuple
+            （深さ, 評価値の種類, 評価値, 指し手番号）
+        """
+        return ((data >> _DEPTH_SHIFT) & 0xff,
+                (data >> _BOUND_SHIFT) & 0x3,
+                ((data >> _SCORE_SHIFT) & 0xffff) - _SCORE_OFFSET,
+                ((data >> _MOVE_SHIFT) & 0xfff) - 1)
+
+
+    def hashfull(self):
+        """使用率（千分率）。先頭の 1000 エントリーのうち、今の世代で埋まっている数"""
+
+        sample_count = min(1000, len(self._keys))
+        used = 0
+
+        for i in range(0, sample_count):
+            if self._data[i] != 0 and (self._data[i] >> _GENERATION_SHIFT) & 0xff == self._generation:
+                used += 1
+
+        return used * 1000 // sample_count
+
+
+    def stringify_dump(self):
+        """統計を文字列にする"""
+        return f"""\
+[TranspositionTable > dump]
+    hash_mb:{self._hash_mb}
+    shared_memory_name:{self.shared_memory_name}
+    entry_count:{len(self._keys)}
+    hashfull:{self.hashfull()}
+    probes:{self.probes}
+    hits:{self.hits}
+    misses:{self.misses}
+    collisions:{self.collisions}
+    stores:{self.stores}"""